@@ -0,0 +1,282 @@
+import asyncio
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+from app.models import ProductResponse, ProductResult
+from app.pipeline import crawl_uncached, process_url_result
+
+def read_input(path: str, warn: bool = True) -> Iterator[Tuple[int, str]]:
+    """
+    (line number, URL) pairs of a JSONL input, read lazily.
+    A line is {"url": "..."}, a JSON string or a bare URL; blank lines and # comments are skipped.
+    """
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if line[0] in "{\"":
+                try:
+                    value = json.loads(line)
+                except json.JSONDecodeError:
+                    if warn:
+                        print(f"{path}:{number}: invalid JSON, skipped", file=sys.stderr)
+                    continue
+                url = value.get("url") if isinstance(value, dict) else value
+            else:
+                url = line
+            if isinstance(url, str) and url:
+                yield number, url
+            elif warn:
+                print(f"{path}:{number}: no url, skipped", file=sys.stderr)
+
+def count_input(path: str) -> int:
+    return sum(1 for _ in read_input(path, warn=False))
+
+class Checkpoint:
+    """Append-only file of finished input line numbers; a rerun skips them."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.done: Set[int] = set()
+        self._file = None
+
+    def load(self) -> int:
+        if os.path.exists(self.path):
+            with open(self.path, encoding="utf-8") as f:
+                # A line cut off by a crash is ignored (its item runs again)
+                self.done = {int(line) for line in f if line.strip().isdigit() and line.endswith("\n")}
+        return len(self.done)
+
+    def reset(self):
+        self.done = set()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def mark(self, indexes: List[int]):
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._file.write("".join(f"{index}\n" for index in indexes))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.done.update(indexes)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+class JsonlWriter:
+    """One ProductResult per line, flushed as soon as an item finishes."""
+
+    def __init__(self, path: str, resume: bool):
+        self.path = path
+        if resume and os.path.exists(path):
+            self._drop_partial_line(path)
+        self._file = open(path, "a" if resume else "w", encoding="utf-8")
+
+    @staticmethod
+    def _drop_partial_line(path: str):
+        """Cuts a last line left unfinished by a crash (its item is not checkpointed and runs again)."""
+        with open(path, "rb+") as f:
+            data = f.read()
+            if data and not data.endswith(b"\n"):
+                f.truncate(data.rfind(b"\n") + 1)
+
+    def write(self, result: ProductResult) -> bool:
+        """Returns True when the result is durably written (and may be checkpointed)."""
+        self._file.write(result.model_dump_json() + "\n")
+        self._file.flush()
+        return True
+
+    def flush(self) -> List[ProductResult]:
+        return []
+
+    def close(self) -> List[ProductResult]:
+        self._file.close()
+        return []
+
+class ParquetWriter:
+    """
+    Parquet output as a directory of part files (readable as one dataset by pyarrow, pandas,
+    DuckDB, Spark). Results are buffered and written `rows_per_part` at a time, so memory stays
+    bounded and a crash only loses the unwritten buffer. Requires pyarrow.
+    """
+
+    def __init__(self, path: str, resume: bool, rows_per_part: int = 1000):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise RuntimeError("Parquet output requires pyarrow (pip install pyarrow)")
+        self._pa = pyarrow
+        self._pq = pyarrow.parquet
+        self.path = path
+        self.rows_per_part = max(1, rows_per_part)
+        os.makedirs(path, exist_ok=True)
+        parts = sorted(name for name in os.listdir(path) if name.startswith("part-") and name.endswith(".parquet"))
+        if not resume:
+            for name in parts:
+                os.remove(os.path.join(path, name))
+            parts = []
+        self._next_part = len(parts)
+        self._buffer: List[ProductResult] = []
+        self._schema = self._build_schema()
+
+    def _build_schema(self):
+        pa = self._pa
+        fields = [
+            pa.field("index", pa.int64()),
+            pa.field("url", pa.string()),
+            pa.field("status", pa.string()),
+            pa.field("error", pa.string()),
+            pa.field("elapsed_ms", pa.float64()),
+        ]
+        # Product fields: lists of strings stay lists, dicts are stored as JSON text
+        for name, info in ProductResponse.model_fields.items():
+            if getattr(info.annotation, "__origin__", None) is list:
+                fields.append(pa.field(name, pa.list_(pa.string())))
+            else:
+                fields.append(pa.field(name, pa.string()))
+        return pa.schema(fields)
+
+    def _row(self, result: ProductResult) -> Dict[str, Any]:
+        row = {"index": result.index, "url": result.url, "status": result.status, "error": result.error, "elapsed_ms": result.elapsed_ms}
+        product = result.product.model_dump() if result.product else {}
+        for name in ProductResponse.model_fields:
+            value = product.get(name)
+            if isinstance(value, dict):
+                value = json.dumps(value, ensure_ascii=False)
+            elif value is not None and not isinstance(value, list):
+                value = str(value)
+            row[name] = value
+        return row
+
+    def write(self, result: ProductResult) -> bool:
+        self._buffer.append(result)
+        return False
+
+    def flush(self) -> List[ProductResult]:
+        """Writes a part file once enough rows are buffered; returns the rows now on disk."""
+        if len(self._buffer) < self.rows_per_part:
+            return []
+        return self._write_part()
+
+    def _write_part(self) -> List[ProductResult]:
+        if not self._buffer:
+            return []
+        rows, self._buffer = self._buffer, []
+        table = self._pa.Table.from_pylist([self._row(r) for r in rows], schema=self._schema)
+        final = os.path.join(self.path, f"part-{self._next_part:05d}.parquet")
+        # Write then rename, so readers (and a resumed run) never see a half-written part
+        temporary = final + ".tmp"
+        self._pq.write_table(table, temporary)
+        os.replace(temporary, final)
+        self._next_part += 1
+        return rows
+
+    def close(self) -> List[ProductResult]:
+        return self._write_part()
+
+def open_writer(path: str, output_format: Optional[str], resume: bool, rows_per_part: int):
+    output_format = output_format or ("parquet" if path.endswith(".parquet") else "jsonl")
+    if output_format == "parquet":
+        return ParquetWriter(path, resume, rows_per_part)
+    return JsonlWriter(path, resume)
+
+class Progress:
+    """Throughput / ETA reporting on stderr."""
+
+    def __init__(self, total: int, skipped: int, interval: float = 10.0):
+        self.total = total
+        self.skipped = skipped
+        self.interval = interval
+        self.ok = 0
+        self.failed = 0
+        self.started = time.monotonic()
+        self._last_report = self.started
+
+    @property
+    def done(self) -> int:
+        return self.ok + self.failed
+
+    def rate(self) -> float:
+        elapsed = time.monotonic() - self.started
+        return self.done / elapsed if elapsed > 0 else 0.0
+
+    def line(self, eta: bool = True) -> str:
+        rate = self.rate()
+        text = (
+            f"{self.skipped + self.done}/{self.total} done ({self.ok} ok, {self.failed} failed"
+            f"{f', {self.skipped} resumed' if self.skipped else ''}), {rate:.2f} items/s"
+        )
+        if eta:
+            remaining = max(0, self.total - self.skipped - self.done)
+            text += f", ETA {remaining / rate / 60:.1f} min" if rate > 0 else ", ETA n/a"
+        return text
+
+    def update(self, ok: bool):
+        if ok:
+            self.ok += 1
+        else:
+            self.failed += 1
+        now = time.monotonic()
+        if now - self._last_report >= self.interval:
+            self._last_report = now
+            print(self.line(), file=sys.stderr)
+
+    def summary(self) -> str:
+        elapsed = time.monotonic() - self.started
+        return f"Finished in {elapsed:.1f}s: {self.line(eta=False)}"
+
+async def run_batch(
+    input_path: str,
+    output_path: str,
+    concurrency: int = 4,
+    output_format: Optional[str] = None,
+    checkpoint_path: Optional[str] = None,
+    resume: bool = True,
+    rows_per_part: int = 1000,
+    progress_interval: float = 10.0,
+    run=crawl_uncached,
+) -> Progress:
+    """
+    Crawls every URL of a JSONL input with at most `concurrency` workflows in flight
+    (no product cache: every item is crawled and memory stays flat).
+    Results are written as they finish; finished line numbers go to the checkpoint file,
+    so rerunning the same command after an interruption continues where it stopped.
+    Failed items are written with status "error" and are not retried on resume.
+    """
+    checkpoint = Checkpoint(checkpoint_path or f"{output_path.rstrip('/')}.checkpoint")
+    resumed = checkpoint.load() if resume else 0
+    if not resumed:
+        checkpoint.reset()
+    writer = open_writer(output_path, output_format, resumed > 0, rows_per_part)
+    progress = Progress(count_input(input_path), resumed, progress_interval)
+    if resumed:
+        print(f"Resuming: {resumed} item(s) already done ({checkpoint.path})", file=sys.stderr)
+
+    items = ((index, url) for index, url in read_input(input_path) if index not in checkpoint.done)
+
+    async def worker():
+        # Workers pull from the lazy input, so only `concurrency` items are in memory at once
+        for index, url in items:
+            result = await process_url_result(index, url, run)
+            # No await between write and checkpoint: workers never interleave here
+            if writer.write(result):
+                checkpoint.mark([result.index])
+            written = writer.flush()
+            if written:
+                checkpoint.mark([r.index for r in written])
+            progress.update(result.status == "ok")
+
+    try:
+        await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+    finally:
+        written = writer.close()
+        if written:
+            checkpoint.mark([r.index for r in written])
+        checkpoint.close()
+    return progress
@@ -0,0 +1,217 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import List, Optional
+from urllib.parse import urlsplit
+from playwright.async_api import async_playwright, Browser, BrowserContext, Page, Playwright, Route
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+from app import config
+from app.utils import ua
+
+DEFAULT_USER_AGENT = "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+
+DEFAULT_EXTRA_HEADERS = {
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8",
+    "Accept-Language": "en-US,en;q=0.9",
+}
+
+# True once every selector is attached, or once the page has fully loaded and at least
+# the first (main) selector exists -- optional sections will not show up after that.
+READY_CHECK_JS = """
+(selectors) => selectors.every((s) => document.querySelector(s)) ||
+    (document.readyState === "complete" && !!document.querySelector(selectors[0]))
+"""
+
+def _host_matches(host: str, patterns: List[str]) -> bool:
+    return any(host == p or host.endswith("." + p) for p in patterns)
+
+def should_block_request(resource_type: str, url: str) -> bool:
+    """Decides whether a browser sub-request is aborted, based on host and resource type rules."""
+    # Never block the page itself
+    if resource_type == "document":
+        return False
+    host = (urlsplit(url).hostname or "").lower()
+    if _host_matches(host, config.FETCH_ALLOWED_HOSTS):
+        return False
+    if _host_matches(host, config.FETCH_BLOCKED_HOSTS):
+        return True
+    return resource_type in config.FETCH_BLOCKED_RESOURCE_TYPES
+
+async def _route_request(route: Route):
+    if should_block_request(route.request.resource_type, route.request.url):
+        await route.abort()
+    else:
+        await route.continue_()
+
+async def wait_until_ready(page: Page, selectors: List[str] = config.FETCH_READY_SELECTORS, timeout_ms: int = config.FETCH_READY_TIMEOUT_MS) -> bool:
+    """Waits for the sections the parser reads instead of sleeping. Returns False if the cap was hit."""
+    if not selectors or timeout_ms <= 0:
+        return True
+    try:
+        await page.wait_for_function(READY_CHECK_JS, arg=selectors, timeout=timeout_ms)
+        return True
+    except PlaywrightTimeoutError:
+        # Proceed with whatever is in the DOM so far
+        return False
+
+class ContextSlot:
+    """One reusable browser context. Only one page is open on a slot at a time."""
+
+    def __init__(self, browser_index: int):
+        self.browser_index = browser_index
+        self.context: Optional[BrowserContext] = None
+        self.pages_served = 0
+        # Set when the context should not be reused (e.g. captcha was served to it)
+        self.blocked = False
+
+    def needs_recycle(self, max_pages: int) -> bool:
+        return self.blocked or self.context is None or self.pages_served >= max_pages
+
+
+class PooledPage:
+    """A page leased from the pool. Call mark_blocked() if the page hit a captcha."""
+
+    def __init__(self, page: Page, slot: ContextSlot):
+        self.page = page
+        self._slot = slot
+
+    def mark_blocked(self):
+        # The context's cookies are now flagged by Amazon, so recycle it on release
+        self._slot.blocked = True
+
+
+class BrowserPool:
+    """
+    Keeps a fixed number of Chromium processes and browser contexts alive
+    so that fetch_page only pays for the page load, not for the browser start.
+    """
+
+    def __init__(
+        self,
+        browsers: int = config.BROWSER_POOL_SIZE,
+        contexts_per_browser: int = config.BROWSER_CONTEXTS_PER_BROWSER,
+        max_pages_per_context: int = config.BROWSER_MAX_PAGES_PER_CONTEXT,
+        headless: bool = config.BROWSER_HEADLESS,
+    ):
+        self.browsers_count = max(1, browsers)
+        self.contexts_per_browser = max(1, contexts_per_browser)
+        self.max_pages_per_context = max(1, max_pages_per_context)
+        self.headless = headless
+
+        self._playwright: Optional[Playwright] = None
+        self._browsers: List[Optional[Browser]] = []
+        self._browser_locks: List[asyncio.Lock] = []
+        self._slots: Optional[asyncio.Queue] = None
+        self._start_lock = asyncio.Lock()
+        self._started = False
+
+    @property
+    def started(self) -> bool:
+        return self._started
+
+    async def start(self):
+        """Launches the browsers. Safe to call more than once."""
+        async with self._start_lock:
+            if self._started:
+                return
+            print(f"Starting browser pool: {self.browsers_count} browser(s) x {self.contexts_per_browser} context(s)")
+            self._playwright = await async_playwright().start()
+            self._browsers = [None] * self.browsers_count
+            self._browser_locks = [asyncio.Lock() for _ in range(self.browsers_count)]
+            for index in range(self.browsers_count):
+                self._browsers[index] = await self._launch_browser()
+
+            # Contexts are created lazily on first lease, so startup stays cheap
+            self._slots = asyncio.Queue()
+            for _ in range(self.contexts_per_browser):
+                for index in range(self.browsers_count):
+                    self._slots.put_nowait(ContextSlot(index))
+            self._started = True
+
+    async def stop(self):
+        """Closes every context and browser and stops Playwright."""
+        async with self._start_lock:
+            if not self._started:
+                return
+            print("Stopping browser pool")
+            self._started = False
+            if self._slots is not None:
+                while not self._slots.empty():
+                    slot = self._slots.get_nowait()
+                    await self._close_context(slot)
+            for browser in self._browsers:
+                if browser is not None:
+                    try:
+                        await browser.close()
+                    except Exception as e:
+                        print(f"Error closing browser: {e}")
+            self._browsers = []
+            if self._playwright is not None:
+                await self._playwright.stop()
+                self._playwright = None
+
+    @asynccontextmanager
+    async def page(self):
+        """Leases a fresh page on a pooled context. The page is closed on exit."""
+        if not self._started:
+            # Allows the workflow to be used outside of the FastAPI lifespan (scripts, tests)
+            await self.start()
+
+        slot: ContextSlot = await self._slots.get()
+        page = None
+        try:
+            if slot.needs_recycle(self.max_pages_per_context):
+                await self._recycle(slot)
+            page = await slot.context.new_page()
+            yield PooledPage(page, slot)
+        finally:
+            slot.pages_served += 1
+            if page is not None:
+                try:
+                    await page.close()
+                except Exception:
+                    # Context/browser may have died; force a fresh context next time
+                    slot.blocked = True
+            if self._started:
+                self._slots.put_nowait(slot)
+            else:
+                # Pool was stopped while the page was in use
+                await self._close_context(slot)
+
+    async def _launch_browser(self) -> Browser:
+        return await self._playwright.chromium.launch(headless=self.headless)
+
+    async def _new_context(self, browser: Browser, user_agent: str = DEFAULT_USER_AGENT) -> BrowserContext:
+        context = await browser.new_context(user_agent=user_agent)
+        await context.set_extra_http_headers(DEFAULT_EXTRA_HEADERS)
+        if config.FETCH_BLOCK_RESOURCES:
+            # Images, fonts, ads etc. are never used by parse_html (it only reads attributes)
+            await context.route("**/*", _route_request)
+        return context
+
+    async def _recycle(self, slot: ContextSlot):
+        """Replaces the slot's context (and its browser if that has crashed)."""
+        await self._close_context(slot)
+        async with self._browser_locks[slot.browser_index]:
+            browser = self._browsers[slot.browser_index]
+            if browser is None or not browser.is_connected():
+                print(f"Relaunching browser #{slot.browser_index}")
+                browser = await self._launch_browser()
+                self._browsers[slot.browser_index] = browser
+        # A blocked context's fingerprint is burned: come back as a different (Chromium) browser
+        user_agent = ua.chrome if slot.blocked else DEFAULT_USER_AGENT
+        slot.context = await self._new_context(browser, user_agent)
+        slot.pages_served = 0
+        slot.blocked = False
+
+    async def _close_context(self, slot: ContextSlot):
+        if slot.context is None:
+            return
+        try:
+            await slot.context.close()
+        except Exception:
+            pass
+        slot.context = None
+
+
+# Shared pool, started/stopped with the FastAPI app lifespan
+browser_pool = BrowserPool()
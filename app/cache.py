@@ -0,0 +1,286 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from app import config
+
+def make_cache_key(prompt: str, model_id: str, prompt_version: str) -> str:
+    """Content address of an LLM call: same prompt + model + prompt version -> same answer."""
+    digest = hashlib.sha256()
+    for part in (prompt_version, model_id, prompt):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+def total_tokens(usage: Dict[str, int]) -> int:
+    """Total tokens of an LLM call, whichever naming the endpoint uses."""
+    if usage.get("total_tokens"):
+        return int(usage["total_tokens"])
+    prompt = usage.get("prompt_tokens", usage.get("input_tokens", 0)) or 0
+    completion = usage.get("completion_tokens", usage.get("output_tokens", 0)) or 0
+    return int(prompt + completion)
+
+class TieredStore:
+    """
+    Two-tier key -> JSON value store.
+    - Memory: bounded LRU (OrderedDict)
+    - Disk: SQLite table that survives restarts, evicted by TTL and total size (least recently used first)
+    Disk reads and writes run in worker threads; failures are logged and treated as misses.
+    """
+
+    # Columns of the disk table; a table from an older layout is dropped (it only holds cached data)
+    COLUMNS = ("key", "value", "size", "created_at", "accessed_at")
+
+    def __init__(self, name: str, path: Optional[str], table: str, memory_items: int, ttl_seconds: float, max_disk_bytes: int, enabled: bool):
+        self.name = name
+        self.path = path
+        self.table = table
+        self.memory_items = max(0, memory_items)
+        self.ttl_seconds = ttl_seconds
+        self.max_disk_bytes = max_disk_bytes
+        self.enabled = enabled
+
+        # key -> (created_at, value)
+        self._memory: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._db: Optional[sqlite3.Connection] = None
+        # One connection shared by the to_thread calls
+        self._db_lock = threading.Lock()
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+    def _expired(self, created_at: float) -> bool:
+        return self.ttl_seconds > 0 and time.time() - created_at > self.ttl_seconds
+
+    # --- Disk tier (runs in threads) ---
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        if not self.path:
+            return None
+        if self._db is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            columns = {row[1] for row in self._db.execute(f"PRAGMA table_info({self.table})")}
+            if columns and not set(self.COLUMNS) <= columns:
+                self._db.execute(f"DROP TABLE {self.table}")
+            self._db.execute(
+                f"""
+                CREATE TABLE IF NOT EXISTS {self.table} (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+                """
+            )
+            self._db.execute(f"CREATE INDEX IF NOT EXISTS {self.table}_accessed ON {self.table} (accessed_at)")
+            self._db.commit()
+        return self._db
+
+    def _disk_get_many(self, keys: List[str]) -> Dict[str, Tuple[float, Any]]:
+        with self._db_lock:
+            db = self._connect()
+            if db is None or not keys:
+                return {}
+            found, expired = {}, []
+            # Stay below SQLite's bound parameter limit
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                placeholders = ",".join("?" * len(chunk))
+                for key, value, created_at in db.execute(f"SELECT key, value, created_at FROM {self.table} WHERE key IN ({placeholders})", chunk):
+                    if self._expired(created_at):
+                        expired.append((key,))
+                    else:
+                        found[key] = (created_at, json.loads(value))
+            if expired:
+                db.executemany(f"DELETE FROM {self.table} WHERE key = ?", expired)
+                self.evictions += len(expired)
+            if found:
+                now = time.time()
+                db.executemany(f"UPDATE {self.table} SET accessed_at = ? WHERE key = ?", [(now, key) for key in found])
+            if expired or found:
+                db.commit()
+            return found
+
+    def _disk_set_many(self, items: List[Tuple[str, float, Any]]):
+        with self._db_lock:
+            db = self._connect()
+            if db is None:
+                return
+            rows = []
+            now = time.time()
+            for key, created_at, value in items:
+                text = json.dumps(value, ensure_ascii=False)
+                rows.append((key, text, len(text.encode("utf-8")), created_at, now))
+            db.executemany(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._evict_disk(db)
+            db.commit()
+
+    def _evict_disk(self, db: sqlite3.Connection):
+        if self.ttl_seconds > 0:
+            cursor = db.execute(f"DELETE FROM {self.table} WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+            self.evictions += cursor.rowcount
+        if self.max_disk_bytes <= 0:
+            return
+        total = db.execute(f"SELECT COALESCE(SUM(size), 0) FROM {self.table}").fetchone()[0]
+        if total <= self.max_disk_bytes:
+            return
+        # Drop least recently used rows until we are under the limit
+        for key, size in db.execute(f"SELECT key, size FROM {self.table} ORDER BY accessed_at").fetchall():
+            db.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+            self.evictions += 1
+            total -= size
+            if total <= self.max_disk_bytes:
+                break
+
+    def _disk_stats(self) -> Dict[str, int]:
+        with self._db_lock:
+            db = self._connect()
+            if db is None:
+                return {"disk_entries": 0, "disk_bytes": 0}
+            entries, size = db.execute(f"SELECT COUNT(*), COALESCE(SUM(size), 0) FROM {self.table}").fetchone()
+            return {"disk_entries": entries, "disk_bytes": size}
+
+    def _close(self):
+        with self._db_lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    # --- Memory tier ---
+
+    def _memory_get(self, key: str) -> Optional[Any]:
+        item = self._memory.get(key)
+        if item is None:
+            return None
+        created_at, value = item
+        if self._expired(created_at):
+            del self._memory[key]
+            return None
+        self._memory.move_to_end(key)
+        return value
+
+    def _memory_set(self, key: str, created_at: float, value: Any):
+        if self.memory_items == 0:
+            return
+        # Entries promoted from disk keep their original age
+        self._memory[key] = (created_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    # --- Public API ---
+
+    async def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """Stored values of the keys that are present and not expired."""
+        if not self.enabled:
+            return {}
+        found: Dict[str, Any] = {}
+        missing = []
+        for key in dict.fromkeys(keys):
+            value = self._memory_get(key)
+            if value is not None:
+                found[key] = value
+            else:
+                missing.append(key)
+        self.memory_hits += len(found)
+
+        if missing:
+            try:
+                from_disk = await asyncio.to_thread(self._disk_get_many, missing)
+            except sqlite3.Error as e:
+                print(f"{self.name} read failed: {e}")
+                from_disk = {}
+            for key, (created_at, value) in from_disk.items():
+                found[key] = value
+                self._memory_set(key, created_at, value)
+            self.disk_hits += len(from_disk)
+            self.misses += len(missing) - len(from_disk)
+        return found
+
+    async def get(self, key: str) -> Optional[Any]:
+        return (await self.get_many([key])).get(key)
+
+    async def set_many(self, items: Dict[str, Any]):
+        if not self.enabled or not items:
+            return
+        now = time.time()
+        for key, value in items.items():
+            self._memory_set(key, now, value)
+        self.stores += len(items)
+        try:
+            await asyncio.to_thread(self._disk_set_many, [(key, now, value) for key, value in items.items()])
+        except sqlite3.Error as e:
+            print(f"{self.name} write failed: {e}")
+
+    async def set(self, key: str, value: Any):
+        await self.set_many({key: value})
+
+    async def stats(self) -> Dict[str, Any]:
+        hits = self.memory_hits + self.disk_hits
+        lookups = hits + self.misses
+        stats = {
+            "enabled": self.enabled,
+            "hits": hits,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "memory_entries": len(self._memory),
+        }
+        if self.enabled:
+            stats.update(await asyncio.to_thread(self._disk_stats))
+        return stats
+
+    async def close(self):
+        await asyncio.to_thread(self._close)
+
+
+class LLMCache(TieredStore):
+    """Cache of LLM extraction results (parsed JSON and the tokens the call cost), in a TieredStore."""
+
+    def __init__(
+        self,
+        path: Optional[str] = config.LLM_CACHE_PATH,
+        memory_items: int = config.LLM_CACHE_MEMORY_ITEMS,
+        ttl_seconds: float = config.LLM_CACHE_TTL,
+        max_disk_bytes: int = config.LLM_CACHE_MAX_DISK_MB * 1024 * 1024,
+        enabled: bool = config.LLM_CACHE_ENABLED,
+    ):
+        super().__init__("LLM cache", path, "llm_cache", memory_items, ttl_seconds, max_disk_bytes, enabled)
+        self.saved_tokens = 0
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Returns the cached entry ({"data": ..., "usage": ..., "tokens": ...}) or None."""
+        entry = await super().get(key)
+        if entry is not None:
+            self.saved_tokens += entry.get("tokens", 0)
+        return entry
+
+    async def set(self, key: str, data: Dict[str, Any], usage: Dict[str, int]):
+        """Stores the LLM output (parsed JSON) and the tokens it cost."""
+        await super().set(key, {"data": data, "usage": usage, "tokens": total_tokens(usage)})
+
+    async def stats(self) -> Dict[str, Any]:
+        return {**(await super().stats()), "saved_tokens": self.saved_tokens}
+
+
+# Shared cache in front of extract_with_llm
+llm_cache = LLMCache()
@@ -0,0 +1,177 @@
+"""
+Command line entry points that run the workflow without the API server.
+
+Usage:
+    python -m app.cli batch urls.jsonl --output products.jsonl [--concurrency 8]
+    python -m app.cli batch urls.jsonl --output products.parquet
+    python -m app.cli reprocess --asin B0XXXXXXXX [--asin ...] [--output results.jsonl]
+    python -m app.cli reprocess --all [--since-days 7] [--concurrency 4]
+    python -m app.cli worker [--workers 4]
+
+batch: crawls every URL of a JSONL file ({"url": ...}, a JSON string or a bare URL per line)
+with bounded concurrency, writing results as they finish. Finished lines are checkpointed
+next to the output, so rerunning the same command after an interruption resumes it.
+
+reprocess: re-parses and re-extracts products from their newest stored snapshot
+(app/snapshots.py), without fetching Amazon again.
+
+worker: processes the job queue (POST /api/v1/jobs, app/jobs.py) without the API, e.g. next to
+an API started with JOB_WORKERS=0. Several worker processes can share one queue file.
+"""
+import argparse
+import asyncio
+import json
+import signal
+import sys
+import time
+from contextlib import asynccontextmanager
+from typing import List
+from app import config
+from app.batch import run_batch
+from app.browser import browser_pool
+from app.cache import llm_cache
+from app.http_client import http_fetcher
+from app.jobs import JobWorkerPool, job_queue
+from app.llm import close_llm
+from app.parse_pool import parse_pool
+from app.pipeline import process_url_result, product_cache, reprocess_product
+from app.snapshots import snapshot_store
+from app.translation_memory import translation_memory
+
+@asynccontextmanager
+async def resources(fetch: bool = False):
+    """The part of the API lifespan the CLI needs: fetchers (if crawling), parse workers and the persistent stores."""
+    if fetch:
+        if config.BROWSER_ENABLED:
+            await browser_pool.start()
+        await http_fetcher.start()
+    await parse_pool.start()
+    try:
+        yield
+    finally:
+        await parse_pool.stop()
+        await http_fetcher.stop()
+        await browser_pool.stop()
+        await close_llm()
+        await llm_cache.close()
+        await translation_memory.close()
+        await snapshot_store.close()
+
+async def reprocess(args) -> int:
+    async with resources():
+        asins: List[str] = list(args.asin or [])
+        if args.all:
+            since = time.time() - args.since_days * 86400 if args.since_days else None
+            asins += [s["asin"] for s in await snapshot_store.latest_per_asin(since) if s["asin"] not in asins]
+        if not asins:
+            print("No snapshots to reprocess", file=sys.stderr)
+            return 1
+
+        output = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+        semaphore = asyncio.Semaphore(max(1, args.concurrency))
+        failed = 0
+
+        async def locked_reprocess(asin: str):
+            async with semaphore:
+                return await reprocess_product(asin)
+
+        async def run(index: int, asin: str):
+            nonlocal failed
+            # One product failing (e.g. an unreadable snapshot) must not stop the others
+            result = await process_url_result(index, asin, run=locked_reprocess)
+            if result.status == "error":
+                failed += 1
+                record = {"asin": asin, "status": "error", "error": result.error}
+            else:
+                record = {"asin": asin, "status": "ok", "product": result.product.model_dump()}
+            output.write(json.dumps(record, ensure_ascii=False) + "\n")
+            output.flush()
+
+        try:
+            await asyncio.gather(*(run(index, asin) for index, asin in enumerate(asins)))
+        finally:
+            if output is not sys.stdout:
+                output.close()
+        print(f"Reprocessed {len(asins) - failed}/{len(asins)} product(s)", file=sys.stderr)
+        return 1 if failed == len(asins) else 0
+
+async def batch(args) -> int:
+    async with resources(fetch=True):
+        progress = await run_batch(
+            args.input,
+            args.output,
+            concurrency=args.concurrency,
+            output_format=args.format,
+            checkpoint_path=args.checkpoint,
+            resume=not args.restart,
+            rows_per_part=args.rows_per_part,
+            progress_interval=args.progress_interval,
+        )
+    print(progress.summary(), file=sys.stderr)
+    return 1 if progress.failed and not progress.ok else 0
+
+async def worker(args) -> int:
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            # Windows: Ctrl+C still interrupts asyncio.run
+            pass
+
+    async with resources(fetch=True):
+        pool = JobWorkerPool(job_queue, workers=args.workers)
+        await pool.start()
+        print(f"Processing jobs from {job_queue.path} with {pool.workers} worker(s); Ctrl+C to stop", file=sys.stderr)
+        try:
+            await stop.wait()
+        finally:
+            # Items in progress are released to the queue for the next worker
+            await pool.stop()
+            job_queue.close()
+            await product_cache.close()
+    return 0
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description="Amazon product crawler command line")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    batch_parser = commands.add_parser("batch", help="Crawl the URLs of a JSONL file to JSONL / Parquet")
+    batch_parser.add_argument("input", help="JSONL file: {\"url\": ...}, a JSON string or a bare URL per line")
+    batch_parser.add_argument("--output", required=True, help="Results file (.jsonl) or Parquet directory (.parquet)")
+    batch_parser.add_argument("--format", choices=["jsonl", "parquet"], help="Default: from the --output extension")
+    batch_parser.add_argument("--concurrency", type=int, default=8, help="Workflows in flight (stage limits still apply)")
+    batch_parser.add_argument("--checkpoint", help="Default: <output>.checkpoint")
+    batch_parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint and start over")
+    batch_parser.add_argument("--rows-per-part", type=int, default=1000, help="Parquet rows per part file")
+    batch_parser.add_argument("--progress-interval", type=float, default=10.0, help="Seconds between progress lines")
+
+    reprocess_parser = commands.add_parser("reprocess", help="Re-parse / re-extract products from stored HTML snapshots")
+    reprocess_parser.add_argument("--asin", action="append", help="Product to reprocess (repeatable)")
+    reprocess_parser.add_argument("--all", action="store_true", help="Every product with a stored snapshot")
+    reprocess_parser.add_argument("--since-days", type=float, help="With --all: only snapshots fetched in the last N days")
+    reprocess_parser.add_argument("--concurrency", type=int, default=config.SNAPSHOT_REPROCESS_CONCURRENCY, help="Products processed at once (default: SNAPSHOT_REPROCESS_CONCURRENCY)")
+    reprocess_parser.add_argument("--output", help="JSONL file for the results (default: stdout)")
+
+    worker_parser = commands.add_parser("worker", help="Process the job queue without the API server")
+    worker_parser.add_argument("--workers", type=int, default=max(1, config.JOB_WORKERS), help="Items processed concurrently (default: JOB_WORKERS)")
+
+    args = parser.parse_args(argv)
+    if args.command == "batch":
+        try:
+            return asyncio.run(batch(args))
+        except KeyboardInterrupt:
+            print("Interrupted; run the same command again to resume", file=sys.stderr)
+            return 130
+    if args.command == "reprocess":
+        return asyncio.run(reprocess(args))
+    if args.command == "worker":
+        try:
+            return asyncio.run(worker(args))
+        except KeyboardInterrupt:
+            return 130
+    return 2
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,88 @@
+import re
+from typing import Dict, Iterable, List
+from app.tokens import count_tokens, truncate_to_tokens
+
+# Sections in the order they are kept when the budget runs out (see app/sections.py)
+SECTION_PRIORITY = ["title", "bullets", "tech_specs", "overview", "product_details", "description", "aplus"]
+SECTION_LABELS = {
+    "title": "TITLE",
+    "bullets": "FEATURES",
+    "tech_specs": "TECHNICAL SPECIFICATIONS",
+    "overview": "PRODUCT OVERVIEW",
+    "product_details": "PRODUCT DETAILS",
+    "description": "DESCRIPTION",
+    "aplus": "MANUFACTURER CONTENT",
+}
+
+# Widget captions and headings that survive inside sections but carry no product information,
+# and detail rows the DOM already provides (see app/dom_fields.py)
+NOISE_LINE_PATTERNS = [
+    re.compile(p, re.IGNORECASE)
+    for p in (
+        r"^about this item$",
+        r"^이 상품 정보$",
+        r"^see more product details$",
+        r"^customers (also|who) (viewed|bought)",
+        r"^products related to this item",
+        r"^report an issue with this product",
+        r"^click (here|to see full view)",
+        r"^\(?see top 100",
+        r"^read more$|^더 보기$|^자세히 보기$",
+        r"^› see more",
+        r"^asin\s*:",
+        r"^(best sellers rank|베스트셀러 순위|customer reviews|고객 리뷰)\s*:",
+        r"#[\d,]+\s*(in\b|위)",
+    )
+]
+
+# Sections that show the page uses the layout app/sections.py knows
+BODY_SECTIONS = ("bullets", "tech_specs", "overview", "product_details", "description")
+
+# Sections that are cut to fit are dropped instead when less than this is left
+MIN_SECTION_TOKENS = 20
+
+def is_noise_line(line: str) -> bool:
+    return any(pattern.search(line) for pattern in NOISE_LINE_PATTERNS)
+
+def compact_sections(sections: Dict[str, str], budget: int) -> str:
+    """
+    Joins the page sections in priority order, without noise lines and lines already
+    seen in an earlier section, and cuts the lowest-priority sections to fit `budget`
+    tokens (0 = no limit).
+    """
+    seen = set()
+    blocks: List[str] = []
+    remaining = budget
+    for name in SECTION_PRIORITY:
+        lines = []
+        for line in (sections.get(name) or "").split("\n"):
+            line = line.strip()
+            if not line or is_noise_line(line) or line in seen:
+                continue
+            seen.add(line)
+            lines.append(line)
+        if not lines:
+            continue
+
+        # A one-token-ish label per section; the text itself carries no extra markup
+        block = f"[{SECTION_LABELS[name]}]\n" + "\n".join(lines)
+        if budget > 0:
+            tokens = count_tokens(block) + 1  # + the newline joining blocks
+            if tokens > remaining:
+                if remaining >= MIN_SECTION_TOKENS:
+                    blocks.append(truncate_to_tokens(block, remaining - 1))
+                break
+            remaining -= tokens
+        blocks.append(block)
+    return "\n".join(blocks)
+
+def compact_llm_input(sections: Dict[str, str], fallback_text: str, budget: int, exclude: Iterable[str] = ()) -> str:
+    """
+    LLM input built from the known page sections, leaving out the `exclude` sections.
+    Pages without any body section use a layout we do not know, so their plain text is
+    kept and only cut to the budget.
+    """
+    if not any(sections.get(name) for name in BODY_SECTIONS):
+        return truncate_to_tokens(fallback_text, budget) if budget > 0 else fallback_text
+    excluded = set(exclude)
+    return compact_sections({name: text for name, text in sections.items() if name not in excluded}, budget)
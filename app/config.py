@@ -0,0 +1,179 @@
+import os
+from dotenv import load_dotenv
+
+# Load values from a local .env file (if present) before reading settings
+load_dotenv()
+
+def get_int(name: str, default: int) -> int:
+    """Reads an integer setting from the environment."""
+    value = os.getenv(name)
+    if value is None or value.strip() == "":
+        return default
+    return int(value)
+
+def get_float(name: str, default: float) -> float:
+    """Reads a float setting from the environment."""
+    value = os.getenv(name)
+    if value is None or value.strip() == "":
+        return default
+    return float(value)
+
+def get_bool(name: str, default: bool) -> bool:
+    """Reads a boolean setting from the environment ("1", "true", "yes", "on")."""
+    value = os.getenv(name)
+    if value is None or value.strip() == "":
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+def get_list(name: str, default: str) -> list:
+    """Reads a comma separated list setting from the environment."""
+    value = os.getenv(name, default)
+    return [item.strip().lower() for item in value.split(",") if item.strip()]
+
+# --- Browser Pool (Playwright) ---
+# Disabling the browser leaves only the HTTP fast path (pages it cannot serve fail)
+BROWSER_ENABLED = get_bool("BROWSER_ENABLED", True)
+# Number of Chromium processes kept alive for the whole app lifetime
+BROWSER_POOL_SIZE = get_int("BROWSER_POOL_SIZE", 1)
+# Number of isolated contexts (cookie jars) per browser; each context serves one page at a time
+BROWSER_CONTEXTS_PER_BROWSER = get_int("BROWSER_CONTEXTS_PER_BROWSER", 4)
+# A context is thrown away and recreated after serving this many pages
+BROWSER_MAX_PAGES_PER_CONTEXT = get_int("BROWSER_MAX_PAGES_PER_CONTEXT", 50)
+BROWSER_HEADLESS = get_bool("BROWSER_HEADLESS", True)
+
+# --- Plain-HTTP Fast Path ---
+# Try a pooled HTTP client first and only fall back to the browser when needed
+FETCH_HTTP_ENABLED = get_bool("FETCH_HTTP_ENABLED", True)
+FETCH_HTTP2 = get_bool("FETCH_HTTP2", True)
+FETCH_HTTP_TIMEOUT = get_float("FETCH_HTTP_TIMEOUT", 15.0)
+FETCH_HTTP_MAX_CONNECTIONS = get_int("FETCH_HTTP_MAX_CONNECTIONS", 20)
+# Element ids that must be present in the HTTP response, otherwise the browser is used
+FETCH_HTTP_REQUIRED_IDS = [s.strip() for s in os.getenv("FETCH_HTTP_REQUIRED_IDS", "centerCol,altImages").split(",") if s.strip()]
+
+# --- Adaptive Per-Host Fetch Limits (AIMD) ---
+# Concurrent fetches per host grow slowly on success and are cut on captcha / 429 / 503 / timeout
+FETCH_ADAPTIVE_ENABLED = get_bool("FETCH_ADAPTIVE_ENABLED", True)
+FETCH_HOST_INITIAL_CONCURRENCY = get_int("FETCH_HOST_INITIAL_CONCURRENCY", 4)
+FETCH_HOST_MIN_CONCURRENCY = get_int("FETCH_HOST_MIN_CONCURRENCY", 1)
+FETCH_HOST_MAX_CONCURRENCY = get_int("FETCH_HOST_MAX_CONCURRENCY", 16)
+# Factor applied to the limit on a block
+FETCH_HOST_DECREASE = get_float("FETCH_HOST_DECREASE", 0.5)
+# New fetches to a host wait this long after a block (seconds)
+FETCH_BLOCK_COOLDOWN = get_float("FETCH_BLOCK_COOLDOWN", 10.0)
+# Retries of a blocked fetch (with a fresh user agent / browser context)
+FETCH_MAX_RETRIES = get_int("FETCH_MAX_RETRIES", 2)
+FETCH_RETRY_BASE_DELAY = get_float("FETCH_RETRY_BASE_DELAY", 2.0)
+
+# --- Network Resource Blocking ---
+# When enabled, the browser aborts requests the parser never needs (we only read the DOM)
+FETCH_BLOCK_RESOURCES = get_bool("FETCH_BLOCK_RESOURCES", True)
+# Playwright resource types to abort (document, stylesheet, image, media, font, script, xhr, fetch, ...)
+FETCH_BLOCKED_RESOURCE_TYPES = get_list("FETCH_BLOCKED_RESOURCE_TYPES", "image,media,font,stylesheet")
+# Hosts (and their subdomains) that are always aborted, e.g. ads and tracking
+FETCH_BLOCKED_HOSTS = get_list(
+    "FETCH_BLOCKED_HOSTS",
+    "amazon-adsystem.com,doubleclick.net,google-analytics.com,googletagmanager.com,"
+    "fls-na.amazon.com,unagi.amazon.com,unagi-na.amazon.com",
+)
+# Hosts that are always allowed, even if their resource type is blocked
+FETCH_ALLOWED_HOSTS = get_list("FETCH_ALLOWED_HOSTS", "")
+
+# --- Page Readiness ---
+# Selectors parse_html reads; fetch waits for them instead of sleeping a fixed time
+FETCH_READY_SELECTORS = [s.strip() for s in os.getenv("FETCH_READY_SELECTORS", "#centerCol,#altImages,.aplus-v2").split(",") if s.strip()]
+# Upper bound (ms) for the readiness wait after the DOM is loaded
+FETCH_READY_TIMEOUT_MS = get_int("FETCH_READY_TIMEOUT_MS", 2000)
+
+# --- Parsing ---
+# "lxml" (single pass, fast) or "soup" (original BeautifulSoup implementation)
+PARSER_ENGINE = os.getenv("PARSER_ENGINE", "lxml").strip().lower()
+# Parses large pages in worker processes (started with the app) instead of the API process
+PARSE_POOL_ENABLED = get_bool("PARSE_POOL_ENABLED", True)
+# Number of worker processes (0 = one per CPU core)
+PARSE_POOL_WORKERS = get_int("PARSE_POOL_WORKERS", 0)
+# Pages smaller than this are parsed in-process; shipping them to a worker costs more than it saves
+PARSE_POOL_MIN_BYTES = get_int("PARSE_POOL_MIN_BYTES", 100_000)
+
+# --- LLM (Bedrock via LangServe RemoteRunnable) ---
+# RemoteRunnable takes the base URL: it calls <BEDROCK_URL>/invoke
+BEDROCK_URL = os.getenv("BEDROCK_URL", "https://stag-pawn-python.api.plto.com/bedrock")
+BEDROCK_API_KEY = os.getenv("BEDROCK_API_KEY", "MY_SECRET_COMPANY_KEY_1234")
+# Using Haiku for cost-effectiveness. To use Sonnet: "anthropic.claude-3-sonnet-20240229-v1:0"
+BEDROCK_MODEL_ID = os.getenv("BEDROCK_MODEL_ID", "anthropic.claude-3-haiku-20240307-v1:0")
+LLM_TIMEOUT = get_float("LLM_TIMEOUT", 120.0)
+# Process-wide cap on in-flight LLM calls (shared by all API requests)
+LLM_MAX_CONCURRENCY = get_int("LLM_MAX_CONCURRENCY", 8)
+# Token bucket: max LLM calls started per second (0 disables the rate limit)
+LLM_RATE_PER_SEC = get_float("LLM_RATE_PER_SEC", 0.0)
+# Retries on throttling / transient errors, with exponential backoff and full jitter
+LLM_MAX_RETRIES = get_int("LLM_MAX_RETRIES", 4)
+LLM_RETRY_BASE_DELAY = get_float("LLM_RETRY_BASE_DELAY", 1.0)
+LLM_RETRY_MAX_DELAY = get_float("LLM_RETRY_MAX_DELAY", 20.0)
+
+# --- LLM Extraction Cache ---
+LLM_CACHE_ENABLED = get_bool("LLM_CACHE_ENABLED", True)
+# SQLite file for the persistent tier (empty string = memory only)
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "data/llm_cache.sqlite3")
+LLM_CACHE_MEMORY_ITEMS = get_int("LLM_CACHE_MEMORY_ITEMS", 512)
+# Entries older than this are dropped (0 = never expire)
+LLM_CACHE_TTL = get_float("LLM_CACHE_TTL", 7 * 24 * 3600)
+LLM_CACHE_MAX_DISK_MB = get_int("LLM_CACHE_MAX_DISK_MB", 256)
+
+# --- Translation Memory (Korean rewrites of bullets / spec keys and values) ---
+TRANSLATION_MEMORY_ENABLED = get_bool("TRANSLATION_MEMORY_ENABLED", True)
+# SQLite file for the persistent tier (empty string = memory only)
+TRANSLATION_MEMORY_PATH = os.getenv("TRANSLATION_MEMORY_PATH", "data/translation_memory.sqlite3")
+TRANSLATION_MEMORY_ITEMS = get_int("TRANSLATION_MEMORY_ITEMS", 50_000)
+# Translations older than this are dropped and rewritten on the next miss (0 = never)
+TRANSLATION_MEMORY_TTL = get_float("TRANSLATION_MEMORY_TTL", 90 * 24 * 3600)
+# The SQLite file is trimmed to this size, least recently used fragments first (0 = unbounded)
+TRANSLATION_MEMORY_MAX_DISK_MB = get_int("TRANSLATION_MEMORY_MAX_DISK_MB", 64)
+
+# --- Raw HTML Snapshots (re-parse / re-extract without refetching) ---
+SNAPSHOT_ENABLED = get_bool("SNAPSHOT_ENABLED", True)
+# zstd blobs under <dir>/<sha256[:2]>/ plus an index.sqlite3
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", "data/snapshots")
+# Snapshots older than this are deleted (0 = keep forever)
+SNAPSHOT_RETENTION_DAYS = get_float("SNAPSHOT_RETENTION_DAYS", 30)
+# Newest snapshots kept per ASIN (0 = all)
+SNAPSHOT_KEEP_PER_ASIN = get_int("SNAPSHOT_KEEP_PER_ASIN", 3)
+SNAPSHOT_ZSTD_LEVEL = get_int("SNAPSHOT_ZSTD_LEVEL", 3)
+# Products reprocessed at once (each holds a decompressed page in memory)
+SNAPSHOT_REPROCESS_CONCURRENCY = get_int("SNAPSHOT_REPROCESS_CONCURRENCY", 4)
+
+# --- Product Result Cache (per ASIN) ---
+PRODUCT_CACHE_ENABLED = get_bool("PRODUCT_CACHE_ENABLED", True)
+# Results younger than this are served without touching Amazon
+PRODUCT_CACHE_TTL = get_float("PRODUCT_CACHE_TTL", 6 * 3600)
+# After PRODUCT_CACHE_TTL, results are still served for this long while being refreshed in the background
+PRODUCT_CACHE_STALE_TTL = get_float("PRODUCT_CACHE_STALE_TTL", 24 * 3600)
+PRODUCT_CACHE_MAX_ITEMS = get_int("PRODUCT_CACHE_MAX_ITEMS", 2000)
+
+# --- LLM Input Compaction ---
+# Rebuilds the LLM input from known page sections (title, bullets, spec tables, ...) without noise
+COMPACTION_ENABLED = get_bool("COMPACTION_ENABLED", True)
+# Max input tokens of the page text sent to the LLM (0 = no limit)
+COMPACTION_TOKEN_BUDGET = get_int("COMPACTION_TOKEN_BUDGET", 3000)
+# "tiktoken" (falls back to an estimate when the encoding cannot be loaded) or "estimate"
+TOKEN_COUNTER = os.getenv("TOKEN_COUNTER", "tiktoken").lower()
+
+# --- Per-Stage Concurrency (0 = unlimited) ---
+STAGE_CONCURRENCY_FETCH = get_int("STAGE_CONCURRENCY_FETCH", 0)
+STAGE_CONCURRENCY_PARSE = get_int("STAGE_CONCURRENCY_PARSE", 0)
+STAGE_CONCURRENCY_EXTRACT = get_int("STAGE_CONCURRENCY_EXTRACT", 0)
+
+# --- Instrumentation ---
+# Adds a Server-Timing header (wall time per workflow node) to /api/v1/product/info responses
+SERVER_TIMING_ENABLED = get_bool("SERVER_TIMING_ENABLED", True)
+
+# --- Job Queue (async batch API) ---
+JOB_DB_PATH = os.getenv("JOB_DB_PATH", "data/jobs.sqlite3")
+# Number of background workers pulling URLs from the queue (0 = only enqueue)
+JOB_WORKERS = get_int("JOB_WORKERS", 4)
+JOB_MAX_ATTEMPTS = get_int("JOB_MAX_ATTEMPTS", 3)
+# Delay before the first retry, doubled on each further attempt (seconds)
+JOB_RETRY_DELAY = get_float("JOB_RETRY_DELAY", 30.0)
+JOB_POLL_INTERVAL = get_float("JOB_POLL_INTERVAL", 1.0)
+# A running item is renewed by its worker every third of this; an item not renewed for this long
+# (its process died) is claimed again by any worker (seconds)
+JOB_LEASE_SECONDS = get_float("JOB_LEASE_SECONDS", 300.0)
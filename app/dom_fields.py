@@ -0,0 +1,190 @@
+import re
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from app.utils import clean_text, maximize_image_url
+
+_OFFSCREEN = ".//span[contains(concat(' ', @class, ' '), ' a-offscreen ')]"
+# (container id, XPath relative to it); None = whole document, only reached on unusual layouts
+PRICE_XPATHS = [
+    ("corePriceDisplay_desktop_feature_div", _OFFSCREEN),
+    ("corePrice_feature_div", _OFFSCREEN),
+    ("corePrice_desktop", _OFFSCREEN),
+    ("apex_desktop", _OFFSCREEN),
+    # #ppd: the product column (title, rating, buy box) on every layout
+    ("ppd", ".//span[contains(concat(' ', @class, ' '), ' a-price ')]/span[contains(concat(' ', @class, ' '), ' a-offscreen ')]"),
+    (None, "//span[contains(concat(' ', @class, ' '), ' a-price ')]/span[contains(concat(' ', @class, ' '), ' a-offscreen ')]"),
+]
+RATING_XPATHS = [
+    ("averageCustomerReviews", ".//span[contains(concat(' ', @class, ' '), ' a-icon-alt ')]"),
+    ("ppd", ".//span[contains(concat(' ', @class, ' '), ' a-icon-alt ')]"),
+    (None, "//span[contains(concat(' ', @class, ' '), ' a-icon-alt ')]"),
+]
+
+CURRENCY_SYMBOLS = [
+    ("US$", "USD"), ("$", "USD"), ("₩", "KRW"), ("€", "EUR"), ("£", "GBP"),
+    ("¥", "JPY"), ("₹", "INR"),
+]
+
+ASIN_KEYS = ("ASIN",)
+BEST_SELLERS_KEYS = ("Best Sellers Rank", "베스트셀러 순위")
+
+# Bidi marks and separators Amazon puts around detail labels ("ASIN ‏ : ‎")
+_LABEL_JUNK = re.compile(r"[\u200e\u200f:\s]+$")
+
+def _text(el) -> str:
+    return clean_text(el.text_content()) if el is not None else ""
+
+def _by_id(root, element_id: str):
+    """
+    Element with the given id, from libxml2's ID index. Much cheaper than
+    get_element_by_id(), which scans the whole document with an XPath on every call.
+    """
+    found = root.xpath("id($id)", id=element_id)
+    return found[0] if found else None
+
+def _has_class(el, name: str) -> bool:
+    return f" {name} " in f" {el.get('class', '')} "
+
+def _first(root, xpaths: List[Tuple[Optional[str], str]]):
+    for container_id, xpath in xpaths:
+        container = root if container_id is None else _by_id(root, container_id)
+        if container is None:
+            continue
+        for el in container.xpath(xpath):
+            if _text(el):
+                return el
+    return None
+
+def _own_text(el) -> str:
+    """Text of an element without the text of its child elements (but with their tails)."""
+    parts = [el.text or ""]
+    parts.extend(child.tail or "" for child in el)
+    return clean_text(" ".join(parts))
+
+def _detail_rows(root) -> Iterator[Tuple[str, Any]]:
+    """Yields (label, value element) pairs from the product detail tables and bullet lists."""
+    # Tag-filtered iteration runs in C; only <table> elements become Python objects
+    for table in root.iter("table"):
+        if not table.get("id", "").startswith("productDetails"):
+            continue
+        for row in table.iter("tr"):
+            th = row.find("th")
+            td = row.find("td")
+            if th is not None and td is not None:
+                yield _LABEL_JUNK.sub("", _text(th)), td
+    bullets = _by_id(root, "detailBullets_feature_div")
+    if bullets is None:
+        return
+    for item in bullets.iter("span"):
+        if not _has_class(item, "a-list-item"):
+            continue
+        label = [child for child in item.iterchildren("span") if _has_class(child, "a-text-bold")]
+        if label:
+            yield _LABEL_JUNK.sub("", _text(label[0])), item
+
+def parse_currency(price: Optional[str]) -> Optional[str]:
+    """Guesses the ISO currency code from a price string like "$15.99" or "KRW 117,952"."""
+    if not price:
+        return None
+    code = re.search(r"\b([A-Z]{3})\b", price)
+    if code:
+        return code.group(1)
+    for symbol, iso in CURRENCY_SYMBOLS:
+        if symbol in price:
+            return iso
+    return None
+
+def parse_review_count(text: str) -> Optional[int]:
+    digits = re.sub(r"[^\d]", "", text)
+    return int(digits) if digits else None
+
+def parse_brand(root) -> Optional[str]:
+    for row in root.iter("tr"):
+        if _has_class(row, "po-brand"):
+            cells = row.findall("td")
+            if len(cells) > 1 and _text(cells[1]):
+                return _text(cells[1])
+    byline = _text(_by_id(root, "bylineInfo"))
+    if not byline:
+        return None
+    # "Visit the X Store", "Brand: X", "방문하기: X 스토어"
+    for pattern in (r"^Visit the (.+?) Store$", r"^Brand:\s*(.+)$", r"^방문하기:\s*(.+?)\s*스토어$", r"^브랜드:\s*(.+)$"):
+        match = re.match(pattern, byline)
+        if match:
+            return match.group(1).strip()
+    return byline
+
+def parse_best_sellers_rank(value_el) -> List[str]:
+    ranks = []
+    for el in value_el.iter("span", "li"):
+        text = _own_text(el)
+        if not re.search(r"#\s?[\d,]+", text):
+            continue
+        # Drop "(See Top 100 in ...)" links
+        text = clean_text(re.sub(r"\(.*?\)|[()]", " ", text))
+        if text and text not in ranks:
+            ranks.append(text)
+    return ranks
+
+def extract_dom_fields(root) -> Dict[str, Any]:
+    """
+    Reads the structured ProductResponse fields straight from an lxml document.
+    Fields that are not on the page are left out, so the caller can fall back to other sources.
+    """
+    fields: Dict[str, Any] = {}
+
+    for asin_input in root.iter("input"):
+        if "ASIN" in (asin_input.get("id"), asin_input.get("name")) and asin_input.get("value", "").strip():
+            fields["asin"] = asin_input.get("value").strip()
+            break
+
+    price = _text(_first(root, PRICE_XPATHS))
+    if price:
+        fields["price"] = price
+        currency = parse_currency(price)
+        if currency:
+            fields["currency"] = currency
+
+    popover = _by_id(root, "acrPopover")
+    rating = clean_text(popover.get("title", "")) if popover is not None else ""
+    if not rating:
+        rating = _text(_first(root, RATING_XPATHS))
+    if rating:
+        fields["rating"] = rating
+
+    review_count = parse_review_count(_text(_by_id(root, "acrCustomerReviewText")))
+    if review_count is not None:
+        fields["review_count"] = review_count
+
+    availability = _text(_by_id(root, "availability"))
+    if availability:
+        fields["availability"] = availability
+
+    brand = parse_brand(root)
+    if brand:
+        fields["brand"] = brand
+
+    wayfinding = _by_id(root, "wayfinding-breadcrumbs_feature_div")
+    breadcrumbs = [_text(a) for a in wayfinding.iter("a")] if wayfinding is not None else []
+    breadcrumbs = [b for b in breadcrumbs if b]
+    if breadcrumbs:
+        fields["breadcrumbs"] = breadcrumbs
+
+    for label, value_el in _detail_rows(root):
+        if "asin" not in fields and label in ASIN_KEYS:
+            asin = _text(value_el).replace(label, "").strip(" :\u200e\u200f")
+            if asin:
+                fields["asin"] = asin
+        elif "best_sellers_rank" not in fields and any(key in label for key in BEST_SELLERS_KEYS):
+            ranks = parse_best_sellers_rank(value_el)
+            if ranks:
+                fields["best_sellers_rank"] = ranks
+
+    for image_id in ("landingImage", "imgBlkFront"):
+        landing = _by_id(root, image_id)
+        if landing is not None:
+            image_url = maximize_image_url(landing.get("data-old-hires") or landing.get("src"))
+            if image_url and not image_url.startswith("data:"):
+                fields["image_url"] = image_url
+                break
+
+    return fields
@@ -1,22 +1,49 @@
+import asyncio
 from langgraph.graph import StateGraph, END
-from app.nodes import GraphState, fetch_page, parse_html, extract_with_llm
+from app.nodes import GraphState, fetch_page, parse_html, compact_text, extract_with_llm
+from app import config
+from app.metrics import instrument
 
-def create_workflow():
+def limit_concurrency(node, limit: int):
+    """Wraps a node so at most `limit` calls run at once across all workflow runs (0 = unlimited)."""
+    if limit <= 0:
+        return node
+    semaphore = asyncio.Semaphore(limit)
+    if asyncio.iscoroutinefunction(node):
+        async def limited(state: GraphState) -> GraphState:
+            async with semaphore:
+                return await node(state)
+    else:
+        async def limited(state: GraphState) -> GraphState:
+            async with semaphore:
+                return await asyncio.to_thread(node, state)
+    return limited
+
+def create_workflow(entry_point: str = "fetch"):
+    """
+    fetch -> parse -> compact -> extract.
+    entry_point="parse" skips the fetch: the state must already carry html_content (e.g. a stored snapshot).
+    """
     workflow = StateGraph(GraphState)
     
-    workflow.add_node("fetch", fetch_page)
-    workflow.add_node("parse", parse_html)
-    workflow.add_node("extract", extract_with_llm)
+    # Timings exclude the wait for a stage slot (instrument sits inside limit_concurrency)
+    workflow.add_node("fetch", limit_concurrency(instrument("fetch", fetch_page), config.STAGE_CONCURRENCY_FETCH))
+    workflow.add_node("parse", limit_concurrency(instrument("parse", parse_html), config.STAGE_CONCURRENCY_PARSE))
+    workflow.add_node("compact", instrument("compact", compact_text))
+    workflow.add_node("extract", limit_concurrency(instrument("extract", extract_with_llm), config.STAGE_CONCURRENCY_EXTRACT))
     
     # Define edges
-    workflow.set_entry_point("fetch")
+    workflow.set_entry_point(entry_point)
     
     # Conditional edge or direct? 
-    # For now linear: fetch -> parse -> extract
+    # For now linear: fetch -> parse -> compact -> extract
     workflow.add_edge("fetch", "parse")
-    workflow.add_edge("parse", "extract")
+    workflow.add_edge("parse", "compact")
+    workflow.add_edge("compact", "extract")
     workflow.add_edge("extract", END)
     
     return workflow.compile()
 
 app_workflow = create_workflow()
+# Re-runs parse / compact / extract on stored HTML (see app/snapshots.py)
+reprocess_workflow = create_workflow(entry_point="parse")
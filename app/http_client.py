@@ -0,0 +1,95 @@
+import asyncio
+from typing import Optional, Tuple
+import httpx
+from app import config
+from app.metrics import FETCH_BYTES
+from app.utils import get_headers, is_captcha_page, missing_sections
+
+# Headers from get_headers() that httpx manages itself (HTTP/2 forbids Connection,
+# and "br" would only decode if brotli is installed)
+_TRANSPORT_HEADERS = ("Accept-Encoding", "Connection")
+
+# Answers that mean "slow down" rather than "this page is broken"
+BLOCK_STATUS_CODES = {429, 503}
+
+def is_block_reason(reason: str) -> bool:
+    """True for fetch failures that should make us back off from the host: captcha, 429/503, timeouts."""
+    if reason == "captcha":
+        return True
+    if reason.startswith("http status "):
+        return int(reason.rsplit(" ", 1)[1]) in BLOCK_STATUS_CODES
+    return "timeout" in reason.lower()
+
+class HttpFetcher:
+    """
+    Pooled async HTTP client for the plain-HTTP fast path.
+    Connections are kept alive (HTTP/2 when the server supports it) across fetches.
+    """
+
+    def __init__(
+        self,
+        timeout: float = config.FETCH_HTTP_TIMEOUT,
+        max_connections: int = config.FETCH_HTTP_MAX_CONNECTIONS,
+        http2: bool = config.FETCH_HTTP2,
+    ):
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.http2 = http2
+        self._client: Optional[httpx.AsyncClient] = None
+        self._lock = asyncio.Lock()
+
+    async def start(self):
+        async with self._lock:
+            if self._client is not None:
+                return
+            self._client = httpx.AsyncClient(
+                http2=self.http2,
+                timeout=self.timeout,
+                follow_redirects=True,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+            )
+
+    async def stop(self):
+        async with self._lock:
+            if self._client is None:
+                return
+            await self._client.aclose()
+            self._client = None
+
+    async def get(self, url: str) -> httpx.Response:
+        """GETs a URL with freshly rotated browser-like headers."""
+        if self._client is None:
+            await self.start()
+        headers = {k: v for k, v in get_headers().items() if k not in _TRANSPORT_HEADERS}
+        return await self._client.get(url, headers=headers)
+
+    async def fetch_html(self, url: str) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Tries to fetch a product page without a browser.
+        Returns (html, None) on success, or (None, reason) when the caller should escalate to Playwright.
+        """
+        try:
+            response = await self.get(url)
+        except Exception as e:
+            return None, f"http error: {e.__class__.__name__}: {e}"
+
+        FETCH_BYTES.labels("http").observe(response.num_bytes_downloaded)
+        if response.status_code != 200:
+            return None, f"http status {response.status_code}"
+
+        html = response.text
+        if is_captcha_page(html):
+            return None, "captcha"
+
+        missing = missing_sections(html, config.FETCH_HTTP_REQUIRED_IDS)
+        if missing:
+            return None, f"missing sections: {', '.join(missing)}"
+
+        return html, None
+
+
+# Shared client, started/stopped with the FastAPI app lifespan
+http_fetcher = HttpFetcher()
@@ -0,0 +1,347 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+from app import config
+from app.models import ProductResponse, ProductResult
+from app.pipeline import crawl_product
+
+class JobQueue:
+    """
+    Durable job queue on SQLite. A job is a batch of URLs; every URL is a job item
+    that moves queued -> running -> done / failed (or back to queued for a retry).
+    A running item is leased to one worker: the worker renews the lease while it works,
+    and an item whose lease expired (its process died) can be claimed again by any process.
+    """
+
+    def __init__(self, path: str = config.JOB_DB_PATH, lease_seconds: float = config.JOB_LEASE_SECONDS):
+        self.path = path
+        self.lease_seconds = max(1.0, lease_seconds)
+        self._db: Optional[sqlite3.Connection] = None
+        # Every queue operation runs in to_thread on this connection
+        self._db_lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    total INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS job_items (
+                    job_id TEXT NOT NULL,
+                    idx INTEGER NOT NULL,
+                    url TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    next_attempt_at REAL NOT NULL DEFAULT 0,
+                    result TEXT,
+                    error TEXT,
+                    elapsed_ms REAL,
+                    claim_id TEXT,
+                    claimed_at REAL,
+                    PRIMARY KEY (job_id, idx)
+                );
+                CREATE INDEX IF NOT EXISTS job_items_status ON job_items (status, next_attempt_at);
+                """
+            )
+            # Queues created before leases were added
+            columns = {row[1] for row in self._db.execute("PRAGMA table_info(job_items)")}
+            for column, kind in (("claim_id", "TEXT"), ("claimed_at", "REAL")):
+                if column not in columns:
+                    self._db.execute(f"ALTER TABLE job_items ADD COLUMN {column} {kind}")
+            self._db.commit()
+        return self._db
+
+    def _run(self, fn, *args):
+        with self._db_lock:
+            return fn(self._connect(), *args)
+
+    # --- Operations (each runs inside the lock, in a worker thread) ---
+
+    @staticmethod
+    def _submit(db: sqlite3.Connection, urls: List[str]) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        db.execute("INSERT INTO jobs (id, total, created_at, updated_at) VALUES (?, ?, ?, ?)", (job_id, len(urls), now, now))
+        db.executemany(
+            "INSERT INTO job_items (job_id, idx, url, status) VALUES (?, ?, ?, 'queued')",
+            [(job_id, index, url) for index, url in enumerate(urls)],
+        )
+        db.commit()
+        return job_id
+
+    @staticmethod
+    def _recover(db: sqlite3.Connection, lease_seconds: float) -> int:
+        # Items whose worker stopped renewing the lease (the process died) are queued again.
+        # Items leased by live workers, in this or another process, are left alone.
+        cursor = db.execute(
+            "UPDATE job_items SET status = 'queued', claim_id = NULL WHERE status = 'running' AND COALESCE(claimed_at, 0) <= ?",
+            (time.time() - lease_seconds,),
+        )
+        db.commit()
+        return cursor.rowcount
+
+    @staticmethod
+    def _claim(db: sqlite3.Connection, lease_seconds: float) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        # Expired leases first, then queued items that are due
+        candidates = db.execute(
+            "SELECT job_id, idx, url, attempts, status FROM job_items WHERE status = 'running' AND COALESCE(claimed_at, 0) <= ? "
+            "ORDER BY claimed_at LIMIT 8",
+            (now - lease_seconds,),
+        ).fetchall()
+        candidates += db.execute(
+            "SELECT job_id, idx, url, attempts, status FROM job_items WHERE status = 'queued' AND next_attempt_at <= ? "
+            "ORDER BY next_attempt_at, rowid LIMIT 8",
+            (now,),
+        ).fetchall()
+        for job_id, index, url, attempts, status in candidates:
+            claim_id = uuid.uuid4().hex
+            # Conditional update: another process may have claimed the item since the SELECT
+            cursor = db.execute(
+                "UPDATE job_items SET status = 'running', attempts = attempts + 1, claim_id = ?, claimed_at = ? "
+                "WHERE job_id = ? AND idx = ? AND status = ? AND attempts = ?",
+                (claim_id, now, job_id, index, status, attempts),
+            )
+            db.commit()
+            if cursor.rowcount == 1:
+                return {"job_id": job_id, "index": index, "url": url, "attempts": attempts + 1, "claim_id": claim_id}
+        return None
+
+    @staticmethod
+    def _renew(db: sqlite3.Connection, item: Dict[str, Any]) -> bool:
+        cursor = db.execute(
+            "UPDATE job_items SET claimed_at = ? WHERE job_id = ? AND idx = ? AND claim_id = ? AND status = 'running'",
+            (time.time(), item["job_id"], item["index"], item["claim_id"]),
+        )
+        db.commit()
+        return cursor.rowcount == 1
+
+    @staticmethod
+    def _release(db: sqlite3.Connection, items: List[Dict[str, Any]]):
+        # Items abandoned by a clean shutdown are queued again right away (without using up an attempt)
+        db.executemany(
+            "UPDATE job_items SET status = 'queued', attempts = attempts - 1, claim_id = NULL "
+            "WHERE job_id = ? AND idx = ? AND claim_id = ? AND status = 'running'",
+            [(item["job_id"], item["index"], item["claim_id"]) for item in items],
+        )
+        db.commit()
+
+    @staticmethod
+    def _finish(db: sqlite3.Connection, item: Dict[str, Any], status: str, result: Optional[str], error: Optional[str], elapsed_ms: float, retry_at: float) -> bool:
+        cursor = db.execute(
+            "UPDATE job_items SET status = ?, result = ?, error = ?, elapsed_ms = ?, next_attempt_at = ?, claim_id = NULL "
+            "WHERE job_id = ? AND idx = ? AND claim_id = ? AND status = 'running'",
+            (status, result, error, elapsed_ms, retry_at, item["job_id"], item["index"], item["claim_id"]),
+        )
+        if cursor.rowcount == 0:
+            # The lease expired and another worker owns the item now; its result wins
+            db.commit()
+            return False
+        db.execute("UPDATE jobs SET updated_at = ? WHERE id = ?", (time.time(), item["job_id"]))
+        db.commit()
+        return True
+
+    @staticmethod
+    def _status(db: sqlite3.Connection, job_id: str) -> Optional[Dict[str, Any]]:
+        job = db.execute("SELECT total, created_at, updated_at FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if job is None:
+            return None
+        counts = dict(db.execute("SELECT status, COUNT(*) FROM job_items WHERE job_id = ? GROUP BY status", (job_id,)).fetchall())
+        total, created_at, updated_at = job
+        finished = counts.get("done", 0) + counts.get("failed", 0)
+        if finished == total:
+            status = "completed"
+        elif counts.get("running") or finished:
+            status = "running"
+        else:
+            status = "queued"
+        return {
+            "job_id": job_id,
+            "status": status,
+            "total": total,
+            "queued": counts.get("queued", 0),
+            "running": counts.get("running", 0),
+            "done": counts.get("done", 0),
+            "failed": counts.get("failed", 0),
+            "created_at": created_at,
+            "updated_at": updated_at,
+        }
+
+    @staticmethod
+    def _results(db: sqlite3.Connection, job_id: str) -> List[tuple]:
+        return db.execute(
+            "SELECT idx, url, status, result, error, elapsed_ms FROM job_items "
+            "WHERE job_id = ? AND status IN ('done', 'failed') ORDER BY idx",
+            (job_id,),
+        ).fetchall()
+
+    # --- Public API ---
+
+    async def submit(self, urls: List[str]) -> str:
+        return await asyncio.to_thread(self._run, self._submit, urls)
+
+    async def recover(self) -> int:
+        return await asyncio.to_thread(self._run, self._recover, self.lease_seconds)
+
+    async def claim(self) -> Optional[Dict[str, Any]]:
+        return await asyncio.to_thread(self._run, self._claim, self.lease_seconds)
+
+    async def renew(self, item: Dict[str, Any]) -> bool:
+        """Extends the lease of a claimed item; False if it was lost to another worker."""
+        return await asyncio.to_thread(self._run, self._renew, item)
+
+    async def release(self, items: List[Dict[str, Any]]):
+        if items:
+            await asyncio.to_thread(self._run, self._release, items)
+
+    async def complete(self, item: Dict[str, Any], product: ProductResponse, elapsed_ms: float) -> bool:
+        return await asyncio.to_thread(self._run, self._finish, item, "done", product.model_dump_json(), None, elapsed_ms, 0)
+
+    async def fail(self, item: Dict[str, Any], error: str, elapsed_ms: float, retry_at: Optional[float] = None) -> bool:
+        """Marks an item failed, or queues it again if retry_at is given."""
+        status = "queued" if retry_at is not None else "failed"
+        return await asyncio.to_thread(self._run, self._finish, item, status, None, error, elapsed_ms, retry_at or 0)
+
+    async def status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await asyncio.to_thread(self._run, self._status, job_id)
+
+    async def results(self, job_id: str) -> List[ProductResult]:
+        rows = await asyncio.to_thread(self._run, self._results, job_id)
+        results = []
+        for index, url, status, result, error, elapsed_ms in rows:
+            if status == "done":
+                product = ProductResponse(**json.loads(result))
+                results.append(ProductResult(index=index, url=url, status="ok", product=product, elapsed_ms=elapsed_ms or 0))
+            else:
+                results.append(ProductResult(index=index, url=url, status="error", error=error, elapsed_ms=elapsed_ms or 0))
+        return results
+
+    def close(self):
+        with self._db_lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+class JobWorkerPool:
+    """Background workers that pull job items from the queue and run the crawl workflow."""
+
+    def __init__(
+        self,
+        queue: JobQueue,
+        workers: int = config.JOB_WORKERS,
+        max_attempts: int = config.JOB_MAX_ATTEMPTS,
+        retry_delay: float = config.JOB_RETRY_DELAY,
+        poll_interval: float = config.JOB_POLL_INTERVAL,
+    ):
+        self.queue = queue
+        self.workers = max(0, workers)
+        self.max_attempts = max(1, max_attempts)
+        self.retry_delay = retry_delay
+        self.poll_interval = poll_interval
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup = asyncio.Event()
+        # Items claimed by this pool's workers, by worker number
+        self._claimed: Dict[int, Dict[str, Any]] = {}
+
+    async def start(self):
+        recovered = await self.queue.recover()
+        if recovered:
+            print(f"Resuming {recovered} job item(s) whose worker died")
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        # Items this pool was working on are queued again for the next start or another process
+        await self.queue.release(list(self._claimed.values()))
+        self._claimed.clear()
+
+    def notify(self):
+        """Wakes idle workers (called after a submit)."""
+        self._wakeup.set()
+
+    async def _worker(self, number: int):
+        while True:
+            try:
+                item = await self.queue.claim()
+            except sqlite3.Error as e:
+                print(f"Job worker #{number}: queue error: {e}")
+                item = None
+
+            if item is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            self._claimed[number] = item
+            try:
+                await self._process(item)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # e.g. the queue write of the result failed; the item's lease expires and it is claimed again
+                print(f"Job worker #{number}: error while processing {item['job_id']}#{item['index']}: {e.__class__.__name__}: {e}")
+            self._claimed.pop(number, None)
+
+    async def _keep_lease(self, item: Dict[str, Any]):
+        while True:
+            await asyncio.sleep(self.queue.lease_seconds / 3)
+            try:
+                if not await self.queue.renew(item):
+                    print(f"Job item {item['job_id']}#{item['index']}: lease lost to another worker")
+                    return
+            except sqlite3.Error as e:
+                print(f"Job item {item['job_id']}#{item['index']}: lease renewal failed: {e}")
+
+    async def _process(self, item: Dict[str, Any]):
+        start = time.perf_counter()
+        lease = asyncio.create_task(self._keep_lease(item))
+        try:
+            final_state = await crawl_product(item["url"])
+            error = final_state.get("error")
+            product = final_state.get("product_data")
+            if not error and product is None:
+                error = "No product data extracted"
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            error, product = f"{e.__class__.__name__}: {e}", None
+        finally:
+            lease.cancel()
+
+        elapsed_ms = round((time.perf_counter() - start) * 1000, 1)
+        if not error:
+            stored = await self.queue.complete(item, product, elapsed_ms)
+        elif item["attempts"] < self.max_attempts:
+            # Exponential backoff between attempts
+            retry_at = time.time() + self.retry_delay * (2 ** (item["attempts"] - 1))
+            print(f"Job item {item['job_id']}#{item['index']} failed (attempt {item['attempts']}), retrying: {error}")
+            stored = await self.queue.fail(item, error, elapsed_ms, retry_at=retry_at)
+        else:
+            stored = await self.queue.fail(item, error, elapsed_ms)
+        if not stored:
+            print(f"Job item {item['job_id']}#{item['index']}: lease expired while running, result dropped")
+
+
+job_queue = JobQueue()
+job_workers = JobWorkerPool(job_queue)
@@ -0,0 +1,232 @@
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Dict
+from app import config
+from app.metrics import FETCH_ATTEMPTS, FETCH_HOST_LIMIT
+
+class AsyncLimiter:
+    """
+    Process-wide limiter: caps the number of concurrent calls (semaphore) and,
+    optionally, the number of calls started per second (token bucket).
+
+    Usage:
+        async with limiter:
+            await call()
+    """
+
+    def __init__(self, max_concurrency: int, rate_per_sec: float = 0.0, burst: int = 1):
+        self.max_concurrency = max(1, max_concurrency)
+        self.rate_per_sec = rate_per_sec
+        self.burst = max(1, burst)
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._bucket_lock = asyncio.Lock()
+        self.in_flight = 0
+        self.waiting = 0
+
+    async def _take_token(self):
+        if self.rate_per_sec <= 0:
+            return
+        async with self._bucket_lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate_per_sec)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate_per_sec)
+
+    async def __aenter__(self):
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+            try:
+                await self._take_token()
+            except BaseException:
+                self._semaphore.release()
+                raise
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.in_flight -= 1
+        self._semaphore.release()
+        return False
+
+
+class HostSlot:
+    """One fetch holding a host slot. The fetch reports how the host answered."""
+
+    def __init__(self, host: str, started_at: float):
+        self.host = host
+        self.started_at = started_at
+        self.blocked = False
+        self.succeeded = False
+
+    def block(self):
+        """Captcha, 429/503 or timeout: the host wants us to slow down."""
+        self.blocked = True
+
+    def success(self):
+        self.succeeded = True
+
+    @property
+    def outcome(self) -> str:
+        # A block seen on any tier wins over a later success on another tier
+        if self.blocked:
+            return "blocked"
+        return "ok" if self.succeeded else "error"
+
+
+class AdaptiveLimiter:
+    """
+    AIMD concurrency limit for one host, like TCP congestion control:
+    - every success raises the limit by increase / limit (about +increase per `limit` successes)
+    - a block multiplies the limit by `decrease` and pauses new fetches for `cooldown` seconds
+    Blocks of fetches that started before the last decrease are not counted again,
+    so one burst of captchas only halves the limit once.
+    """
+
+    def __init__(
+        self,
+        initial: float,
+        min_limit: float = 1,
+        max_limit: float = 16,
+        increase: float = 1.0,
+        decrease: float = 0.5,
+        cooldown: float = 0.0,
+        window: int = 100,
+    ):
+        self.min_limit = max(1.0, float(min_limit))
+        self.max_limit = max(self.min_limit, float(max_limit))
+        self.limit = min(self.max_limit, max(self.min_limit, float(initial)))
+        self.increase = increase
+        self.decrease = decrease
+        self.cooldown = cooldown
+        self._condition = asyncio.Condition()
+        self._paused_until = 0.0
+        self._last_decrease = 0.0
+        # Outcomes of the last `window` fetches (True = blocked), for the block rate
+        self._recent = deque(maxlen=max(1, window))
+
+        self.in_flight = 0
+        self.waiting = 0
+        self.successes = 0
+        self.blocks = 0
+        self.errors = 0
+
+    async def acquire(self) -> float:
+        """Waits for a free slot; returns the start time to pass to release()."""
+        async with self._condition:
+            self.waiting += 1
+            try:
+                while True:
+                    pause = self._paused_until - time.monotonic()
+                    if pause > 0:
+                        try:
+                            await asyncio.wait_for(self._condition.wait(), timeout=pause)
+                        except asyncio.TimeoutError:
+                            pass
+                        continue
+                    if self.in_flight < int(self.limit):
+                        break
+                    await self._condition.wait()
+            finally:
+                self.waiting -= 1
+            self.in_flight += 1
+            return time.monotonic()
+
+    async def release(self, started_at: float, outcome: str):
+        """outcome: "ok" (ramp up), "blocked" (back off) or "error" (no change)."""
+        async with self._condition:
+            self.in_flight -= 1
+            if outcome == "ok":
+                self.successes += 1
+                self._recent.append(False)
+                self.limit = min(self.max_limit, self.limit + self.increase / self.limit)
+            elif outcome == "blocked":
+                self.blocks += 1
+                self._recent.append(True)
+                if started_at >= self._last_decrease:
+                    now = time.monotonic()
+                    self.limit = max(self.min_limit, self.limit * self.decrease)
+                    self._last_decrease = now
+                    self._paused_until = now + self.cooldown
+            else:
+                self.errors += 1
+            self._condition.notify_all()
+
+    @property
+    def block_rate(self) -> float:
+        """Share of blocked fetches among the recent ones."""
+        return sum(self._recent) / len(self._recent) if self._recent else 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limit": round(self.limit, 2),
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "successes": self.successes,
+            "blocks": self.blocks,
+            "errors": self.errors,
+            "block_rate": round(self.block_rate, 4),
+            "paused_for": round(max(0.0, self._paused_until - time.monotonic()), 1),
+        }
+
+
+class HostLimiters:
+    """
+    One AdaptiveLimiter per host for outbound page fetches.
+
+    Usage:
+        async with fetch_limiter.slot(host) as slot:
+            ...
+            slot.block() / slot.success()
+    """
+
+    def __init__(
+        self,
+        enabled: bool = config.FETCH_ADAPTIVE_ENABLED,
+        initial: int = config.FETCH_HOST_INITIAL_CONCURRENCY,
+        min_limit: int = config.FETCH_HOST_MIN_CONCURRENCY,
+        max_limit: int = config.FETCH_HOST_MAX_CONCURRENCY,
+        decrease: float = config.FETCH_HOST_DECREASE,
+        cooldown: float = config.FETCH_BLOCK_COOLDOWN,
+    ):
+        self.enabled = enabled
+        self.settings = {"initial": initial, "min_limit": min_limit, "max_limit": max_limit, "decrease": decrease, "cooldown": cooldown}
+        self._hosts: Dict[str, AdaptiveLimiter] = {}
+
+    def get(self, host: str) -> AdaptiveLimiter:
+        limiter = self._hosts.get(host)
+        if limiter is None:
+            limiter = self._hosts[host] = AdaptiveLimiter(**self.settings)
+        return limiter
+
+    @asynccontextmanager
+    async def slot(self, host: str):
+        if not self.enabled:
+            yield HostSlot(host, time.monotonic())
+            return
+        limiter = self.get(host)
+        started_at = await limiter.acquire()
+        slot = HostSlot(host, started_at)
+        try:
+            yield slot
+        finally:
+            await limiter.release(started_at, slot.outcome)
+            FETCH_HOST_LIMIT.labels(host).set(limiter.limit)
+            FETCH_ATTEMPTS.labels(host, slot.outcome).inc()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"enabled": self.enabled, "hosts": {host: limiter.stats() for host, limiter in self._hosts.items()}}
+
+
+# Shared by every page fetch (HTTP fast path and browser)
+fetch_limiter = HostLimiters()
@@ -0,0 +1,65 @@
+import asyncio
+import random
+import httpx
+from langserve import RemoteRunnable
+from app import config
+from app.limiter import AsyncLimiter
+
+# --- Remote API via RemoteRunnable ---
+# Standard LangServe: client = RemoteRunnable("http://.../chain") -> calls /chain/invoke
+# Created once per process so the underlying httpx clients (and their keep-alive
+# connections) are shared by every extraction.
+base_llm = RemoteRunnable(
+    url=config.BEDROCK_URL,
+    headers={"x-api-key": config.BEDROCK_API_KEY},
+    timeout=config.LLM_TIMEOUT,
+    client_kwargs={
+        "limits": httpx.Limits(
+            max_connections=config.LLM_MAX_CONCURRENCY,
+            max_keepalive_connections=config.LLM_MAX_CONCURRENCY,
+        ),
+    },
+)
+
+llm = base_llm.with_config(configurable={"model_id": config.BEDROCK_MODEL_ID})
+
+async def close_llm():
+    """Closes the LLM keep-alive connections while their event loop is still running."""
+    await base_llm.async_client.aclose()
+
+# Shared by all concurrent API requests / workers
+llm_limiter = AsyncLimiter(config.LLM_MAX_CONCURRENCY, config.LLM_RATE_PER_SEC)
+
+THROTTLING_STATUS_CODES = {429, 502, 503, 504}
+THROTTLING_MARKERS = ("ThrottlingException", "Too many requests", "Rate exceeded", "ServiceUnavailable")
+
+def is_retryable_error(error: Exception) -> bool:
+    """True for Bedrock throttling and transient network errors."""
+    if isinstance(error, httpx.HTTPStatusError):
+        if error.response.status_code in THROTTLING_STATUS_CODES:
+            return True
+    if isinstance(error, (httpx.TimeoutException, httpx.NetworkError)):
+        return True
+    message = str(error)
+    return any(marker.lower() in message.lower() for marker in THROTTLING_MARKERS)
+
+def backoff_delay(attempt: int) -> float:
+    """Exponential backoff with full jitter."""
+    cap = min(config.LLM_RETRY_MAX_DELAY, config.LLM_RETRY_BASE_DELAY * (2 ** attempt))
+    return random.uniform(0, cap)
+
+async def ainvoke_llm(messages):
+    """Calls the LLM behind the process-wide limiter, retrying throttled calls."""
+    attempt = 0
+    while True:
+        try:
+            async with llm_limiter:
+                return await llm.ainvoke(messages)
+        except Exception as e:
+            if attempt >= config.LLM_MAX_RETRIES or not is_retryable_error(e):
+                raise
+            delay = backoff_delay(attempt)
+            print(f"LLM call throttled/failed ({e.__class__.__name__}), retrying in {delay:.1f}s")
+            attempt += 1
+            # Sleep outside the limiter so other calls can use the slot
+            await asyncio.sleep(delay)
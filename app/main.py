@@ -1,49 +1,78 @@
-from typing import List
+from typing import List, Optional
 import asyncio
-from fastapi import FastAPI, HTTPException
-from app.models import ProductRequest, ProductResponse
-from app.graph import app_workflow
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from app import config
+from app.models import ProductRequest, ProductResponse, ProductResult, JobSubmitResponse, JobStatus, JobResults, SnapshotInfo, ReprocessRequest
+from app.pipeline import crawl_product, reprocess_product, process_url_result, product_cache
+from app.browser import browser_pool
+from app.http_client import http_fetcher
+from app.parse_pool import parse_pool
+from app.limiter import fetch_limiter
+from app.cache import llm_cache
+from app.llm import close_llm
+from app.translation_memory import translation_memory
+from app.snapshots import snapshot_store
+from app.jobs import job_queue, job_workers
+from app.metrics import server_timing
 import uvicorn
 
-app = FastAPI(title="Amazon Product Crawler API", description="API to crawl Amazon products using LangGraph and Bedrock")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Start Chromium once and reuse it for every fetch
+    if config.BROWSER_ENABLED:
+        await browser_pool.start()
+    await http_fetcher.start()
+    await parse_pool.start()
+    # Applies the snapshot retention policy left over from the last run
+    if snapshot_store.enabled:
+        await snapshot_store.prune()
+    # Resumes job items interrupted by a crash/restart
+    await job_workers.start()
+    try:
+        yield
+    finally:
+        await job_workers.stop()
+        job_queue.close()
+        await http_fetcher.stop()
+        await parse_pool.stop()
+        await browser_pool.stop()
+        await product_cache.close()
+        await close_llm()
+        await llm_cache.close()
+        await translation_memory.close()
+        await snapshot_store.close()
+
+app = FastAPI(title="Amazon Product Crawler API", description="API to crawl Amazon products using LangGraph and Bedrock", lifespan=lifespan)
 
 @app.post("/api/v1/product/info", response_model=List[ProductResponse])
-async def get_product_info(request: ProductRequest):
+async def get_product_info(request: ProductRequest, response: Response):
     """
     Crawls an Amazon product page and returns structured data.
     """
-    async def process_url(url: str):
-        initial_state = {
-            "url": str(url),
-            "html_content": None,
-            "clean_text": None,
-            "product_data": None,
-            "error": None
-        }
-        
-        # Run the workflow
-        final_state = await app_workflow.ainvoke(initial_state)
+    timings = []
+    
+    async def process_url(index: int, url: str):
+        # Canonicalized to the ASIN, served from the product cache or shared with
+        # an in-flight run for the same product
+        final_state = await crawl_product(str(url))
+        # One Server-Timing entry per node; prefixed with the URL index for batches
+        prefix = f"url{index}-" if len(request.urls) > 1 else ""
+        timings.append((index, server_timing(final_state.get("timings"), prefix)))
         
         if final_state.get("error"):
-            # Instead of raising http exception immediately, we might want to return the error
-            # For now, let's log it or return a partial result? 
-            # The prompt implies we want to handle list input. 
-            # If one fails, we probably shouldn't fail all.
-            # But the user rule says "return structured data".
-            # Let's assume we return successfully processed ones or handle errors gracefully?
-            # Or raise 500 if one fail? 
-            # "Exception handling: network error ... try-except".
-            # Let's return None or an error object if possible, but the response model is ProductResponse.
-            # If we strictly follow ProductResponse, we might need a dummy object or change response model to allow errors.
-            # However, looking at ProductResponse, it has many Optional fields.
-            # Let's try to return what we have.
+            # If one fails, we shouldn't fail all: log it and skip this URL
             print(f"Error processing {url}: {final_state['error']}")
             return None 
 
         return final_state.get("product_data")
 
     # Process all URLs concurrently
-    results = await asyncio.gather(*(process_url(url) for url in request.urls))
+    results = await asyncio.gather(*(process_url(i, url) for i, url in enumerate(request.urls)))
+    if config.SERVER_TIMING_ENABLED and timings:
+        response.headers["Server-Timing"] = ", ".join(value for _, value in sorted(timings))
     
     # Filter out None results or handle them. 
     # If we want to return helpful errors for specific URLs, we would need a wrapper model.
@@ -56,6 +85,107 @@ async def get_product_info(request: ProductRequest):
          
     return successful_results
 
+@app.post(
+    "/api/v1/product/info/stream",
+    response_class=StreamingResponse,
+    responses={200: {"description": "One ProductResult per line", "content": {"application/x-ndjson": {}, "text/event-stream": {}}}},
+)
+async def stream_product_info(request: ProductRequest, http_request: Request, output_format: Optional[str] = Query(None, alias="format")):
+    """
+    Streams one ProductResult per URL as soon as its workflow completes.
+    NDJSON by default; Server-Sent Events with ?format=sse or "Accept: text/event-stream".
+    If the client disconnects, the remaining work is cancelled.
+    """
+    use_sse = output_format == "sse" or "text/event-stream" in http_request.headers.get("accept", "")
+
+    async def results():
+        tasks = [asyncio.create_task(process_url_result(i, str(url))) for i, url in enumerate(request.urls)]
+        try:
+            for next_result in asyncio.as_completed(tasks):
+                result = await next_result
+                if await http_request.is_disconnected():
+                    print("Client disconnected, cancelling remaining URLs")
+                    break
+                payload = result.model_dump_json()
+                if use_sse:
+                    yield f"event: result\ndata: {payload}\n\n"
+                else:
+                    yield payload + "\n"
+            else:
+                if use_sse:
+                    yield "event: done\ndata: {}\n\n"
+        finally:
+            # Also runs when the server cancels the stream on disconnect
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    media_type = "text/event-stream" if use_sse else "application/x-ndjson"
+    return StreamingResponse(results(), media_type=media_type, headers={"Cache-Control": "no-cache"})
+
+@app.post("/api/v1/jobs", response_model=JobSubmitResponse, status_code=202)
+async def submit_job(request: ProductRequest):
+    """Queues a (large) batch of URLs; poll the returned job id for progress and results."""
+    urls = [str(url) for url in request.urls]
+    job_id = await job_queue.submit(urls)
+    job_workers.notify()
+    return JobSubmitResponse(job_id=job_id, total=len(urls))
+
+@app.get("/api/v1/jobs/{job_id}", response_model=JobStatus)
+async def get_job_status(job_id: str):
+    status = await job_queue.status(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return status
+
+@app.get("/api/v1/jobs/{job_id}/results", response_model=JobResults)
+async def get_job_results(job_id: str):
+    status = await job_queue.status(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return JobResults(job_id=job_id, status=status["status"], results=await job_queue.results(job_id))
+
+@app.get("/api/v1/snapshots/{asin}", response_model=List[SnapshotInfo])
+async def get_snapshots(asin: str):
+    """Stored raw HTML snapshots of a product, newest first."""
+    return await snapshot_store.history(asin)
+
+@app.post("/api/v1/snapshots/reprocess", response_model=List[ProductResult])
+async def reprocess_snapshots(request: ReprocessRequest):
+    """
+    Re-parses and re-extracts products from their newest stored snapshot, without fetching
+    Amazon again (e.g. after a parser or prompt change). Results replace the cached ones.
+    """
+    asins = list(request.asins)
+    if request.all:
+        asins += [s["asin"] for s in await snapshot_store.latest_per_asin(request.since) if s["asin"] not in asins]
+    if not asins:
+        raise HTTPException(status_code=400, detail="Provide asins or all=true")
+
+    # all=true can mean thousands of products; only a few snapshots are decompressed and processed at once
+    semaphore = asyncio.Semaphore(max(1, config.SNAPSHOT_REPROCESS_CONCURRENCY))
+
+    async def reprocess_one(asin: str):
+        async with semaphore:
+            return await reprocess_product(asin)
+
+    return await asyncio.gather(*(process_url_result(i, asin, reprocess_one) for i, asin in enumerate(asins)))
+
+@app.get("/api/v1/cache/stats")
+async def cache_stats():
+    """Product result cache, LLM extraction cache, translation memory and snapshot store counters (hits, misses, saved tokens)."""
+    return {"product": product_cache.stats(), "llm": await llm_cache.stats(), "translation_memory": await translation_memory.stats(), "snapshots": await snapshot_store.stats()}
+
+@app.get("/api/v1/fetch/limits")
+def fetch_limits():
+    """Adaptive per-host fetch limits: current concurrency limit, in-flight/waiting fetches and block rate."""
+    return fetch_limiter.stats()
+
+@app.get("/metrics")
+def metrics():
+    """Prometheus metrics: node durations, page/prompt sizes, token usage and outcomes."""
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
 @app.get("/health")
 def health_check():
     return {"status": "ok"}
@@ -0,0 +1,88 @@
+import asyncio
+import time
+from typing import Dict, Optional
+from prometheus_client import Counter, Gauge, Histogram
+
+# Seconds, from sub-millisecond parses to slow Playwright fetches / LLM calls
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+# Bytes, from small HTTP bodies to multi-megabyte rendered pages
+SIZE_BUCKETS = (10_000, 50_000, 100_000, 250_000, 500_000, 1_000_000, 2_000_000, 5_000_000, 10_000_000)
+TOKEN_BUCKETS = (100, 250, 500, 1000, 2000, 3000, 5000, 10_000, 20_000, 50_000)
+
+NODE_DURATION = Histogram(
+    "crawler_node_duration_seconds", "Wall time of a workflow node", ["node"], buckets=DURATION_BUCKETS
+)
+NODE_RUNS = Counter(
+    "crawler_node_runs_total", "Workflow node runs by result (ok, error, skipped after an earlier error)", ["node", "status"]
+)
+FETCH_BYTES = Histogram(
+    "crawler_fetch_bytes", "Bytes downloaded for a product page (HTTP fast path only)", ["tier"], buckets=SIZE_BUCKETS
+)
+HTML_BYTES = Histogram(
+    "crawler_html_bytes", "Size of the HTML handed to the parser", ["tier"], buckets=SIZE_BUCKETS
+)
+PROMPT_CHARS = Histogram(
+    "crawler_llm_prompt_chars", "Characters of the prompt sent to the LLM", buckets=SIZE_BUCKETS
+)
+PROMPT_TOKENS = Histogram(
+    "crawler_llm_input_tokens", "Page text tokens sent to the LLM after compaction", buckets=TOKEN_BUCKETS
+)
+LLM_TOKENS = Counter(
+    "crawler_llm_tokens_total", "LLM tokens by kind (input, output, cached = saved by the LLM cache, compaction = saved by compaction)", ["kind"]
+)
+FETCH_HOST_LIMIT = Gauge(
+    "crawler_fetch_host_limit", "Current adaptive (AIMD) fetch concurrency limit per host", ["host"]
+)
+FETCH_ATTEMPTS = Counter(
+    "crawler_fetch_attempts_total", "Page fetch attempts per host by outcome (ok, blocked, error)", ["host", "outcome"]
+)
+OUTCOMES = Counter(
+    "crawler_outcomes_total", "Notable outcomes: captcha, browser escalation, script image fallback, LLM JSON failure, ...", ["outcome"]
+)
+
+def record_outcome(outcome: str):
+    OUTCOMES.labels(outcome).inc()
+
+def record_llm_usage(usage: Dict[str, int]):
+    """Counts the tokens of one extraction (response_metadata usage, or the cached / saved counts)."""
+    LLM_TOKENS.labels("input").inc(usage.get("prompt_tokens", usage.get("input_tokens", 0)) or 0)
+    LLM_TOKENS.labels("output").inc(usage.get("completion_tokens", usage.get("output_tokens", 0)) or 0)
+    LLM_TOKENS.labels("cached").inc(usage.get("cached_tokens", 0) or 0)
+    LLM_TOKENS.labels("compaction").inc(usage.get("compaction_saved_tokens", 0) or 0)
+
+def _record_node(name: str, state: dict, result: dict, elapsed: float) -> dict:
+    NODE_DURATION.labels(name).observe(elapsed)
+    if state.get("error"):
+        status = "skipped"
+    elif result.get("error"):
+        status = "error"
+    else:
+        status = "ok"
+    NODE_RUNS.labels(name, status).inc()
+
+    if name == "fetch" and result.get("html_content"):
+        HTML_BYTES.labels(result.get("fetch_tier") or "unknown").observe(len(result["html_content"]))
+
+    # Per-request breakdown (milliseconds), returned as a Server-Timing header by the API
+    timings = {**(state.get("timings") or {}), name: round(elapsed * 1000, 1)}
+    return {**result, "timings": timings}
+
+def instrument(name: str, node):
+    """Wraps a workflow node to record its wall time, status and sizes (keeps sync nodes sync)."""
+    if asyncio.iscoroutinefunction(node):
+        async def instrumented(state: dict) -> dict:
+            start = time.perf_counter()
+            result = await node(state)
+            return _record_node(name, state, result, time.perf_counter() - start)
+    else:
+        def instrumented(state: dict) -> dict:
+            start = time.perf_counter()
+            result = node(state)
+            return _record_node(name, state, result, time.perf_counter() - start)
+    return instrumented
+
+def server_timing(timings: Optional[Dict[str, float]], prefix: str = "") -> str:
+    """Formats node timings as a Server-Timing header value ("fetch;dur=812.4, parse;dur=35.2")."""
+    if not timings:
+        return f"{prefix}cache;desc=hit"
+    return ", ".join(f"{prefix}{name};dur={ms}" for name, ms in timings.items())
@@ -38,3 +38,48 @@ class ProductResponse(BaseModel):
     videos: List[str] = Field(default_factory=list, description="List of video URLs found")
     
     usage: Dict[str, int] = Field(default_factory=dict, description="Token usage statistics (input, output, total)")
+
+class ProductResult(BaseModel):
+    """One streamed result: the product for a URL, or the error that stopped it."""
+    index: int = Field(..., description="Position of the URL in the request")
+    url: str = Field(..., description="Requested URL")
+    status: str = Field(..., description='"ok" or "error"')
+    product: Optional[ProductResponse] = Field(None, description="Extracted product (status ok)")
+    error: Optional[str] = Field(None, description="Error message (status error)")
+    elapsed_ms: float = Field(..., description="Wall time spent on this URL in milliseconds")
+
+class JobSubmitResponse(BaseModel):
+    job_id: str = Field(..., description="Id to poll /api/v1/jobs/{job_id}")
+    total: int = Field(..., description="Number of URLs queued")
+
+class JobStatus(BaseModel):
+    job_id: str
+    status: str = Field(..., description='"queued", "running" or "completed"')
+    total: int
+    queued: int
+    running: int
+    done: int
+    failed: int
+    created_at: float
+    updated_at: float
+
+class JobResults(BaseModel):
+    job_id: str
+    status: str
+    results: List[ProductResult] = Field(default_factory=list, description="Finished URLs (ok or error), in request order")
+
+class SnapshotInfo(BaseModel):
+    """Metadata of one stored raw HTML snapshot."""
+    id: int
+    asin: Optional[str]
+    url: str
+    sha256: str = Field(..., description="Content address of the (uncompressed) HTML")
+    fetch_tier: Optional[str]
+    fetched_at: float
+    raw_bytes: int
+    stored_bytes: int = Field(..., description="Size of the zstd blob")
+
+class ReprocessRequest(BaseModel):
+    asins: List[str] = Field(default_factory=list, description="Products to re-parse / re-extract from their newest snapshot")
+    all: bool = Field(False, description="Reprocess the newest snapshot of every stored product")
+    since: Optional[float] = Field(None, description="With all: only snapshots fetched at or after this UNIX time")
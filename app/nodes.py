@@ -1,14 +1,22 @@
-import requests
-from bs4 import BeautifulSoup
 # from langchain_aws import ChatBedrock # (Optional) Not needed if using RemoteRunnable exclusively, but safe to keep or comment out
-from langserve import RemoteRunnable
 from langchain_core.messages import HumanMessage
-from typing import TypedDict, Optional
+from typing import TypedDict, Optional, Dict, Any
 from app.models import ProductResponse
-from app.utils import get_headers, clean_text
+from app.utils import is_captcha_page, asin_from_url
+from app.parser import build_llm_input, media_fields
+from app.parse_pool import parse_pool
+from app.llm import ainvoke_llm
+from app.cache import llm_cache, make_cache_key
+from app.compaction import compact_llm_input
+from app.tokens import count_tokens, tokenizer_name
+from app.translation_memory import FRAGMENT_SECTIONS, PageFragments, parse_rewrites, translation_memory
+from app.snapshots import snapshot_store
+from app.metrics import record_outcome, record_llm_usage, PROMPT_CHARS, PROMPT_TOKENS
+from app import config
+import asyncio
 import json
-import os
-import re
+import random
+from urllib.parse import urlsplit
 
 # Define the state for the graph
 class GraphState(TypedDict):
@@ -17,197 +25,201 @@ class GraphState(TypedDict):
     clean_text: Optional[str]
     product_data: Optional[ProductResponse]
     error: Optional[str]
+    fetch_tier: Optional[str]  # "http", "browser" or "snapshot": where the page came from
+    dom_fields: Optional[Dict[str, Any]]  # ProductResponse fields read directly from the DOM
+    sections: Optional[Dict[str, str]]  # Known page sections for the compaction stage
+    compaction: Optional[Dict[str, int]]  # tokens_before / tokens_after / tokens_saved of the LLM input
+    timings: Optional[Dict[str, float]]  # Wall time per node in ms (see app/metrics.py)
 
-from playwright.async_api import async_playwright
+from app.browser import browser_pool, wait_until_ready
+from app.http_client import http_fetcher, is_block_reason, BLOCK_STATUS_CODES
+from app.limiter import fetch_limiter, HostSlot
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+def fetch_retry_delay(attempt: int) -> float:
+    """Exponential backoff with full jitter between attempts on a blocked host."""
+    return random.uniform(0, config.FETCH_RETRY_BASE_DELAY * (2 ** attempt))
 
 async def fetch_page(state: GraphState) -> GraphState:
-    """Fetches the HTML content from the given URL using Playwright (Async)."""
+    """
+    Fetches the HTML content under the host's adaptive concurrency limit (see app/limiter.py).
+    Blocked fetches (captcha, 429/503, timeout) are retried a bounded number of times;
+    every retry gets a new user agent (HTTP) or a fresh browser context.
+    """
+    host = (urlsplit(state["url"]).hostname or "").lower()
+    attempts = max(0, config.FETCH_MAX_RETRIES) + 1
+    for attempt in range(attempts):
+        async with fetch_limiter.slot(host) as slot:
+            result = await fetch_page_once(state, slot)
+        if not result.get("error") and result.get("html_content"):
+            # Raw page for later re-parsing without a refetch (see app/snapshots.py)
+            await snapshot_store.save(state["url"], asin_from_url(state["url"]), result["html_content"], result.get("fetch_tier"))
+            return result
+        if not slot.blocked or attempt == attempts - 1:
+            return result
+        delay = fetch_retry_delay(attempt)
+        print(f"Blocked by {host} (attempt {attempt + 1}/{attempts}), retrying in {delay:.1f}s: {state['url']}")
+        record_outcome("fetch_retry")
+        await asyncio.sleep(delay)
+    return result
+
+async def fetch_page_once(state: GraphState, slot: Optional[HostSlot] = None) -> GraphState:
+    """One fetch attempt: plain HTTP first, falling back to Playwright."""
+    slot = slot or HostSlot("", 0.0)
+    if config.FETCH_HTTP_ENABLED:
+        html, reason = await http_fetcher.fetch_html(state["url"])
+        if html is not None:
+            print(f"Fetched URL with HTTP fast path: {state['url']}")
+            slot.success()
+            return {**state, "html_content": html, "fetch_tier": "http"}
+        if reason == "captcha":
+            record_outcome("http_captcha")
+        if is_block_reason(reason):
+            slot.block()
+        if not config.BROWSER_ENABLED:
+            return {**state, "error": f"HTTP fast path failed ({reason}) and the browser is disabled.", "fetch_tier": "http"}
+        print(f"HTTP fast path failed ({reason}), escalating to browser: {state['url']}")
+        record_outcome("browser_escalation")
+
+    return await fetch_page_with_browser(state, slot)
+
+async def fetch_page_with_browser(state: GraphState, slot: Optional[HostSlot] = None) -> GraphState:
+    """Fetches the HTML content from the given URL using a pooled Playwright browser (Async)."""
+    slot = slot or HostSlot("", 0.0)
     print(f"Fetching URL with Async Playwright: {state['url']}")
     try:
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(headless=True)
-            page = await browser.new_page(
-                user_agent="Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
-            )
-            # Extra headers
-            await page.set_extra_http_headers({
-                "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8",
-                "Accept-Language": "en-US,en;q=0.9",
-            })
+        # Browser and context are reused across calls; only the page is new
+        async with browser_pool.page() as pooled:
+            page = pooled.page
+            response = await page.goto(state["url"], timeout=30000, wait_until="domcontentloaded")
             
-            await page.goto(state["url"], timeout=30000, wait_until="domcontentloaded")
+            if response is not None and response.status in BLOCK_STATUS_CODES:
+                pooled.mark_blocked()
+                slot.block()
+                return {**state, "error": f"Amazon is throttling (HTTP {response.status}).", "fetch_tier": "browser"}
             
-            # Scroll down
+            # Scroll down (triggers lazy-loaded sections such as A+ content)
             await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-            await page.wait_for_timeout(2000) 
+            # Wait for #centerCol / #altImages / .aplus-v2 instead of a fixed 2s sleep
+            await wait_until_ready(page)
             
             content = await page.content()
-            await browser.close()
-            
-            if "Type the characters you see in this image" in content:
-                 return {**state, "error": "Amazon blocking detected (Captcha)."}
             
-            return {**state, "html_content": content}
+            if is_captcha_page(content):
+                 # Don't keep serving pages from a context Amazon has flagged
+                 pooled.mark_blocked()
+                 slot.block()
+                 record_outcome("browser_captcha")
+                 return {**state, "error": "Amazon blocking detected (Captcha).", "fetch_tier": "browser"}
             
+            slot.success()
+            return {**state, "html_content": content, "fetch_tier": "browser"}
+    
+    except PlaywrightTimeoutError as e:
+        slot.block()
+        return {**state, "error": str(e), "fetch_tier": "browser"}
     except Exception as e:
-        return {**state, "error": str(e)}
+        return {**state, "error": str(e), "fetch_tier": "browser"}
 
-def parse_html(state: GraphState) -> GraphState:
+async def parse_html(state: GraphState) -> GraphState:
     """Parses HTML to extract main text content, reducing token usage."""
     if state.get("error"):
         return state
     
-    html = state["html_content"]
+    # Gallery, brand story, A+ images, main text, videos and structured fields (see app/parser.py),
+    # parsed in a worker process for large pages (see app/parse_pool.py)
+    parsed = await parse_pool.parse(state["html_content"])
     
-    # --- SOUP PARSING ---
-    soup = BeautifulSoup(html, "html.parser")
+    if parsed["script_images"]:
+        record_outcome("script_image_fallback")
     
-    # Helper for high-res conversion
-    def maximize_image_url(url):
-        if not url: return None
-        # Remove Amazon's resize markers (e.g., ._AC_SL1500_, ._SR75,75_, ._AC_US100_)
-        # Pattern matches ._ followed by anything until the last _ before the extension
-        return re.sub(r"\._.+?_(\.[a-z]+)$", r"\1", url)
-
-    def deduplicate(url_list):
-        seen = set()
-        unique = []
-        for url in url_list:
-            if url and url not in seen:
-                seen.add(url)
-                unique.append(url)
-        return unique
-
-    # --- 1. Gallery Extraction (#altImages) ---
-    gallery_urls = []
-    # Try the user-specified selector first
-    alt_images_div = soup.find(id="altImages")
-    if alt_images_div:
-        for img in alt_images_div.find_all("img"):
-            src = maximize_image_url(img.get("src") or img.get("data-src"))
-            if src and src not in gallery_urls:
-                gallery_urls.append(src)
-    else:
-        # Fallback: Sometimes it's in a different container or purely script-driven.
-        # We can keep the script regex as a backup or just rely on what we found.
-        # User explicitly asked for #altImages, if it's empty, we might need to fallback to the Script Regex 
-        # but filter carefully. For now, let's trust the selector but add simple script regex backup for MAIN gallery only.
-        pass
-
-    # --- 2. Brand Story Extraction (Carousel) ---
-    brand_images = []
-    # User selector: a-row a-carousel-controls a-carousel-row a-carousel-has-buttons
-    # This selector is quite specific to the controls, the images might be siblings or children.
-    # Usually "From the brand" is in a container that might contain these classes.
-    # We will search broadly for the brand section.
-    brand_section = soup.select_one(".a-carousel-row") # Broader selector to catch the row
-    if brand_section:
-        for img in brand_section.find_all("img"):
-             src = maximize_image_url(img.get("src") or img.get("data-src"))
-             if src and src not in brand_images:
-                 brand_images.append(src)
-
-    # --- 3. Manufacturer Extraction (.aplus-v2) ---
-    manufacturer_images = []
-    aplus_divs = soup.select(".aplus-v2.desktop.celwidget")
-    aplus_text_content = ""
-    for div in aplus_divs:
-        # Extract Text
-        aplus_text_content += div.get_text(separator=" ", strip=True) + "\n"
-        # Extract Images
-        for img in div.find_all("img"):
-            src = maximize_image_url(img.get("src") or img.get("data-src") or img.get("data-old-hires"))
-            if src and src not in manufacturer_images:
-                manufacturer_images.append(src)
-
-    # --- GENERAL CLEANUP ---
-    # Remove scripts, styles, metadata for the MAIN text body
-    for script in soup(["script", "style", "meta", "noscript", "header", "footer"]):
-        script.extract()
-    
-    # Target main content area
-    main_content = soup.find(id="centerCol") or soup.find(id="dp") or soup.body
+    dom_fields = {**parsed["fields"], **media_fields(parsed)}
+    if "asin" not in dom_fields and asin_from_url(state["url"]):
+        dom_fields["asin"] = asin_from_url(state["url"])
     
-    if main_content:
-        text = main_content.get_text(separator=" ")
-    else:
-        text = soup.get_text(separator=" ")
-        
-    cleaned = clean_text(text)
+    sections = dict(parsed["sections"])
+    if parsed["aplus_text"].strip():
+        sections["aplus"] = parsed["aplus_text"]
     
-    # --- CONSTRUCT FINAL LLM INPUT ---
-    # We manually inject the extracted lists so the LLM doesn't have to hunt for them
-    # and we ensure they are categorized correctly.
+    return {**state, "clean_text": build_llm_input(parsed), "dom_fields": dom_fields, "sections": sections}
+
+def compact_text(state: GraphState) -> GraphState:
+    """Rebuilds the LLM input from the known page sections, without noise, within the token budget."""
+    if state.get("error") or not config.COMPACTION_ENABLED:
+        return state
     
-    final_text = cleaned[:50000] # Main product info
+    original = state.get("clean_text") or ""
+    sections = state.get("sections") or {}
+    # Bullets and spec rows reach the LLM as numbered fragments (new ones) or not at all (known
+    # ones, see extract_with_llm), so the page text only carries the other sections
+    exclude = FRAGMENT_SECTIONS if PageFragments(sections) else ()
+    compacted = compact_llm_input(sections, original, config.COMPACTION_TOKEN_BUDGET, exclude)
     
-    final_text += "\n\n--- [SECTION: GALLERY IMAGES] ---\n"
-    if gallery_urls:
-        final_text += "\n".join(deduplicate(gallery_urls))
-    else:
-        # Fallback to script finding if empty
-        final_text += "(No images found in #altImages, checking scripts...)\n"
-        # Use previous regex method just for safe-keeping if the DOM was empty
-        matches = re.findall(r'"hiRes":\s*"(https://[^"]+?\.jpg)"', html)
-        unique_matches = deduplicate([maximize_image_url(m) for m in matches])
-        final_text += "\n".join(unique_matches[:15])
+    tokens_before = count_tokens(original)
+    tokens_compacted = count_tokens(compacted)
+    # Section headers can make a short page longer; then the original text is sent as is
+    fallback = tokens_compacted > tokens_before
+    tokens_after = tokens_before if fallback else tokens_compacted
+    PROMPT_TOKENS.observe(tokens_after)
+    compaction = {
+        "tokens_before": tokens_before,
+        "tokens_compacted": tokens_compacted,
+        "tokens_after": tokens_after,
+        "tokens_saved": tokens_before - tokens_after,
+        "fallback": fallback,
+        # "estimate" when tiktoken could not be loaded: the budget is then approximate
+        "tokenizer": tokenizer_name(),
+    }
+    if fallback:
+        print(f"Compaction grew the LLM input ({tokens_before} -> {tokens_compacted} tokens), sending the original ({state['url']})")
+        return {**state, "compaction": compaction}
+    print(f"Compacted LLM input: {tokens_before} -> {tokens_after} tokens, {compaction['tokenizer']} ({state['url']})")
+    return {**state, "clean_text": compacted, "compaction": compaction}
 
-    final_text += "\n\n--- [SECTION: BRAND STORY IMAGES] ---\n"
-    final_text += "\n".join(deduplicate(brand_images))
-    
-    final_text += "\n\n--- [SECTION: MANUFACTURER CONTENT (.aplus-v2)] ---\n"
-    # Truncate text heavily, we mainly want images from this section
-    final_text += "Text: " + aplus_text_content[:1000] + "...\n"
-    final_text += "Images:\n" + "\n".join(deduplicate(manufacturer_images))
+# Bump whenever the prompt or the expected JSON changes, so cached answers are not reused
+PROMPT_VERSION = "3"
 
-    # Video Regex (Global check)
-    video_pattern = r'"url":\s*"(https://[^"]+?\.mp4)"'
-    found_videos = re.findall(video_pattern, html)
-    unique_videos = list(set(found_videos))
-    
-    final_text += "\n\n--- [SECTION: VIDEOS] ---\n"
-    final_text += "\n".join(unique_videos)
+# Output fields when the page has no bullets / spec rows to translate fragment by fragment
+FULL_REWRITE_FIELDS = """
+    - features (list of strings, Rewrite bullet points to be natural and persuasive)
+    - specifications (dictionary of key-value pairs, Translate keys/values to natural Korean)
+    - product_details (dictionary of other details)"""
 
-    return {**state, "clean_text": final_text}
+FRAGMENT_FIELDS = """
+    - fragments (object: for EVERY numbered entry of FRAGMENTS below, its number as a string -> the natural Korean rewrite. Bullets become persuasive sentences; spec keys/values stay short. Keep numbers, units and model codes.)"""
 
-def extract_with_llm(state: GraphState) -> GraphState:
+async def extract_with_llm(state: GraphState) -> GraphState:
     """Uses Bedrock Claude to extract structured data."""
     if state.get("error"):
         return state
     
-    # Use Global Claude 3.5 Sonnet (User requested "sonnet 4.5" but likely meant latest 3.5 Sonnet v2 or similar high-end. 
-    # The ID "global.anthropic.claude-sonnet-4-5-20250929-v1:0" was requested in plan but might be hypothetical or a specific private preview.
-    # Standard latest is usually 3.5 Sonnet. I will use the ID requested in the plan if available, or fall back to a known working one if it fails.
-    # Actually, for safety and to ensure it works, I will use the specific ID if I can, but since I cannot verify existence, 
-    # I will use the standard US Anthropic Claude 3.5 Sonnet ID which is very capable: "us.anthropic.claude-3-5-sonnet-20241022-v2:0" or similar.
-    # HOWEVER, the user specifically asked for "global claude sonnet 4.5". 
-    # I will try to use a model ID that reflects the intent of "latest/best". 
-    # IF "4.5" is not real yet, I will use the latest 3.5 V2.
-    # Switching to Claude 3 Haiku (Stable & Ultra Cheap)
-    # --- CHANGED: Use Remote API via RemoteRunnable ---
-    # The company API endpoint: https://stag-pawn-python.api.plto.com/bedrock/invoke
-    # RemoteRunnable usually takes the base URL without /invoke if standard LangServe, but can also work with direct invoke URL depending on version.
-    # Standard LangServe: client = RemoteRunnable("http://.../chain") -> calls /chain/invoke
-    # User URL: .../bedrock/invoke. So base should be .../bedrock
+    # The RemoteRunnable client, model id and concurrency limit live in app/llm.py
     
-    # 1. Base Connection
-    base_llm = RemoteRunnable(
-        url="https://stag-pawn-python.api.plto.com/bedrock",
-        headers={"x-api-key": "MY_SECRET_COMPANY_KEY_1234"}
-    )
+    # Bullets and spec rows are rewritten fragment by fragment; fragments rewritten for an
+    # earlier product come from the translation memory, only unseen ones go to the LLM
+    page = PageFragments(state.get("sections") or {})
+    fragments = page.fragments()
+    known = await translation_memory.lookup(fragments) if page else {}
+    unseen = [fragment for fragment in fragments if fragment not in known]
     
-    # 2. Configure Model
-    # Using Haiku for cost-effectiveness. 
-    # To use Sonnet, change to: "anthropic.claude-3-sonnet-20240229-v1:0"
-    llm = base_llm.with_config(configurable={"model_id": "anthropic.claude-3-haiku-20240307-v1:0"})
+    if not page:
+        output_fields = FULL_REWRITE_FIELDS
+        fragment_list = ""
+    elif unseen:
+        output_fields = FRAGMENT_FIELDS
+        fragment_list = "FRAGMENTS:\n" + "\n".join(f"    {i}. {text}" for i, (_, text) in enumerate(unseen, 1))
+    else:
+        output_fields = ""
+        fragment_list = ""
     
     prompt = f"""
-    You are an expert scraping assistant. Extract comprehensive product information.
+    You are an expert e-commerce copywriter. Rewrite the product text below into structured Korean copy.
     
     TEXT:
     {state['clean_text']}
     
     Extract the following fields into a valid JSON object matching the schema below.
+    Price, rating, ASIN, images and other structured data are already known; do NOT output them.
     
     CRITICAL INSTRUCTION: 
     The input text contains auto-translated Korean which sounds unnatural.
@@ -218,49 +230,77 @@ def extract_with_llm(state: GraphState) -> GraphState:
     
     fields:
     - title (string, Rewrite to be concise and natural in Korean)
-    - asin (string, look for "ASIN" in details)
-    - price (string, with currency)
-    - currency (string, ISO code)
-    - rating (string)
-    - review_count (int or string)
-    - availability (string, e.g., "재고 있음")
     - brand (string)
-    - model_name (string)
-    - breadcrumbs (list of strings, category path)
-    - features (list of strings, Rewrite bullet points to be natural and persuasive)
-    - specifications (dictionary of key-value pairs, Translate keys/values to natural Korean)
+    - model_name (string){output_fields}
     - full_description (string, SUMMARY ONLY. Max 200 chars. Natural Korean summary.)
-    - product_details (dictionary of other details)
     - description_summary (brief summary in natural Korean)
-    - best_sellers_rank (list of strings)
     - warranty_info (string)
-    - image_url (string, Main Product Image)
-    - images (list of strings, Extract from '[SECTION: GALLERY IMAGES]'. Ignore thumbnails if better version exists.)
-    - brand_story_images (list of strings, Extract from '[SECTION: BRAND STORY IMAGES]')
-    - manufacturer_images (list of strings, Extract from '[SECTION: MANUFACTURER CONTENT]')
-    - videos (list of strings, Extract from '[SECTION: VIDEOS]')
+    
+    {fragment_list}
 
     Respond ONLY with the RAW JSON.
     """
     
     try:
-        messages = [HumanMessage(content=prompt)]
-        response = llm.invoke(messages)
-        content = response.content.strip()
+        # Identical page text + model + prompt version -> reuse the previous answer
+        cache_key = make_cache_key(prompt, config.BEDROCK_MODEL_ID, PROMPT_VERSION)
+        cached = await llm_cache.get(cache_key)
         
-        # Clean potential markdown
-        if content.startswith("```json"):
-            content = content[7:-3]
-        elif content.startswith("```"):
-            content = content[3:-3]
+        if cached is not None:
+            record_outcome("llm_cache_hit")
+            data = dict(cached["data"])
+            # Nothing was spent on this call
+            usage = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0, "cached_tokens": cached["tokens"]}
+        else:
+            PROMPT_CHARS.observe(len(prompt))
+            messages = [HumanMessage(content=prompt)]
+            response = await ainvoke_llm(messages)
+            content = response.content.strip()
+            
+            # Clean potential markdown
+            if content.startswith("```json"):
+                content = content[7:-3]
+            elif content.startswith("```"):
+                content = content[3:-3]
+                
+            try:
+                data = json.loads(content)
+            except json.JSONDecodeError:
+                record_outcome("llm_json_error")
+                raise
             
-        data = json.loads(content)
+            # Extract usage info
+            usage = response.response_metadata.get("usage", {})
+            llm_data = dict(data)
         
-        # Extract usage info
-        usage = response.response_metadata.get("usage", {})
+        translated = {}
+        if page:
+            rewrites = data.pop("fragments", None)
+            if rewrites is not None and not isinstance(rewrites, (dict, list)):
+                print(f"Ignoring fragments of type {type(rewrites).__name__} in the LLM answer ({state['url']})")
+            translated = parse_rewrites(rewrites, unseen)
+            # Fragments the LLM skipped keep their source text
+            data.update(page.assemble({**known, **translated}))
+            usage = {**usage, "translation_memory_hits": len(known)}
+        
+        # Structured fields and media lists come from the DOM, never from the LLM
+        for key, value in (state.get("dom_fields") or {}).items():
+            if value not in (None, "", [], {}):
+                data[key] = value
+        
+        if state.get("compaction"):
+            usage = {**usage, "compaction_saved_tokens": state["compaction"]["tokens_saved"]}
         data["usage"] = usage
+        record_llm_usage(usage)
         
         product = ProductResponse(**data)
+        
+        if cached is None:
+            # Only cache answers that produced a valid product
+            await llm_cache.set(cache_key, llm_data, usage)
+        # Also on a cache hit: the answer may predate the translation memory (or its file was reset)
+        await translation_memory.store(translated)
+        
         return {**state, "product_data": product}
         
     except Exception as e:
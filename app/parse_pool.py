@@ -0,0 +1,79 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+from app import config
+from app.parser import ParsedPage, parse_document
+
+class ParsePool:
+    """
+    Runs parse_document in worker processes, so parsing large pages scales across cores
+    instead of competing with the event loop for the GIL.
+    Only the HTML string is sent to a worker and only the ParsedPage comes back.
+    Small pages, and calls made before start() (scripts, tests), are parsed in-process.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = config.PARSE_POOL_ENABLED,
+        workers: int = config.PARSE_POOL_WORKERS,
+        min_bytes: int = config.PARSE_POOL_MIN_BYTES,
+        engine: str = config.PARSER_ENGINE,
+    ):
+        self.enabled = enabled
+        # 0 = one worker per core
+        self.workers = workers if workers > 0 else (os.cpu_count() or 1)
+        self.min_bytes = min_bytes
+        self.engine = engine
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def started(self) -> bool:
+        return self._executor is not None
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        # "spawn": forking a process that runs an event loop and threads is not safe
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+
+    async def start(self):
+        async with self._lock:
+            if not self.enabled or self._executor is not None:
+                return
+            print(f"Starting parse pool: {self.workers} worker process(es)")
+            self._executor = self._new_executor()
+            # Start every worker now (imports included) instead of on the first requests
+            loop = asyncio.get_running_loop()
+            await asyncio.gather(*(
+                loop.run_in_executor(self._executor, parse_document, "<html><body></body></html>", self.engine)
+                for _ in range(self.workers)
+            ))
+
+    async def stop(self):
+        async with self._lock:
+            if self._executor is None:
+                return
+            print("Stopping parse pool")
+            executor, self._executor = self._executor, None
+            await asyncio.to_thread(executor.shutdown, True, cancel_futures=True)
+
+    async def parse(self, html: str) -> ParsedPage:
+        """Parses a product page, in a worker process when the pool runs and the page is large enough."""
+        executor = self._executor
+        if executor is None or len(html) < self.min_bytes:
+            return await asyncio.to_thread(parse_document, html, self.engine)
+        try:
+            return await asyncio.get_running_loop().run_in_executor(executor, parse_document, html, self.engine)
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM killed); replace the pool and parse this page here
+            print("Parse pool broken, restarting it")
+            if self._executor is executor:
+                self._executor = self._new_executor()
+                executor.shutdown(wait=False, cancel_futures=True)
+            return await asyncio.to_thread(parse_document, html, self.engine)
+
+
+# Shared by every workflow run, started/stopped with the FastAPI app lifespan
+parse_pool = ParsePool()
@@ -0,0 +1,259 @@
+import re
+from typing import TypedDict, List, Dict, Any
+from bs4 import BeautifulSoup
+import lxml.html
+from lxml import etree
+from app import config
+from app.utils import clean_text, maximize_image_url, deduplicate
+from app.dom_fields import extract_dom_fields
+from app.sections import extract_sections
+
+# Compact result of parsing a product page (plain strings and lists only)
+class ParsedPage(TypedDict):
+    main_text: str  # Whitespace-normalized text of #centerCol / #dp / body
+    gallery_images: List[str]  # From #altImages
+    script_images: List[str]  # "hiRes" URLs from scripts, only filled when #altImages has no images
+    brand_story_images: List[str]  # From the first .a-carousel-row
+    manufacturer_images: List[str]  # From .aplus-v2.desktop.celwidget
+    aplus_text: str
+    videos: List[str]
+    fields: Dict[str, Any]  # Structured fields read from the DOM (see app/dom_fields.py)
+    sections: Dict[str, str]  # Title, bullets, spec tables, ... as line-structured text (see app/sections.py)
+
+# Tags stripped before the main text is read
+REMOVED_TAGS = {"script", "style", "meta", "noscript", "header", "footer"}
+# Tags whose strings BeautifulSoup's get_text() never returns
+TEXT_IGNORED_TAGS = {"script", "style", "template"}
+
+APLUS_CLASSES = {"aplus-v2", "desktop", "celwidget"}
+
+HIRES_PATTERN = re.compile(r'"hiRes":\s*"(https://[^"]+?\.jpg)"')
+VIDEO_PATTERN = re.compile(r'"url":\s*"(https://[^"]+?\.mp4)"')
+MAX_SCRIPT_IMAGES = 15
+
+def parse_with_soup(html: str, structured: bool = True) -> ParsedPage:
+    """
+    Reference implementation: BeautifulSoup (html.parser) with one tree walk per section.
+    structured=False leaves fields / sections empty and skips the lxml document they are read
+    from, i.e. only the soup work (the baseline benchmarks/bench_parse.py compares against).
+    """
+    soup = BeautifulSoup(html, "html.parser")
+
+    # --- 1. Gallery Extraction (#altImages) ---
+    gallery_urls = []
+    alt_images_div = soup.find(id="altImages")
+    if alt_images_div:
+        for img in alt_images_div.find_all("img"):
+            src = maximize_image_url(img.get("src") or img.get("data-src"))
+            if src and src not in gallery_urls:
+                gallery_urls.append(src)
+
+    # --- 2. Brand Story Extraction (Carousel) ---
+    brand_images = []
+    # Usually "From the brand" is in a container with these classes
+    brand_section = soup.select_one(".a-carousel-row") # Broader selector to catch the row
+    if brand_section:
+        for img in brand_section.find_all("img"):
+             src = maximize_image_url(img.get("src") or img.get("data-src"))
+             if src and src not in brand_images:
+                 brand_images.append(src)
+
+    # --- 3. Manufacturer Extraction (.aplus-v2) ---
+    manufacturer_images = []
+    aplus_divs = soup.select(".aplus-v2.desktop.celwidget")
+    aplus_text_content = ""
+    for div in aplus_divs:
+        # Extract Text
+        aplus_text_content += div.get_text(separator=" ", strip=True) + "\n"
+        # Extract Images
+        for img in div.find_all("img"):
+            src = maximize_image_url(img.get("src") or img.get("data-src") or img.get("data-old-hires"))
+            if src and src not in manufacturer_images:
+                manufacturer_images.append(src)
+
+    # --- GENERAL CLEANUP ---
+    # Remove scripts, styles, metadata for the MAIN text body
+    for script in soup(list(REMOVED_TAGS)):
+        script.extract()
+
+    # Target main content area
+    main_content = soup.find(id="centerCol") or soup.find(id="dp") or soup.body
+    if main_content:
+        text = main_content.get_text(separator=" ")
+    else:
+        text = soup.get_text(separator=" ")
+
+    # Script regex backup for the gallery when the DOM was empty
+    script_images = []
+    if not gallery_urls:
+        matches = HIRES_PATTERN.findall(html)
+        script_images = deduplicate([maximize_image_url(m) for m in matches])[:MAX_SCRIPT_IMAGES]
+
+    document = _load_document(html) if structured else None
+    return {
+        "main_text": clean_text(text),
+        "gallery_images": gallery_urls,
+        "script_images": script_images,
+        "brand_story_images": brand_images,
+        "manufacturer_images": manufacturer_images,
+        "aplus_text": aplus_text_content,
+        "videos": deduplicate(VIDEO_PATTERN.findall(html)),
+        # Structured fields and sections always come from lxml, so both engines agree on them
+        "fields": extract_dom_fields(document) if structured else {},
+        "sections": extract_sections(document) if structured else {},
+    }
+
+def _load_document(html: str):
+    try:
+        return lxml.html.document_fromstring(html)
+    except ValueError:
+        # lxml refuses str input that carries an XML encoding declaration
+        return lxml.html.document_fromstring(html.encode("utf-8"))
+
+def parse_with_lxml(html: str) -> ParsedPage:
+    """
+    Fast implementation: builds an lxml tree and collects every section in a single
+    traversal. Produces the same ParsedPage as parse_with_soup.
+    """
+    root = _load_document(html)
+
+    gallery_urls: List[str] = []
+    brand_images: List[str] = []
+    manufacturer_images: List[str] = []
+    aplus_buffers: List[List[str]] = []
+    script_texts: List[str] = []
+    # Main text candidates, in priority order (first element of each kind wins)
+    candidates = {"centerCol": None, "dp": None, "body": None}
+    gallery_found = brand_found = False
+
+    # Each frame: (removed, ignored, in_gallery, in_brand, aplus buffers, main text buffers)
+    root_frame = (False, False, False, False, (), ())
+    stack = [root_frame]
+
+    def add_text(frame, text):
+        if not text:
+            return
+        removed, ignored, _, _, aplus, main = frame
+        if ignored:
+            return
+        for buffer in aplus:
+            stripped = text.strip()
+            if stripped:
+                buffer.append(stripped)
+        if not removed:
+            for buffer in main:
+                buffer.append(text)
+
+    for event, el in etree.iterwalk(root, events=("start", "end", "comment", "pi")):
+        if event in ("comment", "pi"):
+            # Comments have no text of their own, but the text after them belongs to the parent
+            add_text(stack[-1], el.tail)
+            continue
+
+        if event == "end":
+            stack.pop()
+            add_text(stack[-1], el.tail)
+            continue
+
+        removed, ignored, in_gallery, in_brand, aplus, main = stack[-1]
+        tag = el.tag if isinstance(el.tag, str) else ""
+        element_id = el.get("id")
+        classes = el.get("class")
+        class_set = set(classes.split()) if classes else ()
+
+        if tag in REMOVED_TAGS:
+            removed = True
+        if tag in TEXT_IGNORED_TAGS:
+            ignored = True
+        if tag == "script" and el.text:
+            script_texts.append(el.text)
+
+        if not gallery_found and element_id == "altImages":
+            gallery_found = in_gallery = True
+        if not brand_found and "a-carousel-row" in class_set:
+            brand_found = in_brand = True
+        if class_set and APLUS_CLASSES <= class_set:
+            buffer = []
+            aplus_buffers.append(buffer)
+            aplus = aplus + (buffer,)
+
+        # Main text candidates only count if they survive the REMOVED_TAGS cleanup
+        if not removed:
+            key = element_id if element_id in ("centerCol", "dp") else ("body" if tag == "body" else None)
+            if key and candidates[key] is None:
+                buffer = []
+                candidates[key] = buffer
+                main = main + (buffer,)
+
+        if tag == "img":
+            if in_gallery:
+                src = maximize_image_url(el.get("src") or el.get("data-src"))
+                if src and src not in gallery_urls:
+                    gallery_urls.append(src)
+            if in_brand:
+                src = maximize_image_url(el.get("src") or el.get("data-src"))
+                if src and src not in brand_images:
+                    brand_images.append(src)
+            if aplus:
+                src = maximize_image_url(el.get("src") or el.get("data-src") or el.get("data-old-hires"))
+                if src and src not in manufacturer_images:
+                    manufacturer_images.append(src)
+
+        frame = (removed, ignored, in_gallery, in_brand, aplus, main)
+        stack.append(frame)
+        add_text(frame, el.text)
+
+    main_buffer = next((candidates[key] for key in ("centerCol", "dp", "body") if candidates[key] is not None), None)
+    if main_buffer is None:
+        main_buffer = [root.text_content()]
+
+    # Embedded JSON (hiRes images, videos) only lives inside <script> tags
+    script_source = "\n".join(script_texts)
+    script_images = []
+    if not gallery_urls:
+        matches = HIRES_PATTERN.findall(script_source)
+        script_images = deduplicate([maximize_image_url(m) for m in matches])[:MAX_SCRIPT_IMAGES]
+
+    return {
+        "main_text": clean_text(" ".join(main_buffer)),
+        "gallery_images": gallery_urls,
+        "script_images": script_images,
+        "brand_story_images": brand_images,
+        "manufacturer_images": manufacturer_images,
+        "aplus_text": "".join(" ".join(buffer) + "\n" for buffer in aplus_buffers),
+        "videos": deduplicate(VIDEO_PATTERN.findall(script_source)),
+        "fields": extract_dom_fields(root),
+        "sections": extract_sections(root),
+    }
+
+PARSER_ENGINES = {
+    "lxml": parse_with_lxml,
+    "soup": parse_with_soup,
+}
+
+def parse_document(html: str, engine: str = config.PARSER_ENGINE) -> ParsedPage:
+    """Parses a product page with the configured engine ("lxml" or "soup")."""
+    if engine not in PARSER_ENGINES:
+        raise ValueError(f"Unknown parser engine: {engine}")
+    return PARSER_ENGINES[engine](html)
+
+def media_fields(parsed: ParsedPage) -> Dict[str, List[str]]:
+    """Image and video lists of a parsed page, ready to be merged into ProductResponse."""
+    return {
+        # Fallback to script "hiRes" images if #altImages was empty
+        "images": parsed["gallery_images"] or parsed["script_images"],
+        "brand_story_images": parsed["brand_story_images"],
+        "manufacturer_images": parsed["manufacturer_images"],
+        "videos": parsed["videos"],
+    }
+
+def build_llm_input(parsed: ParsedPage) -> str:
+    """Builds the LLM input text from a parsed page (prose only; images and structured fields come from the DOM)."""
+    final_text = parsed["main_text"][:50000] # Main product info
+
+    if parsed["aplus_text"]:
+        final_text += "\n\n--- [SECTION: MANUFACTURER CONTENT (.aplus-v2)] ---\n"
+        # Truncate text heavily, it is only used for the description
+        final_text += parsed["aplus_text"][:1000] + "...\n"
+
+    return final_text
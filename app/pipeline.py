@@ -0,0 +1,228 @@
+import asyncio
+import re
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Set, Tuple
+from urllib.parse import urlsplit
+from app import config
+from app.graph import app_workflow, reprocess_workflow
+from app.models import ProductResponse, ProductResult
+from app.nodes import GraphState
+from app.snapshots import SnapshotReadError, snapshot_store
+from app.utils import asin_from_url
+
+# "/-/ko/dp/..." selects the page language, which changes the text we get back
+LANGUAGE_PREFIX_PATTERN = re.compile(r"^/-/([A-Za-z_-]+)/")
+
+def canonicalize_url(url: str) -> Tuple[str, str]:
+    """
+    Maps any Amazon product URL (tracking parameters, /ref=..., /gp/product/...) to
+    (cache key, canonical URL). URLs without an ASIN are returned unchanged.
+    """
+    asin = asin_from_url(url)
+    if not asin:
+        return url, url
+    parts = urlsplit(url)
+    host = (parts.hostname or "").lower()
+    language_match = LANGUAGE_PREFIX_PATTERN.match(parts.path)
+    language = language_match.group(1).lower() if language_match else ""
+    prefix = f"/-/{language}" if language else ""
+    port = f":{parts.port}" if parts.port else ""
+    canonical = f"{parts.scheme}://{host}{port}{prefix}/dp/{asin}"
+    key = f"{host.removeprefix('www.')}{port}|{language}|{asin}"
+    return key, canonical
+
+def initial_state(url: str) -> GraphState:
+    return {
+        "url": url,
+        "html_content": None,
+        "clean_text": None,
+        "product_data": None,
+        "error": None,
+        "fetch_tier": None,
+        "dom_fields": None,
+        "sections": None,
+        "compaction": None,
+        "timings": None,
+    }
+
+class ProductCache:
+    """
+    ASIN-level result cache in front of app_workflow.
+    - Single flight: concurrent requests for the same product share one workflow run
+    - TTL: results younger than fresh_ttl are returned as is
+    - Stale-while-revalidate: results younger than fresh_ttl + stale_ttl are returned
+      immediately while a background run refreshes them
+    """
+
+    def __init__(
+        self,
+        fresh_ttl: float = config.PRODUCT_CACHE_TTL,
+        stale_ttl: float = config.PRODUCT_CACHE_STALE_TTL,
+        max_items: int = config.PRODUCT_CACHE_MAX_ITEMS,
+        enabled: bool = config.PRODUCT_CACHE_ENABLED,
+    ):
+        self.fresh_ttl = fresh_ttl
+        self.stale_ttl = stale_ttl
+        self.max_items = max(1, max_items)
+        self.enabled = enabled
+
+        self._entries: "OrderedDict[str, Tuple[ProductResponse, float]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._waiters: Dict[str, int] = {}
+        self._background: Set[asyncio.Task] = set()
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.refreshes = 0
+
+    def _lookup(self, key: str) -> Optional[Tuple[ProductResponse, float]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        product, stored_at = entry
+        age = time.time() - stored_at
+        if age > self.fresh_ttl + self.stale_ttl:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return product, age
+
+    def _store(self, key: str, product: ProductResponse):
+        self._entries[key] = (product, time.time())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_items:
+            self._entries.popitem(last=False)
+
+    async def _run(self, key: str, url: str) -> GraphState:
+        final_state = await app_workflow.ainvoke(initial_state(url))
+        # Failures are never cached, the next request retries
+        if self.enabled and not final_state.get("error") and final_state.get("product_data") is not None:
+            self._store(key, final_state["product_data"])
+        return final_state
+
+    async def _single_flight(self, key: str, url: str) -> GraphState:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._run(key, url))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.coalesced += 1
+
+        self._waiters[key] = self._waiters.get(key, 0) + 1
+        try:
+            # Shielded: one caller going away must not cancel the run for the others
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if self._waiters.get(key) == 1 and not task.done():
+                # Last interested caller left (background refreshes count as callers); stop the work
+                task.cancel()
+            raise
+        finally:
+            self._waiters[key] -= 1
+            if self._waiters[key] <= 0:
+                self._waiters.pop(key, None)
+
+    def _refresh_in_background(self, key: str, url: str):
+        if key in self._inflight:
+            return
+        self.refreshes += 1
+        task = asyncio.create_task(self._single_flight(key, url))
+        self._background.add(task)
+
+        def done(t: asyncio.Task):
+            self._background.discard(t)
+            if not t.cancelled() and t.exception() is not None:
+                print(f"Background refresh failed for {url}: {t.exception()}")
+            elif not t.cancelled() and t.result().get("error"):
+                print(f"Background refresh failed for {url}: {t.result()['error']}")
+
+        task.add_done_callback(done)
+
+    async def crawl(self, url: str) -> GraphState:
+        """Returns the final workflow state for a product URL, served from cache when possible."""
+        key, canonical = canonicalize_url(url)
+
+        if self.enabled:
+            cached = self._lookup(key)
+            if cached is not None:
+                product, age = cached
+                if age <= self.fresh_ttl:
+                    self.hits += 1
+                else:
+                    self.stale_hits += 1
+                    self._refresh_in_background(key, canonical)
+                return {**initial_state(canonical), "product_data": product}
+
+        self.misses += 1
+        return await self._single_flight(key, canonical)
+
+    def put(self, url: str, product: ProductResponse):
+        """Replaces the cached result of a product (e.g. after reprocessing a snapshot)."""
+        if self.enabled:
+            self._store(canonicalize_url(url)[0], product)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "background_refreshes": self.refreshes,
+            "in_flight": len(self._inflight),
+        }
+
+    async def close(self):
+        for task in list(self._background):
+            task.cancel()
+
+
+# Shared by every API request
+product_cache = ProductCache()
+
+async def crawl_product(url: str) -> GraphState:
+    """Runs (or reuses) the fetch -> parse -> extract workflow for one product URL."""
+    return await product_cache.crawl(url)
+
+async def crawl_uncached(url: str) -> GraphState:
+    """Runs the workflow for one product URL, bypassing the product cache (batch runs)."""
+    return await app_workflow.ainvoke(initial_state(canonicalize_url(url)[1]))
+
+async def reprocess_product(asin: str) -> GraphState:
+    """
+    Runs parse -> compact -> extract on the newest stored snapshot of a product, without
+    fetching it again. A successful result replaces the cached one.
+    """
+    try:
+        snapshot = await snapshot_store.latest(asin)
+    except SnapshotReadError as e:
+        return {**initial_state(asin), "error": f"Snapshot of {asin} cannot be read: {e}"}
+    if snapshot is None:
+        return {**initial_state(asin), "error": f"No snapshot stored for {asin}"}
+    metadata, html = snapshot
+    state = {**initial_state(metadata["url"]), "html_content": html, "fetch_tier": "snapshot"}
+    final_state = await reprocess_workflow.ainvoke(state)
+    if not final_state.get("error") and final_state.get("product_data") is not None:
+        product_cache.put(metadata["url"], final_state["product_data"])
+    return final_state
+
+async def process_url_result(index: int, url: str, run=crawl_product) -> ProductResult:
+    """Runs one URL (or, with run=reprocess_product, one ASIN) and wraps the outcome (product or error) with its timing."""
+    start = time.perf_counter()
+    try:
+        final_state = await run(url)
+        error = final_state.get("error")
+        product = final_state.get("product_data")
+        if not error and product is None:
+            error = "No product data extracted"
+    except Exception as e:
+        error, product = f"{e.__class__.__name__}: {e}", None
+    elapsed_ms = round((time.perf_counter() - start) * 1000, 1)
+    if error:
+        return ProductResult(index=index, url=url, status="error", error=error, elapsed_ms=elapsed_ms)
+    return ProductResult(index=index, url=url, status="ok", product=product, elapsed_ms=elapsed_ms)
@@ -0,0 +1,95 @@
+import re
+from typing import Dict, List
+from lxml import etree
+from app.utils import clean_text
+
+# Product page sections worth sending to the LLM, in priority order.
+# Each section is read from the first element id that exists on the page.
+SECTION_IDS = {
+    "title": ["productTitle"],
+    "bullets": ["feature-bullets"],
+    "tech_specs": ["productDetails_techSpec_section_1", "technicalSpecifications_feature_div", "tech"],
+    "overview": ["productOverview_feature_div"],
+    "product_details": ["productDetails_detailBullets_sections1", "detailBullets_feature_div"],
+    "description": ["productDescription", "bookDescription_feature_div"],
+}
+
+# Never part of a section's text
+SKIPPED_TAGS = {"script", "style", "meta", "noscript", "header", "footer", "template"}
+# Tags that start a new line, so table rows and list items stay separate
+BLOCK_TAGS = {"tr", "li", "p", "div", "br", "ul", "ol", "table", "h1", "h2", "h3", "h4", "h5", "h6", "dt", "dd"}
+# Widgets embedded in sections that carry no product information
+NOISE_ID_PREFIXES = ("sims-", "rhf", "reviewsMedley", "customerReviews", "ask-", "HLCXComparison", "similarities", "sp_detail", "nav")
+NOISE_CLASSES = {"a-expander-prompt", "a-popover-preload", "aok-hidden"}
+
+def _is_noise(el) -> bool:
+    element_id = el.get("id") or ""
+    if element_id.startswith(NOISE_ID_PREFIXES):
+        return True
+    classes = el.get("class")
+    return bool(classes) and not NOISE_CLASSES.isdisjoint(classes.split())
+
+def section_text(el) -> str:
+    """
+    Text of a section with one line per row/list item and "key: value" for table rows,
+    so spec tables keep their structure for the LLM.
+    """
+    parts: List[str] = []
+    skipped_depth = 0
+    for event, node in etree.iterwalk(el, events=("start", "end", "comment")):
+        if event == "comment":
+            if not skipped_depth and node.tail:
+                parts.append(node.tail)
+            continue
+        tag = node.tag if isinstance(node.tag, str) else ""
+        if event == "start":
+            if skipped_depth or tag in SKIPPED_TAGS or _is_noise(node):
+                skipped_depth += 1
+                continue
+            if tag in BLOCK_TAGS:
+                parts.append("\n")
+            elif tag == "td" and node.getprevious() is not None and node.getprevious().tag in ("th", "td"):
+                parts.append(": ")
+            if node.text:
+                parts.append(node.text)
+        else:
+            if skipped_depth:
+                skipped_depth -= 1
+                if skipped_depth:
+                    continue
+            elif tag in BLOCK_TAGS:
+                parts.append("\n")
+            # The section element's own tail is outside of it
+            if node is not el and node.tail:
+                parts.append(node.tail)
+
+    lines = []
+    for line in "".join(parts).split("\n"):
+        line = clean_text(line)
+        # Bidi marks Amazon uses around "Label ‏ : ‎ Value"
+        line = re.sub(r"\s*[\u200e\u200f]+\s*", " ", line)
+        line = re.sub(r"\s+:\s+", ": ", line).strip()
+        if line:
+            lines.append(line)
+    return "\n".join(lines)
+
+def extract_sections(root) -> Dict[str, str]:
+    """Reads the known product sections from an lxml document (missing sections are left out)."""
+    # One pass over the elements that have an id; the first element per id wins
+    by_id = {}
+    for el in root.iter():
+        element_id = el.get("id") if isinstance(el.tag, str) else None
+        if element_id and element_id not in by_id:
+            by_id[element_id] = el
+
+    sections = {}
+    for name, ids in SECTION_IDS.items():
+        for element_id in ids:
+            el = by_id.get(element_id)
+            if el is None:
+                continue
+            text = section_text(el)
+            if text:
+                sections[name] = text
+                break
+    return sections
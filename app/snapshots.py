@@ -0,0 +1,288 @@
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+import zstandard
+from app import config
+
+# A *.tmp blob older than this (seconds) belongs to a save that crashed and is deleted by prune
+TEMPORARY_FILE_MAX_AGE = 3600
+
+class SnapshotReadError(Exception):
+    """A snapshot is indexed but its blob is missing or unreadable."""
+
+class SnapshotStore:
+    """
+    Raw HTML of every fetched product page, so pages can be parsed and extracted again
+    (after a parser or prompt change) without going back to Amazon.
+    - Blobs: zstd-compressed, content-addressed by the SHA-256 of the HTML (<dir>/ab/abcdef....html.zst);
+      identical pages are stored once
+    - Index: SQLite table of (ASIN, URL, fetch time, blob hash)
+    - Retention: snapshots older than retention_days are dropped, and only the newest
+      keep_per_asin snapshots of a product are kept; unreferenced blobs are deleted
+    """
+
+    def __init__(
+        self,
+        directory: str = config.SNAPSHOT_DIR,
+        retention_days: float = config.SNAPSHOT_RETENTION_DAYS,
+        keep_per_asin: int = config.SNAPSHOT_KEEP_PER_ASIN,
+        level: int = config.SNAPSHOT_ZSTD_LEVEL,
+        enabled: bool = config.SNAPSHOT_ENABLED,
+    ):
+        self.directory = directory
+        self.retention_days = retention_days
+        self.keep_per_asin = keep_per_asin
+        self.level = level
+        self.enabled = enabled
+
+        self._db: Optional[sqlite3.Connection] = None
+        # Blob files are written and deleted under the connection lock (and an IMMEDIATE transaction,
+        # for other processes sharing the directory), so a prune never removes a blob that a
+        # concurrent save is about to reference.
+        self._db_lock = threading.Lock()
+        self._saves_since_prune = 0
+        self._prune_task: Optional[asyncio.Task] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            os.makedirs(self.directory, exist_ok=True)
+            # Pruning a large directory holds the write lock for a while
+            self._db = sqlite3.connect(os.path.join(self.directory, "index.sqlite3"), check_same_thread=False, timeout=60)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS snapshots (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    asin TEXT,
+                    url TEXT NOT NULL,
+                    sha256 TEXT NOT NULL,
+                    fetch_tier TEXT,
+                    fetched_at REAL NOT NULL,
+                    raw_bytes INTEGER NOT NULL,
+                    stored_bytes INTEGER NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS snapshots_asin ON snapshots (asin, fetched_at);
+                CREATE INDEX IF NOT EXISTS snapshots_fetched ON snapshots (fetched_at);
+                CREATE INDEX IF NOT EXISTS snapshots_sha ON snapshots (sha256);
+                """
+            )
+            self._db.commit()
+        return self._db
+
+    def _blob_path(self, sha256: str) -> str:
+        return os.path.join(self.directory, sha256[:2], f"{sha256}.html.zst")
+
+    # --- Runs in worker threads ---
+
+    def _save(self, url: str, asin: Optional[str], html: str, fetch_tier: Optional[str]) -> Dict[str, Any]:
+        raw = html.encode("utf-8")
+        sha256 = hashlib.sha256(raw).hexdigest()
+        path = self._blob_path(sha256)
+        # Compressed outside the lock; re-checked below, since the blob may be pruned meanwhile
+        compressed = None if os.path.exists(path) else zstandard.ZstdCompressor(level=self.level).compress(raw)
+
+        with self._db_lock:
+            db = self._connect()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                if os.path.exists(path):
+                    stored_bytes = os.path.getsize(path)
+                else:
+                    if compressed is None:
+                        compressed = zstandard.ZstdCompressor(level=self.level).compress(raw)
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    # Write then rename, so a crash never leaves a truncated blob behind
+                    temporary = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                    with open(temporary, "wb") as f:
+                        f.write(compressed)
+                    os.replace(temporary, path)
+                    stored_bytes = len(compressed)
+                cursor = db.execute(
+                    "INSERT INTO snapshots (asin, url, sha256, fetch_tier, fetched_at, raw_bytes, stored_bytes) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (asin, url, sha256, fetch_tier, time.time(), len(raw), stored_bytes),
+                )
+                db.commit()
+            except BaseException:
+                db.rollback()
+                raise
+            snapshot_id = cursor.lastrowid
+        return {"id": snapshot_id, "sha256": sha256, "raw_bytes": len(raw), "stored_bytes": stored_bytes}
+
+    def _read_blob(self, sha256: str) -> str:
+        try:
+            with open(self._blob_path(sha256), "rb") as f:
+                return zstandard.ZstdDecompressor().decompress(f.read()).decode("utf-8")
+        except FileNotFoundError:
+            raise SnapshotReadError(f"blob {sha256} is missing")
+        except (OSError, zstandard.ZstdError, UnicodeDecodeError) as e:
+            raise SnapshotReadError(f"blob {sha256} is unreadable: {e}")
+
+    _COLUMNS = "id, asin, url, sha256, fetch_tier, fetched_at, raw_bytes, stored_bytes"
+
+    def _row_dict(self, row: tuple) -> Dict[str, Any]:
+        return dict(zip(self._COLUMNS.split(", "), row))
+
+    def _find(self, where: str, args: tuple, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        with self._db_lock:
+            db = self._connect()
+            sql = f"SELECT {self._COLUMNS} FROM snapshots WHERE {where} ORDER BY fetched_at DESC, id DESC"
+            if limit:
+                sql += f" LIMIT {int(limit)}"
+            return [self._row_dict(row) for row in db.execute(sql, args).fetchall()]
+
+    def _latest_per_asin(self, since: Optional[float]) -> List[Dict[str, Any]]:
+        with self._db_lock:
+            db = self._connect()
+            rows = db.execute(
+                f"SELECT {self._COLUMNS} FROM snapshots s WHERE asin IS NOT NULL AND fetched_at >= ? "
+                "AND id = (SELECT id FROM snapshots WHERE asin = s.asin ORDER BY fetched_at DESC, id DESC LIMIT 1) "
+                "ORDER BY asin",
+                (since or 0,),
+            ).fetchall()
+            return [self._row_dict(row) for row in rows]
+
+    def _prune(self) -> int:
+        with self._db_lock:
+            db = self._connect()
+            removed = 0
+            if self.retention_days > 0:
+                cutoff = time.time() - self.retention_days * 86400
+                removed += db.execute("DELETE FROM snapshots WHERE fetched_at < ?", (cutoff,)).rowcount
+            if self.keep_per_asin > 0:
+                removed += db.execute(
+                    "DELETE FROM snapshots WHERE asin IS NOT NULL AND id NOT IN ("
+                    "SELECT id FROM (SELECT id, ROW_NUMBER() OVER (PARTITION BY asin ORDER BY fetched_at DESC, id DESC) AS n "
+                    "FROM snapshots WHERE asin IS NOT NULL) WHERE n <= ?)",
+                    (self.keep_per_asin,),
+                ).rowcount
+            db.commit()
+            referenced = {row[0] for row in db.execute("SELECT DISTINCT sha256 FROM snapshots")}
+
+        # The directory scan runs without the lock, so saves are not held up by it
+        unreferenced = []
+        stale_before = time.time() - TEMPORARY_FILE_MAX_AGE
+        for prefix in os.listdir(self.directory):
+            folder = os.path.join(self.directory, prefix)
+            if not os.path.isdir(folder):
+                continue
+            for name in os.listdir(folder):
+                path = os.path.join(folder, name)
+                if name.endswith(".html.zst") and name[: -len(".html.zst")] not in referenced:
+                    unreferenced.append(name[: -len(".html.zst")])
+                elif name.endswith(".tmp"):
+                    # Left behind by a save that crashed between writing and renaming
+                    try:
+                        if os.path.getmtime(path) < stale_before:
+                            os.remove(path)
+                    except OSError:
+                        pass
+
+        for i in range(0, len(unreferenced), 100):
+            self._delete_blobs(unreferenced[i:i + 100])
+        return removed
+
+    def _delete_blobs(self, hashes: List[str]):
+        """Deletes blobs that are still unreferenced; a save may have reused one since the scan."""
+        with self._db_lock:
+            db = self._connect()
+            # The write lock keeps saves of other processes out until the files are gone
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                for sha256 in hashes:
+                    if db.execute("SELECT 1 FROM snapshots WHERE sha256 = ? LIMIT 1", (sha256,)).fetchone() is None:
+                        try:
+                            os.remove(self._blob_path(sha256))
+                        except OSError:
+                            pass
+            finally:
+                db.commit()
+
+    def _stats(self) -> Dict[str, Any]:
+        with self._db_lock:
+            db = self._connect()
+            count, products, raw, stored = db.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT asin), COALESCE(SUM(raw_bytes), 0), COALESCE(SUM(stored_bytes), 0) FROM snapshots"
+            ).fetchone()
+            blobs, blob_bytes = db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(stored_bytes), 0) FROM (SELECT sha256, MAX(stored_bytes) AS stored_bytes FROM snapshots GROUP BY sha256)"
+            ).fetchone()
+        return {"snapshots": count, "products": products, "raw_bytes": raw, "blobs": blobs, "blob_bytes": blob_bytes}
+
+    def _close(self):
+        with self._db_lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    # --- Public API ---
+
+    async def save(self, url: str, asin: Optional[str], html: str, fetch_tier: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Stores a fetched page. Failures are logged, never raised (the crawl goes on without a snapshot)."""
+        if not self.enabled:
+            return None
+        try:
+            saved = await asyncio.to_thread(self._save, url, asin, html, fetch_tier)
+        except (OSError, sqlite3.Error) as e:
+            print(f"Snapshot write failed for {url}: {e}")
+            return None
+        self._saves_since_prune += 1
+        if self._saves_since_prune >= 100 and (self._prune_task is None or self._prune_task.done()):
+            # In the background: the request that happens to cross the threshold does not wait for it
+            self._saves_since_prune = 0
+            self._prune_task = asyncio.create_task(self._background_prune())
+        return saved
+
+    async def _background_prune(self):
+        try:
+            await self.prune()
+        except (OSError, sqlite3.Error) as e:
+            print(f"Snapshot prune failed: {e}")
+
+    async def latest(self, asin: str) -> Optional[Tuple[Dict[str, Any], str]]:
+        """(metadata, html) of the newest snapshot of a product, or None. Raises SnapshotReadError if its blob is gone."""
+        rows = await asyncio.to_thread(self._find, "asin = ?", (asin,), 1)
+        if not rows:
+            return None
+        return rows[0], await asyncio.to_thread(self._read_blob, rows[0]["sha256"])
+
+    async def get(self, snapshot_id: int) -> Optional[Tuple[Dict[str, Any], str]]:
+        rows = await asyncio.to_thread(self._find, "id = ?", (snapshot_id,), 1)
+        if not rows:
+            return None
+        return rows[0], await asyncio.to_thread(self._read_blob, rows[0]["sha256"])
+
+    async def history(self, asin: str) -> List[Dict[str, Any]]:
+        """Snapshot metadata of a product, newest first."""
+        return await asyncio.to_thread(self._find, "asin = ?", (asin,))
+
+    async def latest_per_asin(self, since: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Newest snapshot of every product (fetched at or after `since`, a UNIX time)."""
+        return await asyncio.to_thread(self._latest_per_asin, since)
+
+    async def prune(self) -> int:
+        """Applies the retention policy; returns the number of snapshots removed."""
+        removed = await asyncio.to_thread(self._prune)
+        if removed:
+            print(f"Pruned {removed} snapshot(s)")
+        return removed
+
+    async def stats(self) -> Dict[str, Any]:
+        if not self.enabled:
+            return {"enabled": False}
+        return {"enabled": True, **(await asyncio.to_thread(self._stats))}
+
+    async def close(self):
+        if self._prune_task is not None:
+            # A prune already running in its thread finishes; one not yet started is skipped
+            self._prune_task.cancel()
+            await asyncio.gather(self._prune_task, return_exceptions=True)
+            self._prune_task = None
+        await asyncio.to_thread(self._close)
+
+
+# Shared by fetch_page (writes) and reprocessing (reads)
+snapshot_store = SnapshotStore()
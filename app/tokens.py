@@ -0,0 +1,78 @@
+import logging
+import re
+import threading
+from app import config
+
+logger = logging.getLogger(__name__)
+
+# Claude's tokenizer is not public; cl100k_base is a close enough stand-in for budgeting
+TIKTOKEN_ENCODING = "cl100k_base"
+
+_encoding = None
+_encoding_failed = False
+# Nodes run in worker threads; load the encoding only once
+_encoding_lock = threading.Lock()
+
+def _get_encoding():
+    """Loads the tiktoken encoding once. Returns None (and stops trying) if it cannot be loaded."""
+    global _encoding, _encoding_failed
+    if _encoding is not None or _encoding_failed or config.TOKEN_COUNTER != "tiktoken":
+        return _encoding
+    with _encoding_lock:
+        if _encoding is None and not _encoding_failed:
+            try:
+                import tiktoken
+                _encoding = tiktoken.get_encoding(TIKTOKEN_ENCODING)
+            except Exception as e:
+                # Missing package or no network to download the encoding file. Logged once: budgets
+                # are now checked against an estimate that can be off either way
+                logger.warning(
+                    "tiktoken encoding %s unavailable (%s: %s); token counts and COMPACTION_TOKEN_BUDGET use a character estimate",
+                    TIKTOKEN_ENCODING, e.__class__.__name__, e,
+                )
+                _encoding_failed = True
+    return _encoding
+
+def tokenizer_name() -> str:
+    """The counter actually in use: "tiktoken:cl100k_base", or "estimate" (configured or fallen back to)."""
+    return f"tiktoken:{TIKTOKEN_ENCODING}" if _get_encoding() is not None else "estimate"
+
+_NON_ASCII = re.compile(r"[^\x00-\x7f]")
+
+def estimate_tokens(text: str) -> int:
+    """Rough count: ~4 ASCII characters per token, ~1 token per non-ASCII character (Hangul, CJK)."""
+    non_ascii = len(_NON_ASCII.findall(text))
+    return (len(text) - non_ascii + 3) // 4 + non_ascii
+
+def count_tokens(text: str) -> int:
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return estimate_tokens(text)
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cuts text to at most max_tokens tokens (at a line or word boundary when the estimator is used)."""
+    if max_tokens <= 0 or not text:
+        return ""
+    encoding = _get_encoding()
+    if encoding is not None:
+        tokens = encoding.encode(text, disallowed_special=())
+        if len(tokens) <= max_tokens:
+            return text
+        return encoding.decode(tokens[:max_tokens])
+
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    # Binary search for the longest prefix that fits
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if estimate_tokens(text[:middle]) <= max_tokens:
+            low = middle
+        else:
+            high = middle - 1
+    cut = text[:low]
+    boundary = max(cut.rfind("\n"), cut.rfind(" "))
+    return cut[:boundary] if boundary > len(cut) // 2 else cut
@@ -0,0 +1,159 @@
+import hashlib
+import re
+import unicodedata
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from app import config
+from app.cache import TieredStore
+from app.compaction import is_noise_line
+from app.utils import clean_text
+
+# Bump to drop every stored translation (e.g. after a change of tone in the prompt)
+TRANSLATION_MEMORY_VERSION = "1"
+
+# Spec sections that end up in ProductResponse.specifications / product_details
+SPECIFICATION_SECTIONS = ("tech_specs", "overview")
+DETAIL_SECTIONS = ("product_details",)
+# Every section PageFragments splits into fragments
+FRAGMENT_SECTIONS = ("bullets",) + SPECIFICATION_SECTIONS + DETAIL_SECTIONS
+
+# Fragments without words (numbers, units, model codes) are kept as they are
+_HAS_WORDS = re.compile(r"[^\W\d_]{2,}")
+_UNIT_ONLY = re.compile(r"^[\d\s.,x×/\-+%()]*[a-zA-Z]{0,3}\.?[\d\s.,x×/\-+%()]*$")
+
+def normalize_fragment(text: str) -> str:
+    """Form of a fragment used for matching: NFKC, no bidi marks, collapsed whitespace, case-folded."""
+    text = unicodedata.normalize("NFKC", text).replace("\u200e", "").replace("\u200f", "")
+    return clean_text(text).casefold()
+
+def fragment_key(kind: str, text: str) -> str:
+    """Content address of a fragment. Keys and values of a spec row are separate fragments."""
+    digest = hashlib.sha256()
+    for part in (TRANSLATION_MEMORY_VERSION, kind, normalize_fragment(text)):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+def needs_translation(text: str) -> bool:
+    return bool(_HAS_WORDS.search(text)) and not _UNIT_ONLY.match(text)
+
+def _lines(sections: Dict[str, str], names: Iterable[str]) -> List[str]:
+    lines = []
+    for name in names:
+        for line in (sections.get(name) or "").split("\n"):
+            line = line.strip()
+            if line and not is_noise_line(line):
+                lines.append(line)
+    return lines
+
+def _rows(lines: List[str]) -> List[Tuple[str, str]]:
+    rows = []
+    for line in lines:
+        key, separator, value = line.partition(": ")
+        if separator and key.strip() and value.strip():
+            rows.append((key.strip(), value.strip()))
+    return rows
+
+def parse_rewrites(raw: Any, fragments: List[Tuple[str, str]]) -> Dict[Tuple[str, str], str]:
+    """
+    Rewrites from the LLM's "fragments" answer, numbered like the FRAGMENTS list of the prompt:
+    an object {"1": "...", ...} or a list in prompt order. Other shapes, unknown numbers and
+    entries that are not non-empty strings are skipped (those fragments keep their source text).
+    """
+    if isinstance(raw, dict):
+        entries = list(raw.items())
+    elif isinstance(raw, list):
+        entries = list(enumerate(raw, 1))
+    else:
+        return {}
+    translated = {}
+    for number, rewrite in entries:
+        try:
+            index = int(str(number).strip().rstrip(".")) - 1
+        except ValueError:
+            continue
+        if 0 <= index < len(fragments) and isinstance(rewrite, str) and rewrite.strip():
+            translated[fragments[index]] = rewrite.strip()
+    return translated
+
+class PageFragments:
+    """The rewritable fragments of a page: feature bullets and spec / detail rows."""
+
+    def __init__(self, sections: Dict[str, str]):
+        self.bullets = _lines(sections, ("bullets",))
+        self.specifications = _rows(_lines(sections, SPECIFICATION_SECTIONS))
+        self.details = _rows(_lines(sections, DETAIL_SECTIONS))
+
+    def __bool__(self) -> bool:
+        return bool(self.bullets or self.specifications or self.details)
+
+    def fragments(self) -> List[Tuple[str, str]]:
+        """Unique (kind, text) pairs that need a translation, in page order."""
+        seen = set()
+        result = []
+        pairs = [("bullet", b) for b in self.bullets]
+        for key, value in self.specifications + self.details:
+            pairs.append(("key", key))
+            pairs.append(("value", value))
+        for kind, text in pairs:
+            if needs_translation(text) and (kind, text) not in seen:
+                seen.add((kind, text))
+                result.append((kind, text))
+        return result
+
+    def assemble(self, translations: Dict[Tuple[str, str], str]) -> Dict[str, object]:
+        """features / specifications / product_details, with the source text where no translation is known."""
+        def tr(kind: str, text: str) -> str:
+            return translations.get((kind, text)) or text
+
+        def table(rows: List[Tuple[str, str]]) -> Dict[str, str]:
+            result: Dict[str, str] = {}
+            # Output key -> source key, so two rows whose keys translate alike do not overwrite each other
+            sources: Dict[str, str] = {}
+            for key, value in rows:
+                name = tr("key", key)
+                if sources.get(name, key) != key:
+                    # Collision: the later row keeps its source key (numbered if that is taken too)
+                    name, number = key, 2
+                    while sources.get(name, key) != key:
+                        name, number = f"{key} ({number})", number + 1
+                sources[name] = key
+                result[name] = tr("value", value)
+            return result
+
+        return {
+            "features": [tr("bullet", b) for b in self.bullets],
+            "specifications": table(self.specifications),
+            "product_details": table(self.details),
+        }
+
+
+class TranslationMemory(TieredStore):
+    """
+    Fragment-level translation memory: Korean rewrites of bullets and spec keys/values,
+    shared across products so the LLM only rewrites fragments it has not seen before.
+    Kept in a TieredStore, bounded by TTL and disk size like the LLM cache.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = config.TRANSLATION_MEMORY_PATH,
+        memory_items: int = config.TRANSLATION_MEMORY_ITEMS,
+        ttl_seconds: float = config.TRANSLATION_MEMORY_TTL,
+        max_disk_bytes: int = config.TRANSLATION_MEMORY_MAX_DISK_MB * 1024 * 1024,
+        enabled: bool = config.TRANSLATION_MEMORY_ENABLED,
+    ):
+        super().__init__("Translation memory", path, "translation_memory", memory_items, ttl_seconds, max_disk_bytes, enabled)
+
+    async def lookup(self, fragments: List[Tuple[str, str]]) -> Dict[Tuple[str, str], str]:
+        """Known translations for (kind, text) fragments."""
+        keys = {fragment: fragment_key(*fragment) for fragment in fragments}
+        found = await self.get_many(keys.values())
+        return {fragment: found[key] for fragment, key in keys.items() if key in found}
+
+    async def store(self, translations: Dict[Tuple[str, str], str]):
+        """Remembers new (kind, text) -> Korean rewrites."""
+        await self.set_many({fragment_key(kind, source): target for (kind, source), target in translations.items()})
+
+
+# Shared by every extract_with_llm call
+translation_memory = TranslationMemory()
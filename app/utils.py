@@ -1,7 +1,14 @@
-import random
+import re
+from typing import List, Optional
 from fake_useragent import UserAgent
 
-ua = UserAgent()
+# Desktop only: mobile user agents get Amazon's mobile layout, which has none of the sections we parse
+ua = UserAgent(platforms="desktop")
+
+CAPTCHA_MARKER = "Type the characters you see in this image"
+
+# /dp/ASIN, /gp/product/ASIN, /gp/aw/d/ASIN, /product/ASIN
+ASIN_URL_PATTERN = re.compile(r"/(?:dp|gp/product|gp/aw/d|product)/([A-Z0-9]{10})(?=[/?#]|$)")
 
 def get_headers():
     """Returns headers to mimic a real browser request."""
@@ -24,3 +31,35 @@ def clean_text(text: str) -> str:
     if not text:
         return ""
     return " ".join(text.split())
+
+def is_captcha_page(html: str) -> bool:
+    """Detects Amazon's robot check page."""
+    return CAPTCHA_MARKER in html
+
+def missing_sections(html: str, element_ids: List[str]) -> List[str]:
+    """Returns the element ids (e.g. "centerCol") that do not appear in the raw HTML."""
+    return [
+        element_id for element_id in element_ids
+        # (?<![\w-]): a real id attribute, not data-id / aria-... lookalikes
+        if not re.search(r"""(?<![\w-])id\s*=\s*["']?""" + re.escape(element_id) + r"""["'\s/>]""", html)
+    ]
+
+def asin_from_url(url: str) -> Optional[str]:
+    """Extracts the ASIN from an Amazon product URL."""
+    match = ASIN_URL_PATTERN.search(url)
+    return match.group(1) if match else None
+
+def maximize_image_url(url: Optional[str]) -> Optional[str]:
+    """Removes Amazon's resize markers (e.g., ._AC_SL1500_, ._SR75,75_, ._AC_US100_)."""
+    if not url: return None
+    # Pattern matches ._ followed by anything until the last _ before the extension
+    return re.sub(r"\._.+?_(\.[a-z]+)$", r"\1", url)
+
+def deduplicate(url_list):
+    seen = set()
+    unique = []
+    for url in url_list:
+        if url and url not in seen:
+            seen.add(url)
+            unique.append(url)
+    return unique
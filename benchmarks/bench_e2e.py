@@ -0,0 +1,245 @@
+"""
+Offline end-to-end benchmark: the real API, fed by the Amazon replay server and the stub LLM.
+
+Usage:
+    python -m benchmarks.bench_e2e [--concurrency 1,4,16] [--requests 40] [--llm-latency-ms 800]
+
+Starts three local processes (benchmarks.replay_server, benchmarks.stub_llm and the API
+with uvicorn), then for every concurrency level sends --requests POST /api/v1/product/info
+calls, each for a product that was not requested before (so the caches do not answer).
+Reports throughput, end-to-end and per-stage (Server-Timing) p50/p95/p99 latency, errors,
+and the peak RSS of the API process and its parse workers. --json writes the same numbers
+for regression checks.
+
+The browser is disabled by default, so only the HTTP fast path is measured and no
+Chromium is needed; --browser keeps it as the fallback.
+"""
+import argparse
+import asyncio
+import glob
+import itertools
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+import httpx
+
+STAGES = ["fetch", "parse", "compact", "extract"]
+# Distinct 10-character ASINs, so each request is a product the caches have not seen
+_asin_counter = itertools.count()
+
+def next_asin() -> str:
+    return f"B0BENCH{next(_asin_counter):03d}"
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile (None for no values)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+def parse_server_timing(header: str) -> Dict[str, float]:
+    """'fetch;dur=812.4, parse;dur=35.2' -> {"fetch": 812.4, "parse": 35.2} (single-URL requests)."""
+    timings = {}
+    for entry in header.split(","):
+        name, _, params = entry.strip().partition(";")
+        for param in params.split(";"):
+            key, _, value = param.partition("=")
+            if key.strip() == "dur":
+                timings[name] = float(value)
+    return timings
+
+def _process_tree(pid: int) -> List[int]:
+    """The process and all its descendants (e.g. the parse pool workers)."""
+    pids = [pid]
+    for task in glob.glob(f"/proc/{pid}/task/*/children"):
+        try:
+            with open(task) as f:
+                children = [int(child) for child in f.read().split()]
+        except OSError:
+            continue
+        for child in children:
+            pids.extend(_process_tree(child))
+    return pids
+
+def peak_rss_mb(pid: int) -> Optional[float]:
+    """Sum of the peak resident set sizes of a process and its children (Linux /proc only)."""
+    total_kb = None
+    for process in _process_tree(pid):
+        try:
+            with open(f"/proc/{process}/status") as f:
+                for line in f:
+                    if line.startswith("VmHWM:"):
+                        total_kb = (total_kb or 0) + int(line.split()[1])
+        except OSError:
+            continue
+    return total_kb / 1024 if total_kb is not None else None
+
+def start_process(args: List[str], env: dict, log) -> subprocess.Popen:
+    return subprocess.Popen([sys.executable, *args], env=env, stdout=log, stderr=subprocess.STDOUT)
+
+async def wait_until_healthy(client: httpx.AsyncClient, url: str, processes: List[subprocess.Popen], timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        for process in processes:
+            if process.poll() is not None:
+                raise RuntimeError(f"{' '.join(process.args)} exited with {process.returncode} (see --log)")
+        try:
+            if (await client.get(url)).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} did not become healthy within {timeout}s")
+
+async def run_level(client: httpx.AsyncClient, api: str, amazon: str, concurrency: int, total: int) -> dict:
+    latencies: List[float] = []
+    stages: Dict[str, List[float]] = {stage: [] for stage in STAGES}
+    errors: List[str] = []
+    queue = asyncio.Queue()
+    for _ in range(total):
+        queue.put_nowait(f"{amazon}/dp/{next_asin()}")
+
+    async def client_loop():
+        while not queue.empty():
+            url = queue.get_nowait()
+            start = time.perf_counter()
+            try:
+                response = await client.post(f"{api}/api/v1/product/info", json={"urls": [url]})
+            except httpx.HTTPError as e:
+                errors.append(f"{e.__class__.__name__}: {e}")
+                continue
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            if response.status_code != 200:
+                errors.append(f"HTTP {response.status_code}: {response.text[:200]}")
+                continue
+            latencies.append(elapsed_ms)
+            for stage, ms in parse_server_timing(response.headers.get("server-timing", "")).items():
+                stages.setdefault(stage, []).append(ms)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+    wall = time.perf_counter() - start
+
+    def summary(values):
+        return {f"p{p}": percentile(values, p) for p in (50, 95, 99)}
+
+    return {
+        "concurrency": concurrency,
+        "requests": total,
+        "ok": len(latencies),
+        "errors": len(errors),
+        "first_error": errors[0] if errors else None,
+        "wall_seconds": round(wall, 3),
+        "throughput_rps": round(len(latencies) / wall, 2) if wall else 0.0,
+        "latency_ms": summary(latencies),
+        "stages_ms": {stage: summary(values) for stage, values in stages.items() if values},
+    }
+
+def print_level(result: dict):
+    def fmt(value):
+        return f"{value:9.1f}" if value is not None else "      n/a"
+
+    print(
+        f"\nconcurrency {result['concurrency']}: {result['ok']}/{result['requests']} ok, "
+        f"{result['throughput_rps']} req/s, peak RSS {fmt(result['peak_rss_mb']).strip()} MB"
+    )
+    if result["first_error"]:
+        print(f"  first error: {result['first_error']}")
+    print(f"  {'':<10}{'p50':>9}{'p95':>9}{'p99':>9}  (ms)")
+    rows = [("total", result["latency_ms"])] + list(result["stages_ms"].items())
+    for name, values in rows:
+        print(f"  {name:<10}{fmt(values['p50'])}{fmt(values['p95'])}{fmt(values['p99'])}")
+
+async def run(args) -> List[dict]:
+    tmp = tempfile.mkdtemp(prefix="bench_e2e_")
+    amazon = f"http://127.0.0.1:{args.amazon_port}"
+    llm = f"http://127.0.0.1:{args.llm_port}"
+    api = f"http://127.0.0.1:{args.api_port}"
+
+    env = {
+        **os.environ,
+        # Local servers only: never route them through a proxy
+        "NO_PROXY": "127.0.0.1,localhost",
+        "no_proxy": "127.0.0.1,localhost",
+    }
+    api_env = {
+        **env,
+        "BEDROCK_URL": llm,
+        "BROWSER_ENABLED": "true" if args.browser else "false",
+        # Both recorded pages have #dp; the script-gallery page has no #altImages
+        "FETCH_HTTP_REQUIRED_IDS": "dp",
+        "LLM_CACHE_ENABLED": "true" if args.llm_cache else "false",
+        "LLM_CACHE_PATH": os.path.join(tmp, "llm_cache.sqlite3"),
+        "TRANSLATION_MEMORY_PATH": os.path.join(tmp, "translation_memory.sqlite3"),
+        "SNAPSHOT_DIR": os.path.join(tmp, "snapshots"),
+        "JOB_DB_PATH": os.path.join(tmp, "jobs.sqlite3"),
+        "JOB_WORKERS": "0",
+        "SERVER_TIMING_ENABLED": "true",
+    }
+
+    log = open(args.log, "a") if args.log else subprocess.DEVNULL
+    processes = [
+        start_process(["-m", "benchmarks.replay_server", "--port", str(args.amazon_port), "--latency-ms", str(args.amazon_latency_ms), "--scale", str(args.scale)], env, log),
+        start_process(["-m", "benchmarks.stub_llm", "--port", str(args.llm_port), "--latency-ms", str(args.llm_latency_ms)], env, log),
+        start_process(["-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(args.api_port), "--log-level", "warning"], api_env, log),
+    ]
+    api_process = processes[-1]
+
+    results = []
+    try:
+        limits = httpx.Limits(max_connections=max(args.concurrency) + 4)
+        async with httpx.AsyncClient(timeout=300, limits=limits, trust_env=False) as client:
+            for url in (f"{amazon}/health", f"{llm}/health", f"{api}/health"):
+                await wait_until_healthy(client, url, processes)
+
+            # Warm-up: imports, first tokenizer use, connection pools
+            await run_level(client, api, amazon, 1, args.warmup)
+
+            for concurrency in args.concurrency:
+                result = await run_level(client, api, amazon, concurrency, args.requests)
+                # High-water mark of the API process (and its parse workers) so far
+                result["peak_rss_mb"] = peak_rss_mb(api_process.pid)
+                print_level(result)
+                results.append(result)
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        if log is not subprocess.DEVNULL:
+            log.close()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmark of /api/v1/product/info")
+    parser.add_argument("--concurrency", default="1,4,16", help="Comma separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=40, help="Requests per concurrency level")
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--scale", type=int, default=50, help="Page padding, see bench_parse")
+    parser.add_argument("--amazon-latency-ms", type=float, default=150)
+    parser.add_argument("--llm-latency-ms", type=float, default=800)
+    parser.add_argument("--llm-cache", action="store_true", help="Keep the LLM cache enabled")
+    parser.add_argument("--browser", action="store_true", help="Keep the Playwright fallback enabled")
+    parser.add_argument("--amazon-port", type=int, default=8101)
+    parser.add_argument("--llm-port", type=int, default=8102)
+    parser.add_argument("--api-port", type=int, default=8103)
+    parser.add_argument("--log", help="File for the output of the three servers")
+    parser.add_argument("--json", help="Write the results to this file")
+    args = parser.parse_args()
+    args.concurrency = [int(c) for c in args.concurrency.split(",") if c.strip()]
+
+    results = asyncio.run(run(args))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Micro-benchmark for the parse stage.
+
+Usage:
+    python -m benchmarks.bench_parse [--repeat 20] [--scale 50]
+
+--scale pads each fixture with blocks of ~17 KB of review markup so the page size
+gets close to a real Amazon product page (1-2 MB).
+
+Speedups are relative to "baseline": the BeautifulSoup-only parse (no structured fields or
+sections). The "soup" engine also builds an lxml document for those, so it is slower than
+the baseline and not a fair reference.
+"""
+import argparse
+import glob
+import os
+import statistics
+import time
+from functools import partial
+from app.parser import PARSER_ENGINES, build_llm_input, parse_with_soup
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+def load_fixtures(scale: int = 1):
+    pages = {}
+    for path in sorted(glob.glob(os.path.join(FIXTURES_DIR, "*.html"))):
+        with open(path, encoding="utf-8") as f:
+            html = f.read()
+        if scale > 1:
+            # Noise outside of #centerCol, like the review and recommendation widgets on real pages
+            review = '<div class="a-section review"><span class="a-profile-name">Customer</span><span class="review-text">Great product, works as described. Would buy again.</span></div>\n'
+            html = html.replace("</body>", review * 100 * scale + "</body>")
+        pages[os.path.basename(path)] = html
+    return pages
+
+def bench(parse, html: str, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        build_llm_input(parse(html))
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark parse engines on recorded pages")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--scale", type=int, default=50)
+    args = parser.parse_args()
+
+    for name, html in load_fixtures(args.scale).items():
+        print(f"\n{name} ({len(html) / 1024:.0f} KB)")
+        engines = {"baseline": partial(parse_with_soup, structured=False), **PARSER_ENGINES}
+        results = {engine: bench(parse, html, args.repeat) for engine, parse in engines.items()}
+        reference = statistics.median(results["baseline"])
+        for engine, timings in results.items():
+            median = statistics.median(timings)
+            print(f"  {engine:<8} median {median:8.2f} ms   min {min(timings):8.2f} ms   ({reference / median:.1f}x vs baseline)")
+
+if __name__ == "__main__":
+    main()
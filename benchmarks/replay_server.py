@@ -0,0 +1,69 @@
+"""
+Local stand-in for Amazon that replays the recorded product pages in benchmarks/fixtures.
+
+Usage:
+    python -m benchmarks.replay_server [--port 8101] [--latency-ms 150] [--scale 50]
+
+Any /dp/<ASIN> (or /gp/product/<ASIN>, /-/ko/dp/<ASIN>, ...) URL is answered with a
+fixture. Unknown ASINs get a fixture chosen by the ASIN, with the recorded ASIN replaced,
+so every benchmark URL is a distinct product for the caches.
+"""
+import argparse
+import asyncio
+import hashlib
+import random
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import HTMLResponse, PlainTextResponse
+from app.parser import parse_document
+from app.utils import asin_from_url
+from benchmarks.bench_parse import load_fixtures
+
+def create_app(latency_ms: float = 150, jitter_ms: float = 50, scale: int = 1) -> FastAPI:
+    # [(recorded ASIN, html)]
+    pages = []
+    for html in load_fixtures(scale).values():
+        pages.append((parse_document(html)["fields"].get("asin"), html))
+
+    app = FastAPI(title="Amazon replay server")
+    app.state.requests = 0
+
+    @app.get("/health")
+    def health():
+        return {"status": "ok", "requests": app.state.requests, "fixtures": len(pages)}
+
+    @app.get("/{path:path}")
+    async def product_page(path: str, request: Request):
+        app.state.requests += 1
+        asin = asin_from_url("/" + path)
+        if not asin:
+            return PlainTextResponse("Not Found", status_code=404)
+
+        delay = max(0.0, latency_ms + random.uniform(-jitter_ms, jitter_ms)) / 1000
+        await asyncio.sleep(delay)
+
+        for recorded, html in pages:
+            if recorded == asin:
+                return HTMLResponse(html)
+        # Stable choice per ASIN, so repeated runs replay the same page
+        recorded, html = pages[int(hashlib.md5(asin.encode()).hexdigest(), 16) % len(pages)]
+        if recorded:
+            html = html.replace(recorded, asin)
+        return HTMLResponse(html)
+
+    return app
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded Amazon product pages")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8101)
+    parser.add_argument("--latency-ms", type=float, default=150)
+    parser.add_argument("--jitter-ms", type=float, default=50)
+    parser.add_argument("--scale", type=int, default=1, help="Pad pages with review markup (see bench_parse)")
+    args = parser.parse_args()
+
+    app = create_app(args.latency_ms, args.jitter_ms, args.scale)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+LangServe-compatible stand-in for the Bedrock RemoteRunnable endpoint.
+
+Usage:
+    python -m benchmarks.stub_llm [--port 8102] [--latency-ms 800] [--jitter-ms 200] [--response canned.json]
+
+Answers POST <any prefix>/invoke like a LangServe chat model route: after the configured
+latency it returns an AI message whose content is the canned JSON, plus usage metadata.
+"""
+import argparse
+import asyncio
+import json
+import random
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+# Fields the extraction prompt asks for (see app/nodes.py)
+DEFAULT_RESPONSE = {
+    "title": "벤치마크 상품",
+    "brand": "Bench",
+    "model_name": "BM-1",
+    "features": ["첫 번째 특징", "두 번째 특징", "세 번째 특징"],
+    "specifications": {"소재": "스테인리스 스틸", "용량": "5.7리터"},
+    "full_description": "벤치마크용 고정 응답입니다.",
+    "product_details": {"원산지": "중국"},
+    "description_summary": "벤치마크용 요약",
+    "warranty_info": "1년",
+}
+
+def create_app(latency_ms: float = 800, jitter_ms: float = 200, response: dict = DEFAULT_RESPONSE, throttle_rate: float = 0.0) -> FastAPI:
+    app = FastAPI(title="Stub LLM")
+    content = json.dumps(response, ensure_ascii=False)
+    app.state.calls = 0
+
+    @app.get("/health")
+    def health():
+        return {"status": "ok", "calls": app.state.calls}
+
+    @app.post("/invoke")
+    @app.post("/{prefix:path}/invoke")
+    async def invoke(request: Request):
+        body = await request.json()
+        app.state.calls += 1
+        # Simulated Bedrock throttling, to exercise the client's retry path
+        if throttle_rate and random.random() < throttle_rate:
+            return JSONResponse({"detail": "ThrottlingException: Too many requests"}, status_code=429)
+
+        delay = max(0.0, latency_ms + random.uniform(-jitter_ms, jitter_ms)) / 1000
+        await asyncio.sleep(delay)
+
+        # Rough input size: ~4 characters per token
+        prompt_chars = len(json.dumps(body.get("input", ""), ensure_ascii=False))
+        input_tokens = prompt_chars // 4
+        output_tokens = len(content) // 4
+        return {
+            "output": {
+                "type": "ai",
+                "content": content,
+                "response_metadata": {
+                    "usage": {"prompt_tokens": input_tokens, "completion_tokens": output_tokens, "total_tokens": input_tokens + output_tokens},
+                },
+            },
+            "metadata": {"run_id": None},
+        }
+
+    return app
+
+def main():
+    parser = argparse.ArgumentParser(description="LangServe-compatible stub for the Bedrock endpoint")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8102)
+    parser.add_argument("--latency-ms", type=float, default=800)
+    parser.add_argument("--jitter-ms", type=float, default=200)
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Share of calls answered with 429")
+    parser.add_argument("--response", help="JSON file with the canned extraction result")
+    args = parser.parse_args()
+
+    response = DEFAULT_RESPONSE
+    if args.response:
+        with open(args.response, encoding="utf-8") as f:
+            response = json.load(f)
+
+    app = create_app(args.latency_ms, args.jitter_ms, response, args.throttle_rate)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
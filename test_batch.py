@@ -0,0 +1,46 @@
+import asyncio
+import json
+from app.batch import read_input, run_batch
+from app.models import ProductResponse
+
+def write_input(path, count):
+    lines = [json.dumps({"url": f"https://www.amazon.com/dp/B0BATCH{i:03d}"}) for i in range(count)]
+    lines += ["", "# comment", "https://www.amazon.com/dp/B0BATCH999", '{"asin": "B0NOURL000"}']
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+async def crawl(url):
+    return {"product_data": ProductResponse(title="Steamer", asin=url[-10:]), "error": None}
+
+def test_read_input(tmp_path):
+    source = tmp_path / "urls.jsonl"
+    write_input(source, 2)
+    assert [number for number, _ in read_input(str(source))] == [1, 2, 5]
+
+def test_batch_checkpoint_resume(tmp_path):
+    source = tmp_path / "urls.jsonl"
+    output = tmp_path / "products.jsonl"
+    write_input(source, 6)
+
+    async def interrupted(url):
+        if url.endswith("B0BATCH003"):
+            raise KeyboardInterrupt
+        return await crawl(url)
+
+    try:
+        asyncio.run(run_batch(str(source), str(output), concurrency=1, run=interrupted))
+    except KeyboardInterrupt:
+        pass
+    assert len(output.read_text().splitlines()) == 3
+
+    calls = []
+
+    async def counted(url):
+        calls.append(url)
+        return await crawl(url)
+
+    progress = asyncio.run(run_batch(str(source), str(output), concurrency=3, run=counted))
+    assert (progress.skipped, progress.ok, progress.failed) == (3, 4, 0)
+    assert len(calls) == 4
+    rows = [json.loads(line) for line in output.read_text().splitlines()]
+    assert sorted(row["index"] for row in rows) == [1, 2, 3, 4, 5, 6, 9]
+    assert all(row["status"] == "ok" for row in rows)
@@ -0,0 +1,145 @@
+import asyncio
+from types import SimpleNamespace
+import app.browser
+from app.browser import DEFAULT_USER_AGENT, BrowserPool
+
+class FakePage:
+    def __init__(self, context):
+        self.context = context
+        self.closed = False
+
+    async def close(self):
+        if self.context.dead:
+            raise RuntimeError("Target closed")
+        self.closed = True
+
+class FakeContext:
+    def __init__(self, user_agent):
+        self.user_agent = user_agent
+        self.pages = []
+        self.closed = False
+        self.dead = False
+
+    async def set_extra_http_headers(self, headers):
+        pass
+
+    async def route(self, pattern, handler):
+        pass
+
+    async def new_page(self):
+        self.pages.append(FakePage(self))
+        return self.pages[-1]
+
+    async def close(self):
+        self.closed = True
+
+class FakeBrowser:
+    def __init__(self):
+        self.contexts = []
+        self.closed = False
+
+    def is_connected(self):
+        return not self.closed
+
+    async def new_context(self, user_agent):
+        self.contexts.append(FakeContext(user_agent))
+        return self.contexts[-1]
+
+    async def close(self):
+        self.closed = True
+
+def fake_playwright(monkeypatch):
+    """Playwright whose launches are recorded in .browsers."""
+    playwright = SimpleNamespace(browsers=[], stopped=False)
+
+    async def launch(headless):
+        playwright.browsers.append(FakeBrowser())
+        return playwright.browsers[-1]
+
+    async def start():
+        return playwright
+
+    async def stop():
+        playwright.stopped = True
+
+    playwright.chromium = SimpleNamespace(launch=launch)
+    playwright.stop = stop
+    monkeypatch.setattr(app.browser, "async_playwright", lambda: SimpleNamespace(start=start))
+    monkeypatch.setattr(app.browser, "ua", SimpleNamespace(chrome="Chrome/rotated"))
+    return playwright
+
+def test_recycle_after_max_pages(monkeypatch):
+    playwright = fake_playwright(monkeypatch)
+
+    async def run():
+        pool = BrowserPool(browsers=1, contexts_per_browser=1, max_pages_per_context=2)
+        for _ in range(5):
+            async with pool.page() as leased:
+                assert not leased.page.closed
+        contexts = playwright.browsers[0].contexts
+        assert [len(c.pages) for c in contexts] == [2, 2, 1]
+        assert [c.closed for c in contexts] == [True, True, False]
+        assert all(p.closed for c in contexts for p in c.pages)
+        await pool.stop()
+    asyncio.run(run())
+
+def test_recycle_after_block(monkeypatch):
+    playwright = fake_playwright(monkeypatch)
+
+    async def run():
+        pool = BrowserPool(browsers=1, contexts_per_browser=1, max_pages_per_context=10)
+        async with pool.page() as leased:
+            leased.mark_blocked()
+        # The captcha'd context is replaced, under a different user agent
+        async with pool.page():
+            pass
+        contexts = playwright.browsers[0].contexts
+        assert [(c.user_agent, c.closed) for c in contexts] == [(DEFAULT_USER_AGENT, True), ("Chrome/rotated", False)]
+
+        # A context that fails to close its page is not reused either
+        contexts[1].dead = True
+        async with pool.page():
+            pass
+        async with pool.page():
+            pass
+        assert len(contexts) == 3 and contexts[1].closed
+
+        # A crashed browser is relaunched on the next recycle
+        playwright.browsers[0].closed = True
+        async with pool.page() as leased:
+            leased.mark_blocked()
+        async with pool.page():
+            pass
+        assert len(playwright.browsers) == 2 and len(playwright.browsers[1].contexts) == 1
+        await pool.stop()
+    asyncio.run(run())
+
+def test_stop_with_leased_pages(monkeypatch):
+    playwright = fake_playwright(monkeypatch)
+
+    async def run():
+        pool = BrowserPool(browsers=1, contexts_per_browser=2, max_pages_per_context=10)
+        leased, release = asyncio.Event(), asyncio.Event()
+
+        async def fetch():
+            async with pool.page():
+                leased.set()
+                await release.wait()
+
+        task = asyncio.create_task(fetch())
+        await leased.wait()
+        async with pool.page():
+            pass
+        # Stopping does not wait for the page still in use
+        await pool.stop()
+        browser = playwright.browsers[0]
+        assert browser.closed and playwright.stopped and not pool.started
+        assert [c.closed for c in browser.contexts] == [False, True]
+
+        # Its context is closed when the lease ends instead of going back to the pool
+        release.set()
+        await task
+        assert all(c.closed for c in browser.contexts)
+        assert all(p.closed for c in browser.contexts for p in c.pages)
+        assert pool._slots.empty()
+    asyncio.run(run())
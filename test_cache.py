@@ -0,0 +1,70 @@
+import asyncio
+from types import SimpleNamespace
+import app.cache
+from app.cache import LLMCache, make_cache_key
+
+USAGE = {"input_tokens": 900, "output_tokens": 100}
+
+def test_cache_key():
+    assert make_cache_key("page", "haiku", "3") == make_cache_key("page", "haiku", "3")
+    assert make_cache_key("page", "haiku", "3") != make_cache_key("page", "haiku", "4")
+    assert make_cache_key("page", "haiku", "3") != make_cache_key("page", "sonnet", "3")
+
+def test_memory_lru_and_disk_tier(tmp_path):
+    async def run():
+        path = str(tmp_path / "llm.sqlite3")
+        cache = LLMCache(path=path, memory_items=2, ttl_seconds=0, max_disk_bytes=0, enabled=True)
+        for key in ("a", "b", "c"):
+            await cache.set(key, {"title": key}, USAGE)
+        # "a" fell out of memory but is still on disk
+        assert list(cache._memory) == ["b", "c"]
+        assert (await cache.get("a"))["data"] == {"title": "a"}
+        assert (await cache.get("c"))["data"] == {"title": "c"}
+        assert await cache.get("missing") is None
+        stats = await cache.stats()
+        assert (stats["memory_hits"], stats["disk_hits"], stats["misses"]) == (1, 1, 1)
+        assert stats["saved_tokens"] == 2000
+        await cache.close()
+
+        # A new process reads the same file
+        reopened = LLMCache(path=path, memory_items=2, ttl_seconds=0, max_disk_bytes=0, enabled=True)
+        assert (await reopened.get("b"))["tokens"] == 1000
+        await reopened.close()
+    asyncio.run(run())
+
+def test_ttl_expiry(tmp_path, monkeypatch):
+    clock = SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(app.cache, "time", SimpleNamespace(time=lambda: clock.now))
+
+    async def run():
+        cache = LLMCache(path=str(tmp_path / "llm.sqlite3"), memory_items=10, ttl_seconds=60, max_disk_bytes=0, enabled=True)
+        await cache.set("a", {"title": "a"}, USAGE)
+        clock.now += 30
+        assert await cache.get("a") is not None
+        clock.now += 31
+        # Expired in memory and on disk
+        assert await cache.get("a") is None
+        assert (await cache.stats())["disk_entries"] == 0
+        await cache.close()
+    asyncio.run(run())
+
+def test_disk_size_eviction(tmp_path, monkeypatch):
+    clock = SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(app.cache, "time", SimpleNamespace(time=lambda: clock.now))
+
+    async def run():
+        cache = LLMCache(path=str(tmp_path / "llm.sqlite3"), memory_items=0, ttl_seconds=0, max_disk_bytes=0, enabled=True)
+        for key in ("a", "b"):
+            await cache.set(key, {"title": key * 50}, USAGE)
+            clock.now += 1
+        # Room for two entries
+        cache.max_disk_bytes = (await cache.stats())["disk_bytes"] * 5 // 4
+        # Reading "a" makes "b" the least recently used entry
+        assert await cache.get("a") is not None
+        clock.now += 1
+        await cache.set("c", {"title": "c" * 50}, USAGE)
+        assert await cache.get("b") is None
+        assert await cache.get("a") is not None and await cache.get("c") is not None
+        assert cache.evictions == 1
+        await cache.close()
+    asyncio.run(run())
@@ -0,0 +1,32 @@
+from app import config
+from app.browser import should_block_request
+from app.http_client import is_block_reason
+from app.utils import missing_sections, is_captcha_page
+
+def test_should_block_request(monkeypatch):
+    monkeypatch.setattr(config, "FETCH_BLOCKED_RESOURCE_TYPES", ["image", "font"])
+    monkeypatch.setattr(config, "FETCH_BLOCKED_HOSTS", ["doubleclick.net"])
+    monkeypatch.setattr(config, "FETCH_ALLOWED_HOSTS", ["m.media-amazon.com"])
+
+    # The page itself is never blocked, even on a blocked host
+    assert not should_block_request("document", "https://ad.doubleclick.net/page")
+    # Blocked hosts match subdomains, not look-alike suffixes
+    assert should_block_request("script", "https://ad.doubleclick.net/tag.js")
+    assert not should_block_request("script", "https://notdoubleclick.net/tag.js")
+    # Blocked resource types, unless the host is allowed
+    assert should_block_request("image", "https://images-na.ssl-images-amazon.com/a.jpg")
+    assert not should_block_request("image", "https://m.media-amazon.com/images/I/a.jpg")
+    assert not should_block_request("xhr", "https://www.amazon.com/api")
+
+def test_missing_sections():
+    html = '<div id="centerCol"><div id=altImages/></div><span data-id="aplus">'
+    assert missing_sections(html, ["centerCol", "altImages", "aplus", "center"]) == ["aplus", "center"]
+    assert not is_captcha_page(html)
+
+def test_is_block_reason():
+    # Back off on captcha, rate limiting and timeouts, not on pages that are simply missing
+    assert is_block_reason("captcha")
+    assert is_block_reason("http status 429") and is_block_reason("http status 503")
+    assert not is_block_reason("http status 404")
+    assert is_block_reason("ReadTimeout") and is_block_reason("Timeout 30000ms exceeded")
+    assert not is_block_reason("missing sections: altImages")
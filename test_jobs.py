@@ -0,0 +1,87 @@
+import asyncio
+from types import SimpleNamespace
+import app.jobs
+from app.jobs import JobQueue, JobWorkerPool
+from app.models import ProductResponse
+
+def test_status_and_results(tmp_path):
+    async def run():
+        queue = JobQueue(str(tmp_path / "jobs.sqlite3"))
+        job_id = await queue.submit(["https://www.amazon.com/dp/B0JOB00000", "https://www.amazon.com/dp/B0JOB00001"])
+        assert (await queue.status(job_id))["status"] == "queued"
+        first = await queue.claim()
+        second = await queue.claim()
+        assert await queue.claim() is None
+        status = await queue.status(job_id)
+        assert (status["status"], status["running"]) == ("running", 2)
+
+        assert await queue.complete(first, ProductResponse(title="Steamer"), 12.0)
+        assert await queue.fail(second, "Blocked", 5.0)
+        status = await queue.status(job_id)
+        assert (status["status"], status["done"], status["failed"]) == ("completed", 1, 1)
+        results = await queue.results(job_id)
+        assert [(r.index, r.status) for r in results] == [(0, "ok"), (1, "error")]
+        assert results[0].product.title == "Steamer" and results[1].error == "Blocked"
+        assert await queue.status("missing") is None
+        queue.close()
+    asyncio.run(run())
+
+def test_lease_recovery(tmp_path, monkeypatch):
+    clock = SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(app.jobs, "time", SimpleNamespace(time=lambda: clock.now))
+
+    async def run():
+        path = str(tmp_path / "jobs.sqlite3")
+        dead = JobQueue(path, lease_seconds=60)
+        job_id = await dead.submit(["https://www.amazon.com/dp/B0JOB00000"])
+        lost = await dead.claim()
+
+        # A second process neither recovers nor claims an item under a live lease
+        other = JobQueue(path, lease_seconds=60)
+        assert await other.recover() == 0
+        assert await other.claim() is None
+
+        # The first process stops renewing; after the lease the item is taken over
+        clock.now += 61
+        item = await other.claim()
+        assert (item["index"], item["attempts"]) == (0, 2)
+        # The late result of the dead worker is dropped
+        assert not await dead.complete(lost, ProductResponse(title="Old"), 1.0)
+        assert await other.complete(item, ProductResponse(title="New"), 1.0)
+        assert (await other.results(job_id))[0].product.title == "New"
+        dead.close()
+        other.close()
+    asyncio.run(run())
+
+def test_worker_retries(tmp_path, monkeypatch):
+    calls = []
+
+    async def crawl(url):
+        calls.append(url)
+        if url.endswith("B0FLAKY000") and calls.count(url) < 3:
+            raise RuntimeError("Timeout")
+        if url.endswith("B0BROKEN00"):
+            return {"product_data": None, "error": "Captcha"}
+        return {"product_data": ProductResponse(title="Steamer"), "error": None}
+
+    monkeypatch.setattr(app.jobs, "crawl_product", crawl)
+
+    async def run():
+        queue = JobQueue(str(tmp_path / "jobs.sqlite3"))
+        pool = JobWorkerPool(queue, workers=1, max_attempts=3, retry_delay=0, poll_interval=0.01)
+        await pool.start()
+        job_id = await queue.submit(["https://www.amazon.com/dp/B0FLAKY000", "https://www.amazon.com/dp/B0BROKEN00"])
+        pool.notify()
+        for _ in range(500):
+            if (await queue.status(job_id))["status"] == "completed":
+                break
+            await asyncio.sleep(0.01)
+        await pool.stop()
+
+        results = await queue.results(job_id)
+        assert [(r.status, r.error) for r in results] == [("ok", None), ("error", "Captcha")]
+        # The flaky URL succeeded on its third attempt, the broken one used up all three
+        assert calls.count("https://www.amazon.com/dp/B0FLAKY000") == 3
+        assert calls.count("https://www.amazon.com/dp/B0BROKEN00") == 3
+        queue.close()
+    asyncio.run(run())
@@ -0,0 +1,44 @@
+import asyncio
+from app.limiter import AdaptiveLimiter, HostLimiters
+
+def test_aimd_limit():
+    async def run():
+        limiter = AdaptiveLimiter(initial=4, min_limit=1, max_limit=8)
+
+        # A burst of blocks from fetches that were already in flight halves the limit once
+        started = [await limiter.acquire() for _ in range(4)]
+        for started_at in started:
+            await limiter.release(started_at, "blocked")
+        assert limiter.limit == 2
+        assert limiter.block_rate == 1.0
+
+        # Successes ramp it up by about one per window of `limit` fetches
+        for _ in range(2):
+            await limiter.release(await limiter.acquire(), "ok")
+        assert 2.8 < limiter.limit < 3.0
+
+        # Errors that are not blocks leave it alone
+        await limiter.release(await limiter.acquire(), "error")
+        assert 2.8 < limiter.limit < 3.0
+
+    asyncio.run(run())
+
+def test_limit_caps_concurrency():
+    async def run():
+        limiters = HostLimiters(enabled=True, initial=2, min_limit=1, max_limit=2, decrease=0.5, cooldown=0)
+        peak = in_flight = 0
+
+        async def fetch():
+            nonlocal peak, in_flight
+            async with limiters.slot("www.amazon.com") as slot:
+                in_flight += 1
+                peak = max(peak, in_flight)
+                await asyncio.sleep(0.01)
+                in_flight -= 1
+                slot.success()
+
+        await asyncio.gather(*(fetch() for _ in range(10)))
+        assert peak == 2
+        assert limiters.stats()["hosts"]["www.amazon.com"]["successes"] == 10
+
+    asyncio.run(run())
@@ -0,0 +1,73 @@
+import asyncio
+from types import SimpleNamespace
+import httpx
+import pytest
+import app.llm
+from app.limiter import AsyncLimiter
+from app.llm import ainvoke_llm, backoff_delay, is_retryable_error
+
+def status_error(code):
+    request = httpx.Request("POST", "http://llm/invoke")
+    return httpx.HTTPStatusError(f"HTTP {code}", request=request, response=httpx.Response(code, request=request))
+
+def fake_llm(monkeypatch, errors, max_concurrency=8):
+    """LLM that raises the given errors in turn, then answers; records each attempt."""
+    calls = SimpleNamespace(attempts=0, in_flight=0, peak=0)
+
+    async def ainvoke(messages):
+        calls.attempts += 1
+        calls.in_flight += 1
+        calls.peak = max(calls.peak, calls.in_flight)
+        try:
+            await asyncio.sleep(0.01)
+            if errors:
+                raise errors.pop(0)
+            return SimpleNamespace(content="{}")
+        finally:
+            calls.in_flight -= 1
+
+    monkeypatch.setattr(app.llm, "llm", SimpleNamespace(ainvoke=ainvoke))
+    monkeypatch.setattr(app.llm, "llm_limiter", AsyncLimiter(max_concurrency))
+    monkeypatch.setattr(app.llm.config, "LLM_MAX_RETRIES", 3)
+    monkeypatch.setattr(app.llm.config, "LLM_RETRY_BASE_DELAY", 0.0)
+    return calls
+
+def test_is_retryable_error():
+    assert all(is_retryable_error(status_error(code)) for code in (429, 502, 503, 504))
+    assert not any(is_retryable_error(status_error(code)) for code in (400, 401, 403, 422))
+    assert is_retryable_error(httpx.ReadTimeout("timed out"))
+    assert is_retryable_error(RuntimeError("ThrottlingException: Rate exceeded"))
+    assert not is_retryable_error(ValueError("Invalid JSON"))
+
+def test_backoff_delay_is_capped(monkeypatch):
+    monkeypatch.setattr(app.llm.config, "LLM_RETRY_BASE_DELAY", 1.0)
+    monkeypatch.setattr(app.llm.config, "LLM_RETRY_MAX_DELAY", 5.0)
+    monkeypatch.setattr(app.llm.random, "uniform", lambda low, high: high)
+    assert [backoff_delay(attempt) for attempt in range(5)] == [1.0, 2.0, 4.0, 5.0, 5.0]
+
+def test_retries_throttling_then_succeeds(monkeypatch):
+    calls = fake_llm(monkeypatch, [status_error(429), status_error(503)])
+    assert asyncio.run(ainvoke_llm([])).content == "{}"
+    assert calls.attempts == 3
+
+def test_gives_up(monkeypatch):
+    # A client error is raised at once
+    calls = fake_llm(monkeypatch, [status_error(400)])
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(ainvoke_llm([]))
+    assert calls.attempts == 1
+
+    # Throttling past LLM_MAX_RETRIES is raised after the last attempt
+    calls = fake_llm(monkeypatch, [status_error(429) for _ in range(10)])
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(ainvoke_llm([]))
+    assert calls.attempts == 4
+
+def test_limiter_caps_in_flight_calls(monkeypatch):
+    calls = fake_llm(monkeypatch, [status_error(429) for _ in range(5)], max_concurrency=3)
+
+    async def run():
+        await asyncio.gather(*(ainvoke_llm([]) for _ in range(12)))
+
+    asyncio.run(run())
+    assert (calls.attempts, calls.peak) == (17, 3)
@@ -0,0 +1,57 @@
+import asyncio
+import re
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+import app.graph
+import app.main
+from app.models import ProductResponse
+from app.pipeline import initial_state
+
+NODES = ("fetch", "parse", "compact", "extract")
+
+def stub_workflow(monkeypatch):
+    """The real graph (with instrument) around nodes that only sleep."""
+    def node(result, sync=False):
+        if sync:
+            return lambda state: result
+        async def run(state):
+            await asyncio.sleep(0.005)
+            return result
+        return run
+
+    monkeypatch.setattr(app.graph, "fetch_page", node({"html_content": "<html></html>", "fetch_tier": "http"}))
+    monkeypatch.setattr(app.graph, "parse_html", node({"clean_text": "Steamer"}))
+    monkeypatch.setattr(app.graph, "compact_text", node({"clean_text": "Steamer"}, sync=True))
+    monkeypatch.setattr(app.graph, "extract_with_llm", node({"product_data": ProductResponse(title="Steamer")}))
+    return app.graph.create_workflow()
+
+def node_count(node):
+    return REGISTRY.get_sample_value("crawler_node_duration_seconds_count", {"node": node}) or 0
+
+def test_pipeline_records_node_histograms(monkeypatch):
+    workflow = stub_workflow(monkeypatch)
+    before = {node: node_count(node) for node in NODES}
+    state = asyncio.run(workflow.ainvoke(initial_state("https://www.amazon.com/dp/B07C1HGM6G")))
+    assert {node: node_count(node) - before[node] for node in NODES} == dict.fromkeys(NODES, 1)
+    assert REGISTRY.get_sample_value("crawler_node_runs_total", {"node": "extract", "status": "ok"}) >= 1
+    assert list(state["timings"]) == list(NODES)
+
+    body = TestClient(app.main.app).get("/metrics").text
+    assert 'crawler_node_duration_seconds_count{node="compact"}' in body
+
+def test_server_timing_header(monkeypatch):
+    workflow = stub_workflow(monkeypatch)
+    monkeypatch.setattr(app.main, "crawl_product", lambda url: workflow.ainvoke(initial_state(url)))
+    # No lifespan: nothing is fetched
+    client = TestClient(app.main.app)
+    response = client.post("/api/v1/product/info", json={"urls": ["https://www.amazon.com/dp/B07C1HGM6G"]})
+    assert response.status_code == 200
+    entries = [re.fullmatch(r"(\w+);dur=([\d.]+)", e) for e in response.headers["Server-Timing"].split(", ")]
+    assert [e.group(1) for e in entries] == list(NODES)
+    # The sleeping nodes take at least their 5 ms
+    assert all(float(e.group(2)) >= 5 for e in entries if e.group(1) != "compact")
+
+    # Batches prefix each entry with the URL index
+    urls = ["https://www.amazon.com/dp/B07C1HGM6G", "https://www.amazon.com/dp/B00FLYWNYQ"]
+    header = client.post("/api/v1/product/info", json={"urls": urls}).headers["Server-Timing"]
+    assert [e.split(";")[0] for e in header.split(", ")] == [f"url{i}-{node}" for i in range(2) for node in NODES]
@@ -0,0 +1,167 @@
+import asyncio
+import glob
+import os
+import pytest
+from app.parser import parse_with_soup, parse_with_lxml, parse_document, build_llm_input
+from app import tokens
+from app.compaction import compact_sections, compact_llm_input
+from app.parse_pool import ParsePool
+
+FIXTURES = sorted(glob.glob(os.path.join(os.path.dirname(__file__), "benchmarks", "fixtures", "*.html")))
+
+def load(name):
+    with open(os.path.join(os.path.dirname(__file__), "benchmarks", "fixtures", name), encoding="utf-8") as f:
+        return f.read()
+
+@pytest.mark.parametrize("path", FIXTURES, ids=os.path.basename)
+def test_lxml_engine_matches_soup(path):
+    with open(path, encoding="utf-8") as f:
+        html = f.read()
+    soup_result = parse_with_soup(html)
+    lxml_result = parse_with_lxml(html)
+    assert lxml_result == soup_result
+    assert build_llm_input(lxml_result) == build_llm_input(soup_result)
+
+def test_sections_are_separated():
+    parsed = parse_document(load("product_full.html"), engine="lxml")
+    assert parsed["gallery_images"][:3] == [
+        "https://m.media-amazon.com/images/I/41OFXY6pMRL.jpg",
+        "https://m.media-amazon.com/images/I/51uTO5fYDzL.jpg",
+        "https://m.media-amazon.com/images/I/61aBcDeFgHL.jpg",
+    ]
+    assert parsed["script_images"] == []
+    assert parsed["manufacturer_images"][0] == "https://m.media-amazon.com/images/S/aplus-media-library-service-media/6bed2cc4.jpg"
+    assert "https://m.media-amazon.com/images/S/aplus-media-library-service-media/e5f6a7b8.jpg" in parsed["manufacturer_images"]
+    assert "빠르고 간편한 요리" in parsed["aplus_text"]
+    assert "P.when" not in parsed["aplus_text"]
+    assert parsed["videos"] == [
+        "https://m.media-amazon.com/images/S/vse-vms-transcoding-artifact-us-east-1-prod/v1/video1.mp4",
+        "https://m.media-amazon.com/images/S/vse-vms-transcoding-artifact-us-east-1-prod/v1/video2.mp4",
+    ]
+    # Main text comes from #centerCol only, without <noscript>
+    assert "인스턴트 팟 듀오 7-in-1" in parsed["main_text"]
+    assert "자바스크립트" not in parsed["main_text"]
+    assert "고객 리뷰" not in parsed["main_text"]
+
+def test_script_fallback_and_dp_container():
+    parsed = parse_document(load("product_script_gallery.html"), engine="lxml")
+    assert parsed["gallery_images"] == []
+    assert parsed["script_images"] == [
+        "https://m.media-amazon.com/images/I/61stEamerL.jpg",
+        "https://m.media-amazon.com/images/I/71secondL.jpg",
+    ]
+    assert "Loose text <with entities> & a comment in the middle." in parsed["main_text"]
+    assert "template text" not in parsed["main_text"]
+
+def test_unknown_engine():
+    with pytest.raises(ValueError):
+        parse_document("<html></html>", engine="regex")
+
+def test_dom_fields():
+    fields = parse_document(load("product_full.html"))["fields"]
+    assert fields["asin"] == "B00FLYWNYQ"
+    assert fields["price"] == "KRW 117,952"
+    assert fields["currency"] == "KRW"
+    assert fields["review_count"] == 161824
+    assert fields["brand"] == "Instant Pot"
+    assert fields["breadcrumbs"] == ["홈 & 주방", "주방 & 식당", "소형 가전", "전기 압력솥"]
+    assert fields["best_sellers_rank"] == ["주방 & 식당에서 #12위", "전기 압력솥에서 #1위"]
+    assert fields["image_url"] == "https://m.media-amazon.com/images/I/71V1LrY1MSL.jpg"
+
+    fields = parse_document(load("product_script_gallery.html"))["fields"]
+    assert fields["asin"] == "B07C1HGM6G"
+    assert fields["currency"] == "USD"
+    assert fields["brand"] == "Hatrigo"
+    assert fields["best_sellers_rank"] == ["#1,234 in Kitchen & Dining", "#5 in Pressure Cooker Accessories"]
+
+def test_page_sections():
+    sections = parse_document(load("product_full.html"))["sections"]
+    assert list(sections) == ["title", "bullets", "tech_specs", "overview", "product_details", "description"]
+    assert "제조사: Instant Brands\n모델 이름: Duo 7-in-1" in sections["tech_specs"]
+    assert "ASIN: B00FLYWNYQ" in sections["product_details"]
+
+def test_compaction_budget(monkeypatch):
+    # Deterministic counts regardless of whether tiktoken can load its encoding
+    monkeypatch.setattr(tokens, "_get_encoding", lambda: None)
+    sections = {
+        "title": "Steamer Basket",
+        "bullets": "About this item\nFits 6 Qt pressure cookers\nFood grade stainless steel",
+        "tech_specs": "Material: Stainless Steel\nFits 6 Qt pressure cookers",
+        "product_details": "ASIN: B07C1HGM6G\nSee more product details",
+        "description": "word " * 500,
+    }
+    text = compact_sections(sections, budget=0)
+    assert "About this item" not in text
+    assert "See more product details" not in text
+    assert "ASIN" not in text
+    assert text.count("Fits 6 Qt pressure cookers") == 1
+
+    text = compact_sections(sections, budget=60)
+    assert tokens.count_tokens(text) <= 60
+    assert text.startswith("[TITLE]\nSteamer Basket")
+    assert "Material: Stainless Steel" in text
+
+    # Unknown layouts keep the plain text, cut to the budget
+    assert compact_llm_input({"title": "Steamer Basket"}, "plain text " * 100, budget=10) == "plain text plain text plain text plain"
+
+def test_parse_pool_matches_in_process():
+    html = load("product_full.html")
+
+    async def run():
+        pool = ParsePool(enabled=True, workers=1, min_bytes=0)
+        await pool.start()
+        try:
+            return await pool.parse(html)
+        finally:
+            await pool.stop()
+
+    assert asyncio.run(run()) == parse_document(html)
+
+def test_compact_text_falls_back_when_larger(monkeypatch):
+    from app.nodes import compact_text
+    monkeypatch.setattr(tokens, "_get_encoding", lambda: None)
+    state = {"url": "https://www.amazon.com/dp/B07C1HGM6G", "error": None}
+
+    # Section headers make a tiny page longer: the original is kept and the growth is reported
+    sections = {"title": "Steamer Basket", "description": "Steamer Basket"}
+    small = compact_text({**state, "clean_text": "Steamer Basket", "sections": sections})
+    assert small["clean_text"] == "Steamer Basket"
+    assert small["compaction"]["fallback"] and small["compaction"]["tokens_saved"] == 0
+    assert small["compaction"]["tokens_compacted"] > small["compaction"]["tokens_before"]
+
+    noisy = "Steamer Basket\n" + "Customers who viewed this item also viewed\n" * 50
+    large = compact_text({**state, "clean_text": noisy, "sections": sections})
+    assert not large["compaction"]["fallback"]
+    assert large["compaction"]["tokens_saved"] == large["compaction"]["tokens_before"] - large["compaction"]["tokens_after"] > 0
+
+def test_compaction_shrinks_the_full_product_page(monkeypatch):
+    from app.nodes import compact_text
+    monkeypatch.setattr(tokens, "_get_encoding", lambda: None)
+    parsed = parse_document(load("product_full.html"))
+    sections = {**parsed["sections"], "aplus": parsed["aplus_text"]}
+    state = compact_text({"url": "https://www.amazon.com/dp/B00FLYWNYQ", "error": None, "clean_text": build_llm_input(parsed), "sections": sections})
+    compaction = state["compaction"]
+    assert not compaction["fallback"]
+    assert compaction["tokenizer"] == "estimate"
+    assert compaction["tokens_after"] < compaction["tokens_before"]
+    # Bullets and spec rows go to the LLM as fragments, not as page text
+    assert "[TITLE]" in state["clean_text"] and "[DESCRIPTION]" in state["clean_text"]
+    assert "13가지 원터치" not in state["clean_text"] and "Instant Brands" not in state["clean_text"]
+
+def test_tokenizer_fallback_warns_once(monkeypatch, caplog):
+    import sys
+    from types import SimpleNamespace
+
+    def get_encoding(name):
+        raise ConnectionError("offline")
+
+    monkeypatch.setitem(sys.modules, "tiktoken", SimpleNamespace(get_encoding=get_encoding))
+    monkeypatch.setattr(tokens.config, "TOKEN_COUNTER", "tiktoken")
+    monkeypatch.setattr(tokens, "_encoding", None)
+    monkeypatch.setattr(tokens, "_encoding_failed", False)
+    with caplog.at_level("WARNING", logger="app.tokens"):
+        assert tokens.count_tokens("steamer basket") == tokens.estimate_tokens("steamer basket")
+        tokens.count_tokens("lid")
+    assert tokens.tokenizer_name() == "estimate"
+    assert [r.levelname for r in caplog.records] == ["WARNING"]
+    assert "COMPACTION_TOKEN_BUDGET" in caplog.records[0].getMessage()
@@ -0,0 +1,64 @@
+import asyncio
+from types import SimpleNamespace
+import app.pipeline
+from app.models import ProductResponse
+from app.pipeline import ProductCache, canonicalize_url
+
+def test_canonicalize_url():
+    key, canonical = canonicalize_url("https://www.amazon.com/-/ko/dp/B00FLYWNYQ/ref=sr_1_1?keywords=cooker&th=1")
+    assert (key, canonical) == ("amazon.com|ko|B00FLYWNYQ", "https://www.amazon.com/-/ko/dp/B00FLYWNYQ")
+    # Tracking parameters and /gp/product/ map to the same product
+    assert canonicalize_url("https://www.amazon.com/gp/product/B00FLYWNYQ?psc=1")[0] == "amazon.com||B00FLYWNYQ"
+    assert canonicalize_url("https://amazon.com/dp/B00FLYWNYQ")[0] == "amazon.com||B00FLYWNYQ"
+    # The page language and the store are part of the key
+    assert canonicalize_url("https://www.amazon.co.jp/dp/B00FLYWNYQ")[0] == "amazon.co.jp||B00FLYWNYQ"
+    assert canonicalize_url("https://www.amazon.com/no-product") == ("https://www.amazon.com/no-product",) * 2
+
+def fake_workflow(monkeypatch, calls, delay=0.01):
+    async def ainvoke(state):
+        calls.append(state["url"])
+        await asyncio.sleep(delay)
+        return {**state, "product_data": ProductResponse(title=f"run {len(calls)}")}
+    monkeypatch.setattr(app.pipeline, "app_workflow", SimpleNamespace(ainvoke=ainvoke))
+
+def test_single_flight(monkeypatch):
+    calls = []
+    fake_workflow(monkeypatch, calls)
+
+    async def run():
+        cache = ProductCache(fresh_ttl=60, stale_ttl=60, max_items=10, enabled=True)
+        states = await asyncio.gather(
+            cache.crawl("https://www.amazon.com/dp/B00FLYWNYQ?tag=a"),
+            cache.crawl("https://www.amazon.com/gp/product/B00FLYWNYQ"),
+            cache.crawl("https://www.amazon.com/dp/B00FLYWNYQ/ref=x"),
+        )
+        assert calls == ["https://www.amazon.com/dp/B00FLYWNYQ"]
+        assert {s["product_data"].title for s in states} == {"run 1"}
+        assert (cache.misses, cache.coalesced) == (3, 2)
+        # Served from cache afterwards
+        await cache.crawl("https://www.amazon.com/dp/B00FLYWNYQ")
+        assert (len(calls), cache.hits) == (1, 1)
+    asyncio.run(run())
+
+def test_stale_while_revalidate(monkeypatch):
+    calls = []
+    fake_workflow(monkeypatch, calls)
+    clock = SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(app.pipeline, "time", SimpleNamespace(time=lambda: clock.now, perf_counter=lambda: clock.now))
+
+    async def run():
+        cache = ProductCache(fresh_ttl=60, stale_ttl=60, max_items=10, enabled=True)
+        url = "https://www.amazon.com/dp/B00FLYWNYQ"
+        await cache.crawl(url)
+        clock.now += 90
+        # Stale: the old result is returned at once and refreshed in the background
+        state = await cache.crawl(url)
+        assert state["product_data"].title == "run 1"
+        assert (cache.stale_hits, cache.refreshes) == (1, 1)
+        await asyncio.gather(*cache._background)
+        assert (await cache.crawl(url))["product_data"].title == "run 2"
+        # Past fresh + stale: a blocking run
+        clock.now += 200
+        assert (await cache.crawl(url))["product_data"].title == "run 3"
+        assert cache.misses == 2
+    asyncio.run(run())
@@ -0,0 +1,123 @@
+import asyncio
+import os
+import time
+from app.snapshots import SnapshotStore
+
+PAGE = "<html><body><span id='productTitle'>Steamer Basket</span></body></html>"
+
+def test_snapshot_roundtrip_and_dedup(tmp_path):
+    async def run():
+        store = SnapshotStore(directory=str(tmp_path), retention_days=30, keep_per_asin=3, level=3, enabled=True)
+        first = await store.save("https://www.amazon.com/dp/B07C1HGM6G", "B07C1HGM6G", PAGE, "http")
+        second = await store.save("https://www.amazon.com/dp/B07C1HGM6G", "B07C1HGM6G", PAGE, "browser")
+        # Same HTML, same content address: one blob, two index rows
+        assert first["sha256"] == second["sha256"]
+        metadata, html = await store.latest("B07C1HGM6G")
+        assert html == PAGE
+        assert metadata["id"] == second["id"] and metadata["fetch_tier"] == "browser"
+        stats = await store.stats()
+        assert (stats["snapshots"], stats["products"], stats["blobs"]) == (2, 1, 1)
+        assert await store.latest("B000000000") is None
+        await store.close()
+    asyncio.run(run())
+
+def test_snapshot_retention(tmp_path):
+    async def run():
+        store = SnapshotStore(directory=str(tmp_path), retention_days=1, keep_per_asin=2, level=3, enabled=True)
+        for i in range(4):
+            await store.save("https://www.amazon.com/dp/B07C1HGM6G", "B07C1HGM6G", PAGE.replace("Basket", f"Basket {i}"))
+        old = await store.save("https://www.amazon.com/dp/B0OLD00000", "B0OLD00000", "<html>old</html>")
+        db = store._connect()
+        db.execute("UPDATE snapshots SET fetched_at = ? WHERE id = ?", (time.time() - 3 * 86400, old["id"]))
+        db.commit()
+
+        assert await store.prune() == 3
+        history = await store.history("B07C1HGM6G")
+        assert len(history) == 2
+        assert (await store.latest("B07C1HGM6G"))[1] == PAGE.replace("Basket", "Basket 3")
+        assert await store.history("B0OLD00000") == []
+        # Unreferenced blobs are deleted with their snapshots
+        blobs = [name for _, _, names in os.walk(tmp_path) for name in names if name.endswith(".html.zst")]
+        assert len(blobs) == 2
+        await store.close()
+    asyncio.run(run())
+
+def test_prune_never_deletes_a_blob_being_saved(tmp_path):
+    import threading
+    store = SnapshotStore(directory=str(tmp_path), retention_days=1, keep_per_asin=0, level=3, enabled=True)
+    for _ in range(30):
+        # The only snapshot of PAGE is expired, so prune wants its blob gone while a new save reuses it
+        old = store._save("https://www.amazon.com/dp/B07C1HGM6G", "B07C1HGM6G", PAGE, None)
+        with store._db_lock:
+            db = store._connect()
+            db.execute("UPDATE snapshots SET fetched_at = 0 WHERE id = ?", (old["id"],))
+            db.commit()
+        threads = [
+            threading.Thread(target=store._prune),
+            threading.Thread(target=store._save, args=("https://www.amazon.com/dp/B07C1HGM6G", "B07C1HGM6G", PAGE, None)),
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert asyncio.run(store.latest("B07C1HGM6G"))[1] == PAGE
+    store._close()
+
+def test_reprocess_reports_a_missing_blob(tmp_path, monkeypatch):
+    import app.pipeline
+    from app.pipeline import reprocess_product
+
+    async def run():
+        store = SnapshotStore(directory=str(tmp_path), retention_days=0, keep_per_asin=0, level=3, enabled=True)
+        monkeypatch.setattr(app.pipeline, "snapshot_store", store)
+        saved = await store.save("https://www.amazon.com/dp/B07C1HGM6G", "B07C1HGM6G", PAGE)
+        os.remove(store._blob_path(saved["sha256"]))
+        final_state = await reprocess_product("B07C1HGM6G")
+        assert final_state["product_data"] is None
+        assert final_state["error"].startswith("Snapshot of B07C1HGM6G cannot be read: blob")
+        await store.close()
+    asyncio.run(run())
+
+def test_reprocess_endpoint_is_bounded(monkeypatch):
+    from fastapi.testclient import TestClient
+    import app.main
+    from app.models import ProductResponse
+
+    in_flight = peak = 0
+
+    async def reprocess_product(asin):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return {"product_data": ProductResponse(title=asin), "error": None}
+
+    async def latest_per_asin(since=None):
+        return [{"asin": f"B0REPRO{i:03d}"} for i in range(20)]
+
+    monkeypatch.setattr(app.main, "reprocess_product", reprocess_product)
+    monkeypatch.setattr(app.main.snapshot_store, "latest_per_asin", latest_per_asin)
+    monkeypatch.setattr(app.main.config, "SNAPSHOT_REPROCESS_CONCURRENCY", 3)
+    # No lifespan: nothing is fetched
+    response = TestClient(app.main.app).post("/api/v1/snapshots/reprocess", json={"all": True})
+    assert response.status_code == 200
+    assert [r["product"]["title"] for r in response.json()] == [f"B0REPRO{i:03d}" for i in range(20)]
+    assert peak == 3
+
+def test_prune_sweeps_stale_temporary_files(tmp_path):
+    async def run():
+        store = SnapshotStore(directory=str(tmp_path), retention_days=0, keep_per_asin=0, level=3, enabled=True)
+        saved = await store.save("https://www.amazon.com/dp/B07C1HGM6G", "B07C1HGM6G", PAGE)
+        folder = os.path.dirname(store._blob_path(saved["sha256"]))
+        stale, fresh = os.path.join(folder, "crashed.tmp"), os.path.join(folder, "writing.tmp")
+        for path in (stale, fresh):
+            with open(path, "wb") as f:
+                f.write(b"partial")
+        os.utime(stale, (time.time() - 2 * 3600,) * 2)
+        await store.prune()
+        # Only the old one; a recent one may belong to a save in progress
+        assert not os.path.exists(stale) and os.path.exists(fresh)
+        assert (await store.latest("B07C1HGM6G"))[1] == PAGE
+        await store.close()
+    asyncio.run(run())
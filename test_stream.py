@@ -0,0 +1,81 @@
+import asyncio
+import json
+from functools import partial
+from types import SimpleNamespace
+from fastapi.testclient import TestClient
+import app.main
+import app.pipeline
+from app.models import ProductRequest, ProductResponse
+
+URLS = ["https://www.amazon.com/dp/B0SLOW0000", "https://www.amazon.com/dp/B0BROKEN00", "https://www.amazon.com/dp/B0FAST0000"]
+DELAYS = {"B0SLOW0000": 0.2, "B0BROKEN00": 0.1, "B0FAST0000": 0.0}
+
+async def crawl(url):
+    asin = url.rsplit("/", 1)[-1]
+    await asyncio.sleep(DELAYS[asin])
+    if asin == "B0BROKEN00":
+        return {"product_data": None, "error": "Captcha"}
+    return {"product_data": ProductResponse(title=asin), "error": None}
+
+def stub_run(monkeypatch, run=crawl):
+    monkeypatch.setattr(app.main, "process_url_result", partial(app.pipeline.process_url_result, run=run))
+
+def test_ndjson_in_completion_order(monkeypatch):
+    stub_run(monkeypatch)
+    # No lifespan: nothing is fetched
+    response = TestClient(app.main.app).post("/api/v1/product/info/stream", json={"urls": URLS})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    results = [json.loads(line) for line in response.text.splitlines()]
+    # One line per URL, fastest first
+    assert [(r["index"], r["status"]) for r in results] == [(2, "ok"), (1, "error"), (0, "ok")]
+    assert results[1]["error"] == "Captcha" and results[2]["product"]["title"] == "B0SLOW0000"
+
+def test_sse_by_query_or_accept_header(monkeypatch):
+    stub_run(monkeypatch)
+    client = TestClient(app.main.app)
+    for response in (
+        client.post("/api/v1/product/info/stream?format=sse", json={"urls": URLS}),
+        client.post("/api/v1/product/info/stream", json={"urls": URLS}, headers={"Accept": "text/event-stream"}),
+    ):
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = [event.split("\n") for event in response.text.strip().split("\n\n")]
+        assert [lines[0] for lines in events] == ["event: result"] * 3 + ["event: done"]
+        assert [json.loads(lines[1][len("data: "):])["index"] for lines in events[:3]] == [2, 1, 0]
+
+def test_pending_urls_cancelled_when_client_goes_away(monkeypatch):
+    cancelled = []
+
+    async def run(url):
+        if url.endswith("B0FAST0000"):
+            return {"product_data": ProductResponse(title="fast"), "error": None}
+        try:
+            await asyncio.sleep(60)
+        except asyncio.CancelledError:
+            cancelled.append(url)
+            raise
+
+    stub_run(monkeypatch, run)
+    request = ProductRequest(urls=URLS)
+
+    async def stream(disconnected):
+        http_request = SimpleNamespace(headers={}, is_disconnected=lambda: asyncio.sleep(0, disconnected))
+        response = await app.main.stream_product_info(request, http_request, output_format=None)
+        return response.body_iterator
+
+    async def main():
+        # The client is reported gone after the first result: nothing more is sent
+        body = await stream(disconnected=True)
+        assert [chunk async for chunk in body] == []
+        await asyncio.sleep(0)
+        assert sorted(cancelled) == sorted(URLS[:2])
+
+        # The server closes the stream after a result was sent
+        cancelled.clear()
+        body = await stream(disconnected=False)
+        assert json.loads(await body.__anext__())["product"]["title"] == "fast"
+        await body.aclose()
+        await asyncio.sleep(0)
+        assert sorted(cancelled) == sorted(URLS[:2])
+
+    asyncio.run(main())
@@ -0,0 +1,159 @@
+import asyncio
+from app.translation_memory import PageFragments, TranslationMemory, fragment_key, parse_rewrites
+
+SECTIONS = {
+    "bullets": "Fits 6 Qt pressure cookers\nFood grade stainless steel",
+    "tech_specs": "Material: Stainless Steel\nItem Weight: 1.1 Pounds\nSize: 9.5 x 9.5 cm",
+    "product_details": "ASIN: B07C1HGM6G\nCountry of Origin: China",
+}
+
+def test_page_fragments():
+    page = PageFragments(SECTIONS)
+    assert page.fragments() == [
+        ("bullet", "Fits 6 Qt pressure cookers"),
+        ("bullet", "Food grade stainless steel"),
+        ("key", "Material"),
+        ("value", "Stainless Steel"),
+        ("key", "Item Weight"),
+        ("value", "1.1 Pounds"),
+        ("key", "Size"),
+        ("key", "Country of Origin"),
+        ("value", "China"),
+    ]
+    fields = page.assemble({("key", "Material"): "소재", ("value", "China"): "중국"})
+    assert fields["features"] == ["Fits 6 Qt pressure cookers", "Food grade stainless steel"]
+    assert fields["specifications"] == {"소재": "Stainless Steel", "Item Weight": "1.1 Pounds", "Size": "9.5 x 9.5 cm"}
+    # ASIN rows are already known from the DOM
+    assert fields["product_details"] == {"Country of Origin": "중국"}
+
+def test_fragment_key_normalization():
+    assert fragment_key("key", "Item  Weight\u200e") == fragment_key("key", "item weight")
+    assert fragment_key("key", "Item Weight") != fragment_key("value", "Item Weight")
+
+def test_translation_memory_roundtrip():
+    async def run():
+        memory = TranslationMemory(path=None, memory_items=10, enabled=True)
+        await memory.store({("key", "Material"): "소재"})
+        found = await memory.lookup([("key", "material"), ("value", "China")])
+        assert found == {("key", "material"): "소재"}
+        stats = await memory.stats()
+        assert (stats["hits"], stats["misses"]) == (1, 1)
+
+    asyncio.run(run())
+
+def test_parse_rewrites():
+    unseen = [("key", "Material"), ("value", "China"), ("bullet", "Dishwasher safe")]
+    assert parse_rewrites({"1": " 소재 ", "3": "식기세척기 사용 가능"}, unseen) == {
+        ("key", "Material"): "소재",
+        ("bullet", "Dishwasher safe"): "식기세척기 사용 가능",
+    }
+    # A list in prompt order; broken entries are skipped one by one
+    assert parse_rewrites(["소재", None, ""], unseen) == {("key", "Material"): "소재"}
+    assert parse_rewrites({"2.": "중국", "x": "?", "9": "?", "1": ["소재"]}, unseen) == {("value", "China"): "중국"}
+    assert parse_rewrites("소재, 중국", unseen) == {}
+    assert parse_rewrites(None, unseen) == {}
+
+def test_assemble_keeps_rows_whose_keys_translate_alike():
+    page = PageFragments({"tech_specs": "Size: 9.5 cm\nDimensions: 10 x 10 cm\nMeasurements: 3 Pounds\nSize: 9.5 cm"})
+    fields = page.assemble({("key", "Size"): "크기", ("key", "Dimensions"): "크기", ("key", "Measurements"): "Dimensions"})
+    assert fields["specifications"] == {"크기": "9.5 cm", "Dimensions": "10 x 10 cm", "Measurements": "3 Pounds"}
+
+def test_cache_hit_fills_translation_memory(monkeypatch):
+    import json
+    from types import SimpleNamespace
+    import app.nodes
+    from app.cache import LLMCache
+
+    calls = []
+
+    async def ainvoke_llm(messages):
+        calls.append(messages)
+        answer = {"title": "스티머", "fragments": {"1": "6쿼트 압력솥에 맞음", "2": "소재"}}
+        return SimpleNamespace(content=json.dumps(answer), response_metadata={"usage": {"input_tokens": 10, "output_tokens": 5}})
+
+    monkeypatch.setattr(app.nodes, "ainvoke_llm", ainvoke_llm)
+    monkeypatch.setattr(app.nodes, "llm_cache", LLMCache(path=None, memory_items=10, ttl_seconds=0, max_disk_bytes=0, enabled=True))
+    state = {
+        "url": "https://www.amazon.com/dp/B07C1HGM6G", "error": None, "clean_text": "Steamer",
+        "sections": {"bullets": "Fits 6 Qt pressure cookers", "tech_specs": "Material: 304"}, "dom_fields": {},
+    }
+
+    async def run():
+        for _ in range(2):
+            # A fresh (e.g. reset) translation memory each time: the second answer comes from the LLM cache
+            memory = TranslationMemory(path=None, memory_items=10, enabled=True)
+            monkeypatch.setattr(app.nodes, "translation_memory", memory)
+            result = await app.nodes.extract_with_llm(state)
+            assert result["product_data"].specifications == {"소재": "304"}
+            assert await memory.lookup([("key", "Material")]) == {("key", "Material"): "소재"}
+        assert len(calls) == 1
+
+    asyncio.run(run())
+
+def test_known_fragments_stay_out_of_the_prompt(monkeypatch):
+    import json
+    from types import SimpleNamespace
+    import app.nodes
+    from app.cache import LLMCache
+
+    prompts = []
+
+    async def ainvoke_llm(messages):
+        prompts.append(messages[0].content)
+        return SimpleNamespace(content=json.dumps({"title": "스티머"}), response_metadata={"usage": {}})
+
+    memory = TranslationMemory(path=None, memory_items=10, enabled=True)
+    monkeypatch.setattr(app.nodes, "ainvoke_llm", ainvoke_llm)
+    monkeypatch.setattr(app.nodes, "llm_cache", LLMCache(path=None, memory_items=10, ttl_seconds=0, max_disk_bytes=0, enabled=True))
+    monkeypatch.setattr(app.nodes, "translation_memory", memory)
+    sections = {"title": "Steamer Basket", "bullets": "Fits 6 Qt pressure cookers", "tech_specs": "Material: Steel", "description": "A sturdy basket."}
+    page_text = "Steamer Basket Visit the store 4.7 out of 5 stars Fits 6 Qt pressure cookers Customers also viewed ..."
+    state = {"url": "https://www.amazon.com/dp/B07C1HGM6G", "error": None, "clean_text": page_text, "sections": sections, "dom_fields": {}}
+
+    async def run():
+        await memory.store({("bullet", "Fits 6 Qt pressure cookers"): "6쿼트 압력솥용", ("key", "Material"): "소재", ("value", "Steel"): "스틸"})
+        result = await app.nodes.extract_with_llm(app.nodes.compact_text(state))
+        assert result["product_data"].features == ["6쿼트 압력솥용"]
+        # Only the sections that are not rewritten fragment by fragment are sent
+        assert "A sturdy basket." in prompts[0] and "Steamer Basket" in prompts[0]
+        assert "pressure cookers" not in prompts[0] and "Material" not in prompts[0]
+
+    asyncio.run(run())
+
+def test_translation_memory_disk_bounds(tmp_path, monkeypatch):
+    import sqlite3
+    import app.cache
+    from types import SimpleNamespace
+    clock = SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(app.cache, "time", SimpleNamespace(time=lambda: clock.now))
+    path = str(tmp_path / "tm.sqlite3")
+
+    # A table from the old layout is replaced instead of failing every write
+    db = sqlite3.connect(path)
+    db.execute("CREATE TABLE translation_memory (key TEXT PRIMARY KEY, kind TEXT NOT NULL, source TEXT NOT NULL, target TEXT NOT NULL, hits INTEGER, created_at REAL)")
+    db.commit()
+    db.close()
+
+    async def run():
+        memory = TranslationMemory(path=path, memory_items=0, ttl_seconds=100, max_disk_bytes=0, enabled=True)
+        await memory.store({("key", "Material"): "소재"})
+        clock.now += 60
+        await memory.store({("key", "Weight"): "무게"})
+        assert (await memory.stats())["disk_entries"] == 2
+
+        # Past the TTL the first fragment is gone from disk
+        clock.now += 50
+        assert await memory.lookup([("key", "Material"), ("key", "Weight")]) == {("key", "Weight"): "무게"}
+
+        # Over the size limit the least recently used fragments go first
+        row = (await memory.stats())["disk_bytes"]
+        memory.max_disk_bytes = 2 * row
+        await memory.lookup([("key", "Weight")])
+        clock.now += 1
+        await memory.store({("value", "China"): "중국", ("value", "Japan"): "일본"})
+        stats = await memory.stats()
+        assert stats["disk_entries"] == 2 and stats["evictions"] >= 2
+        assert await memory.lookup([("key", "Weight")]) == {}
+        await memory.close()
+
+    asyncio.run(run())